@@ -0,0 +1,69 @@
+"""
+Lookup time of the IP policy as the deny list grows to threat feed sizes,
+against the linear scan of a list of addresses it replaced.
+
+Run from the project root:  python -m benchmarks.ip_policy
+"""
+import random
+import timeit
+from ipaddress import IPv4Address
+from ipaddress import ip_address
+
+from src.services.ip_policy import IPNetworkSet
+
+SIZES = (10, 1000, 100_000, 1_000_000)
+LOOKUPS = 10_000
+
+
+def make_feed(size: int) -> list[str]:
+    """
+    The make_feed function creates a feed of random IPv4 hosts and networks,
+    with one entry in ten a /24 and one in a hundred an IPv6 /48.
+
+    :param size: int: The number of entries
+    :return: The entries of the feed
+    :doc-author: Trelent
+    """
+    generator = random.Random(size)
+    entries = []
+    for index in range(size):
+        if index % 100 == 0:
+            entries.append(f"2001:db8:{generator.getrandbits(16):x}::/48")
+        elif index % 10 == 0:
+            entries.append(f"{IPv4Address(generator.getrandbits(32))}/24")
+        else:
+            entries.append(str(IPv4Address(generator.getrandbits(32))))
+    return entries
+
+
+def main():
+    """
+    The main function prints the build time and the time of one lookup for every size.
+
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    generator = random.Random(0)
+    clients = [IPv4Address(generator.getrandbits(32)) for _ in range(LOOKUPS)]
+    for size in SIZES:
+        feed = make_feed(size)
+        build = min(timeit.repeat(lambda: IPNetworkSet(feed), number=1, repeat=1))
+        networks = IPNetworkSet(feed)
+        lookup = min(
+            timeit.repeat(lambda: [ip in networks for ip in clients], number=1, repeat=3)
+        )
+        line = (
+            f"{size:>9} entries build {build * 1000:8.1f} ms"
+            f" lookup {lookup / LOOKUPS * 1e6:6.2f} us"
+        )
+        if size <= 1000:
+            addresses = [ip_address(entry.split("/")[0]) for entry in feed]
+            scan = min(
+                timeit.repeat(lambda: [ip in addresses for ip in clients], number=1, repeat=3)
+            )
+            line += f"  list scan {scan / LOOKUPS * 1e6:8.2f} us"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Payload size and encode/decode time of a 500-row /contacts/all page,
+JSON (orjson) against MessagePack with native timestamps.
+
+Run from the project root:  python -m benchmarks.msgpack_vs_json
+"""
+import timeit
+
+import msgpack
+import orjson
+
+from benchmarks.serialization import make_contacts
+from src.services.content import JSON
+from src.services.content import MSGPACK
+from src.services.content import encode
+from src.services.serializers import contacts_to_dicts
+
+ROWS = 500
+ROUNDS = 100
+DECODERS = {
+    JSON: orjson.loads,
+    MSGPACK: lambda body: msgpack.unpackb(body, timestamp=3),
+}
+
+
+def main():
+    """
+    The main function prints the body size and the best encode and decode times
+    of the same page in both media types.
+
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    content = contacts_to_dicts(make_contacts(ROWS, owners=10))
+    for media_type, decode in DECODERS.items():
+        body = encode(content, media_type)
+        encoding = min(
+            timeit.repeat(lambda: encode(content, media_type), number=ROUNDS, repeat=3)
+        )
+        decoding = min(timeit.repeat(lambda: decode(body), number=ROUNDS, repeat=3))
+        print(
+            f"{media_type:<20} {len(body):>8} bytes"
+            f" encode {encoding / ROUNDS * 1000:6.2f} ms"
+            f" decode {decoding / ROUNDS * 1000:6.2f} ms per {ROWS} rows"
+        )
+
+
+if __name__ == "__main__":
+    main()
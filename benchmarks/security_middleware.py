@@ -0,0 +1,165 @@
+"""
+Requests per second of a trivial endpoint behind the old three function
+middlewares (@app.middleware("http")) against the single ASGI SecurityMiddleware.
+The requests are sent straight to the ASGI application, so no server or socket
+is measured.
+
+Run from the project root:  python -m benchmarks.security_middleware
+"""
+import asyncio
+import re
+import time
+from ipaddress import ip_address
+
+from fastapi import FastAPI
+from fastapi import Request
+from fastapi import status
+from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
+
+from src.middlewares.security import SecurityMiddleware
+from src.middlewares.user_agent_middleware import user_agent_ban_list
+
+REQUESTS = 5000
+ALLOWED_IPS = [ip_address("192.168.1.0"), ip_address("172.16.0.0"), ip_address("127.0.0.1")]
+BANNED_IPS = [
+    ip_address("190.235.111.156"),
+    ip_address("82.220.71.77"),
+    ip_address("45.100.28.227"),
+]
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/ping",
+    "raw_path": b"/ping",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [(b"host", b"localhost"), (b"user-agent", b"benchmark/1.0")],
+    "client": ("127.0.0.1", 50000),
+    "server": ("localhost", 8000),
+}
+
+
+def make_app() -> FastAPI:
+    """
+    The make_app function creates an application with one trivial endpoint.
+
+    :return: A FastAPI application
+    :doc-author: Trelent
+    """
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return PlainTextResponse("pong")
+
+    return app
+
+
+def before() -> FastAPI:
+    """
+    The before function protects the endpoint the way main.py used to,
+    with three function middlewares.
+
+    :return: A FastAPI application
+    :doc-author: Trelent
+    """
+    app = make_app()
+
+    @app.middleware("http")
+    async def limit_access_by_ip(request: Request, call_next):
+        if ip_address(request.client.host) not in ALLOWED_IPS:
+            return JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={"detail": "Not allowed IP address"},
+            )
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def ban_ips(request: Request, call_next):
+        if ip_address(request.client.host) in BANNED_IPS:
+            return JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN, content={"detail": "You are banned"}
+            )
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def user_agent_ban_middleware(request: Request, call_next):
+        user_agent = request.headers.get("user-agent")
+        for ban_pattern in user_agent_ban_list:
+            if re.search(ban_pattern, user_agent):
+                return JSONResponse(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    content={"detail": "You are banned"},
+                )
+        return await call_next(request)
+
+    return app
+
+
+def after() -> FastAPI:
+    """
+    The after function protects the endpoint with the security middleware.
+
+    :return: A FastAPI application
+    :doc-author: Trelent
+    """
+    app = make_app()
+    app.add_middleware(SecurityMiddleware, bypass_paths=["/static", "/api/healthchecker"])
+    return app
+
+
+async def measure(app: FastAPI) -> float:
+    """
+    The measure function sends REQUESTS requests through the application.
+
+    :param app: FastAPI: The application to measure
+    :return: The requests per second
+    :doc-author: Trelent
+    """
+    statuses = []
+    never = asyncio.Event()
+
+    async def request(scope: dict):
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                await never.wait()
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await app(scope, receive, send)
+
+    await request(dict(SCOPE))
+    statuses.clear()
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        await request(dict(SCOPE))
+    elapsed = time.perf_counter() - started
+    assert statuses == [200] * REQUESTS, set(statuses)
+    return REQUESTS / elapsed
+
+
+async def main():
+    """
+    The main function prints the requests per second of both setups.
+
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    for name, factory in (("function middlewares", before), ("SecurityMiddleware", after)):
+        rate = max([await measure(factory()) for _ in range(3)])
+        print(f"{name:<22} {rate:>10.0f} requests/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Serialization time of one 500-row contact page.
+
+Compares the default FastAPI path (validate every row against ContactResponse,
+jsonable_encoder, stdlib json) with the trusted dict copy encoded by orjson,
+in the full format and in the compact envelope (?format=compact).
+
+Run from the project root:  python -m benchmarks.serialization
+"""
+import json
+import timeit
+from datetime import date
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from src.database.models import Contact
+from src.database.models import Role
+from src.database.models import User
+from src.schemas.contact import ContactResponse
+from src.services.serializers import dump_contacts
+
+ROWS = 500
+ROUNDS = 50
+
+
+def make_contacts(rows: int, owners: int = 1) -> list[Contact]:
+    """
+    The make_contacts function builds contacts the way the ORM returns them,
+    each with its owner attached.
+
+    :param rows: int: How many contacts to build
+    :param owners: int: How many distinct owners the contacts have
+    :return: A list of contacts
+    :doc-author: Trelent
+    """
+    users = [
+        User(
+            id=owner + 1,
+            username=f"user{owner}",
+            email=f"user{owner}@example.com",
+            avatar="https://example.com/avatar.png",
+            role=Role.user,
+        )
+        for owner in range(owners)
+    ]
+    now = datetime(2024, 4, 22, 12, 30, 15, 123456)
+    return [
+        Contact(
+            id=row + 1,
+            name=f"Name{row}",
+            lastname=f"Lastname{row}",
+            email=f"contact{row}@example.com",
+            phone="+380501234567",
+            birthday=date(1990, 1 + row % 12, 1 + row % 28),
+            notes="n" * 120,
+            favourite=row % 3 == 0,
+            created_at=now,
+            updated_at=now,
+            user_id=users[row % owners].id,
+            user=users[row % owners],
+        )
+        for row in range(rows)
+    ]
+
+
+def validated_json(contacts) -> bytes:
+    """
+    The validated_json function repeats what FastAPI does for response_model=list[ContactResponse].
+
+    :param contacts: The contacts to serialize
+    :return: The JSON body
+    :doc-author: Trelent
+    """
+    models = adapter.validate_python(contacts, from_attributes=True)
+    return json.dumps(jsonable_encoder(models), separators=(",", ":")).encode()
+
+
+adapter = TypeAdapter(list[ContactResponse])
+
+
+def main():
+    """
+    The main function checks that both paths produce the same JSON and prints
+    the best time of each per page.
+
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    contacts = make_contacts(ROWS)
+    assert json.loads(validated_json(contacts)) == json.loads(dump_contacts(contacts))
+    cases = (
+        ("validated + json", validated_json),
+        ("trusted + orjson", dump_contacts),
+        ("compact + orjson", lambda rows: dump_contacts(rows, "compact")),
+    )
+    for name, func in cases:
+        seconds = min(timeit.repeat(lambda: func(contacts), number=ROUNDS, repeat=3)) / ROUNDS
+        size = len(func(contacts))
+        print(f"{name:<18} {seconds * 1000:8.2f} ms {size:>8} bytes per {ROWS} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Time to check one User-Agent against 1,000 ban patterns: the old loop of
+re.search calls, the combined regex, and the combined regex behind the verdict cache.
+With more patterns than the re module caches (512), the loop compiles every
+pattern again on every request, so it is only run on a sample of the traffic.
+
+Run from the project root:  python -m benchmarks.user_agent_policy
+"""
+import random
+import re
+import string
+import timeit
+
+from src.services.user_agent_policy import UserAgentPolicy
+from src.services.user_agent_policy import compile_patterns
+
+PATTERNS = 1000
+REQUESTS = 10_000
+LOOP_SAMPLE = 20
+DISTINCT = 2000
+BROWSERS = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/{}.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_{} like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1",
+    "python-httpx/0.{}",
+)
+
+
+def make_patterns(count: int) -> list[str]:
+    """
+    The make_patterns function creates a ban list like the public bot lists:
+    mostly literal bot names with some regular expressions among them.
+
+    :param count: int: The number of patterns
+    :return: The patterns
+    :doc-author: Trelent
+    """
+    generator = random.Random(count)
+    patterns = []
+    for index in range(count):
+        name = "".join(generator.choices(string.ascii_letters, k=generator.randint(5, 12)))
+        if index % 20 == 0:
+            patterns.append(name + r"[-_ ]?[Bb]ot/\d+")
+        else:
+            patterns.append(name + generator.choice(("bot", "Bot", "-crawler", "Spider")))
+    return patterns
+
+
+def make_traffic(patterns: list[str]) -> list[str]:
+    """
+    The make_traffic function creates REQUESTS User-Agents drawn from DISTINCT
+    values, one in fifty of them a banned bot.
+
+    :param patterns: list[str]: The ban patterns
+    :return: The User-Agents in the order they arrive
+    :doc-author: Trelent
+    """
+    generator = random.Random(0)
+    distinct = []
+    for index in range(DISTINCT):
+        if index % 50 == 0:
+            distinct.append(f"Mozilla/5.0 (compatible; {generator.choice(patterns[1:20])}/2.1)")
+        else:
+            distinct.append(generator.choice(BROWSERS).format(generator.randint(1, 200)))
+    return [generator.choice(distinct) for _ in range(REQUESTS)]
+
+
+def main():
+    """
+    The main function prints the time of one check for every approach.
+
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    patterns = make_patterns(PATTERNS)
+    traffic = make_traffic(patterns)
+    combined = compile_patterns(patterns)
+    policy = UserAgentPolicy(patterns, cache_size=4096)
+
+    def loop():
+        sample = traffic[:LOOP_SAMPLE]
+        return [any(re.search(pattern, ua) for pattern in patterns) for ua in sample]
+
+    def regex():
+        return [combined.search(ua) is not None for ua in traffic]
+
+    def cached():
+        return [policy.is_banned(ua) for ua in traffic]
+
+    assert loop() == regex()[:LOOP_SAMPLE] and regex() == cached()
+    checks = (
+        ("re.search loop", loop, LOOP_SAMPLE),
+        ("combined regex", regex, REQUESTS),
+        ("with cache", cached, REQUESTS),
+    )
+    for name, check, count in checks:
+        elapsed = min(timeit.repeat(check, number=1, repeat=3))
+        print(f"{name:<16} {elapsed / count * 1e6:9.2f} us per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Simulated database loads of the user cache after a deploy, when every hot user is
+cached at the same moment: a fixed TTL, a jittered TTL, and a jittered TTL with
+XFetch early refresh. Jitter spreads the expiries of different users; XFetch
+refreshes an entry before it expires, so requests keep hitting it while one of
+them reloads the user instead of all of them waiting for the database.
+
+Run from the project root:  python -m benchmarks.user_cache_stampede
+"""
+import random
+import statistics
+
+from src.services.xfetch import jittered_ttl
+from src.services.xfetch import should_refresh
+
+USERS = 200
+RATE = 20
+DURATION = 1200
+TTL = 300
+JITTER = 0.1
+BETA = 1.0
+DELTA = 0.2
+
+
+def simulate(jitter: float, early: bool) -> tuple[list[int], int]:
+    """
+    The simulate function replays the requests of every user, each sending RATE
+    requests per second, and counts the database loads of every second. A load
+    takes DELTA seconds; requests for an expired entry wait for it, coalesced,
+    while an early refresh leaves the old entry in place until it is done.
+    All entries are written at time 0, as after a deploy.
+
+    :param jitter: float: The jitter of the TTL, 0 for a fixed TTL
+    :param early: bool: Whether hits may refresh early with XFetch
+    :return: A tuple of the number of loads in every second and of the requests
+        that waited for the database
+    :doc-author: Trelent
+    """
+    random.seed(0)
+    loads = [0] * DURATION
+    waited = 0
+    for _ in range(USERS):
+        expires = jittered_ttl(TTL, jitter)
+        ready = 0.0
+        now = random.random() / RATE
+        while now < DURATION:
+            if now < ready:
+                waited += 1
+            elif now >= expires:
+                loads[int(now)] += 1
+                waited += 1
+                ready = now + DELTA
+                expires = ready + jittered_ttl(TTL, jitter)
+            elif early and should_refresh(DELTA, expires, BETA, now):
+                loads[int(now)] += 1
+                waited += 1
+                expires = now + DELTA + jittered_ttl(TTL, jitter)
+            now += 1 / RATE
+    return loads, waited
+
+
+def main():
+    """
+    The main function prints the peak and the spread of the loads per second,
+    leaving out the first second, where every strategy warms up the same way,
+    and how many requests waited for a load.
+
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    for name, jitter, early in (
+        ("fixed TTL", 0.0, False),
+        ("jittered TTL", JITTER, False),
+        ("jittered TTL + XFetch", JITTER, True),
+    ):
+        loads, waited = simulate(jitter, early)
+        loads = loads[1:]
+        print(
+            f"{name:<22} loads {sum(loads):5}"
+            f"  peak {max(loads):4}/s"
+            f"  stdev {statistics.pstdev(loads):6.2f}/s"
+            f"  requests waiting for the database {waited:6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 import os
 from pathlib import Path
 
-import redis.asyncio as redis
 import uvicorn
 from fastapi import Depends
 from fastapi import FastAPI
@@ -9,21 +8,28 @@ from fastapi import HTTPException
 from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf.config import config
 from src.database.db import get_db
-from src.middlewares import ip_middleware
-from src.middlewares import user_agent_middleware
+from src.middlewares.compression import CompressionMiddleware
+from src.middlewares.ip_middleware import ip_policy
+from src.middlewares.user_agent_middleware import user_agent_policy
+from src.middlewares.security import SecurityMiddleware
 from src.routes import auth
+from src.routes import batch
 from src.routes import check_open
 from src.routes import contacts
+from src.routes import metrics
 from src.routes import users
+from src.services.auto_ban import auto_ban
+from src.services.deletions_pruner import deletions_pruner
+from src.services.email_filter import registered_emails
+from src.services.rate_limit import RateLimit
+from src.services.rate_limit import rate_limiter
+from src.services.static_files import PrecompressedStaticFiles
 
 app = FastAPI()
 
@@ -35,20 +41,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["AUTHORIZATION", "HOST", "Content-Type", "origin"],
+    expose_headers=["X-Total-Count"],
+)
+app.add_middleware(
+    SecurityMiddleware,
+    bypass_paths=config.SECURITY_BYPASS_PATHS,
+    strike_paths=config.AUTO_BAN_STRIKE_PATHS,
+)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=config.COMPRESSION_MINIMUM_SIZE,
+    compresslevel=config.COMPRESSION_LEVEL,
 )
-app.middleware("http")(ip_middleware.limit_access_by_ip)
-app.middleware("http")(ip_middleware.ban_ips)
-app.middleware("http")(user_agent_middleware.user_agent_ban_middleware)
 
 BASE_DIR = Path(__file__).parent
 directory = BASE_DIR.joinpath("src").joinpath("static")
-app.mount("/static", StaticFiles(directory=directory), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory=directory), name="static")
 
 
 app.include_router(users.router, prefix="/api")
 app.include_router(check_open.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(contacts.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(batch.router, prefix="/api")
 
 
 @app.on_event("startup")
@@ -61,13 +77,12 @@ async def startup():
     :return: A dictionary with a key called &quot;app&quot;
     :doc-author: Trelent
     """
-    redi = await redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
-    )
-    await FastAPILimiter.init(redi)
+    ip_policy.start(config.IP_POLICY_RELOAD_INTERVAL)
+    user_agent_policy.start(config.USER_AGENT_RELOAD_INTERVAL)
+    auto_ban.start()
+    rate_limiter.start()
+    registered_emails.start(config.EMAIL_FILTER_RELOAD_INTERVAL)
+    deletions_pruner.start(config.CONTACT_DELETIONS_PRUNE_INTERVAL)
 
 
 template = Jinja2Templates(directory="src/templates")
@@ -76,7 +91,7 @@ template = Jinja2Templates(directory="src/templates")
 @app.get(
     "/",
     response_class=HTMLResponse,
-    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
+    dependencies=[Depends(RateLimit(times=2, seconds=5))],
 )
 def root(request: Request):
     """
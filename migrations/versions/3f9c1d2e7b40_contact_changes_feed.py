@@ -0,0 +1,52 @@
+"""contact changes feed
+
+Revision ID: 3f9c1d2e7b40
+Revises: a5e37b18a6cd
+Create Date: 2026-10-19 11:02:17.604512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1d2e7b40'
+down_revision: Union[str, None] = 'a5e37b18a6cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('contact_deletions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('contact_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_contact_deletions_user_id_id', 'contact_deletions', ['user_id', 'id'], unique=False)
+    op.create_index('ix_contacts_user_id_updated_at_id', 'contacts', ['user_id', 'updated_at', 'id'], unique=False)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION contact_deletions_trigger() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO contact_deletions (contact_id, user_id, deleted_at)
+        VALUES (OLD.id, OLD.user_id, now());
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+    CREATE TRIGGER contacts_deletions
+    AFTER DELETE ON contacts
+    FOR EACH ROW EXECUTE FUNCTION contact_deletions_trigger();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS contacts_deletions ON contacts")
+    op.execute("DROP FUNCTION IF EXISTS contact_deletions_trigger()")
+    op.drop_index('ix_contacts_user_id_updated_at_id', table_name='contacts')
+    op.drop_index('ix_contact_deletions_user_id_id', table_name='contact_deletions')
+    op.drop_table('contact_deletions')
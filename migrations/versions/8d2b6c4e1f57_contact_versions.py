@@ -0,0 +1,76 @@
+"""contact versions
+
+Revision ID: 8d2b6c4e1f57
+Revises: 3f9c1d2e7b40
+Create Date: 2026-10-19 15:04:22.507113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2b6c4e1f57'
+down_revision: Union[str, None] = '3f9c1d2e7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('contact_counters', sa.Column('generation', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+    CREATE OR REPLACE FUNCTION contact_counters_apply(
+        p_user_id integer, p_total integer, p_favourites integer
+    ) RETURNS void AS $$
+    BEGIN
+        IF p_user_id IS NOT NULL THEN
+            INSERT INTO contact_counters (user_id, total, favourites)
+            VALUES (p_user_id, 0, 0)
+            ON CONFLICT (user_id) DO NOTHING;
+        END IF;
+        UPDATE contact_counters
+        SET total = total + p_total,
+            favourites = favourites + p_favourites,
+            generation = generation + 1
+        WHERE user_id = p_user_id OR user_id = 0;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    # Every update changes what the contact lists look like, not only the
+    # favourite and owner columns, so the trigger fires on all of them.
+    op.execute("DROP TRIGGER IF EXISTS contacts_counters ON contacts")
+    op.execute("""
+    CREATE TRIGGER contacts_counters
+    AFTER INSERT OR DELETE OR UPDATE ON contacts
+    FOR EACH ROW EXECUTE FUNCTION contact_counters_trigger();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS contacts_counters ON contacts")
+    op.execute("""
+    CREATE TRIGGER contacts_counters
+    AFTER INSERT OR DELETE OR UPDATE OF favourite, user_id ON contacts
+    FOR EACH ROW EXECUTE FUNCTION contact_counters_trigger();
+    """)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION contact_counters_apply(
+        p_user_id integer, p_total integer, p_favourites integer
+    ) RETURNS void AS $$
+    BEGIN
+        IF p_user_id IS NOT NULL THEN
+            INSERT INTO contact_counters (user_id, total, favourites)
+            VALUES (p_user_id, 0, 0)
+            ON CONFLICT (user_id) DO NOTHING;
+        END IF;
+        UPDATE contact_counters
+        SET total = total + p_total, favourites = favourites + p_favourites
+        WHERE user_id = p_user_id OR user_id = 0;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    op.drop_column('contact_counters', 'generation')
+    op.drop_column('contacts', 'version')
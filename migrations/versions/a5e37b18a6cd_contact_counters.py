@@ -0,0 +1,87 @@
+"""contact counters
+
+Revision ID: a5e37b18a6cd
+Revises: b7901d4076dc
+Create Date: 2026-10-19 10:12:41.318270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5e37b18a6cd'
+down_revision: Union[str, None] = 'b7901d4076dc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('contact_counters',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('favourites', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute("""
+    CREATE OR REPLACE FUNCTION contact_counters_apply(
+        p_user_id integer, p_total integer, p_favourites integer
+    ) RETURNS void AS $$
+    BEGIN
+        IF p_user_id IS NOT NULL THEN
+            INSERT INTO contact_counters (user_id, total, favourites)
+            VALUES (p_user_id, 0, 0)
+            ON CONFLICT (user_id) DO NOTHING;
+        END IF;
+        UPDATE contact_counters
+        SET total = total + p_total, favourites = favourites + p_favourites
+        WHERE user_id = p_user_id OR user_id = 0;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION contact_counters_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM contact_counters_apply(
+                OLD.user_id, -1, -COALESCE(OLD.favourite::integer, 0)
+            );
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM contact_counters_apply(
+                NEW.user_id, 1, COALESCE(NEW.favourite::integer, 0)
+            );
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    # Lock contacts while the counters are backfilled, so no write slips
+    # between the backfill and the trigger.
+    op.execute("LOCK TABLE contacts IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+    INSERT INTO contact_counters (user_id, total, favourites)
+    SELECT 0, count(*), count(*) FILTER (WHERE favourite)
+    FROM contacts
+    """)
+    op.execute("""
+    INSERT INTO contact_counters (user_id, total, favourites)
+    SELECT user_id, count(*), count(*) FILTER (WHERE favourite)
+    FROM contacts
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+    """)
+    op.execute("""
+    CREATE TRIGGER contacts_counters
+    AFTER INSERT OR DELETE OR UPDATE OF favourite, user_id ON contacts
+    FOR EACH ROW EXECUTE FUNCTION contact_counters_trigger();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS contacts_counters ON contacts")
+    op.execute("DROP FUNCTION IF EXISTS contact_counters_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS contact_counters_apply(integer, integer, integer)")
+    op.drop_table('contact_counters')
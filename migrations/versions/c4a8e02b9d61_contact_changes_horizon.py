@@ -0,0 +1,32 @@
+"""contact changes horizon
+
+Revision ID: c4a8e02b9d61
+Revises: f1dc26f53c2f
+Create Date: 2026-10-19 19:03:52.840115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a8e02b9d61'
+down_revision: Union[str, None] = 'f1dc26f53c2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Contacts without updated_at never showed up in the changes feed.
+    op.execute("UPDATE contacts SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL")
+    op.drop_index('ix_contact_deletions_user_id_id', table_name='contact_deletions')
+    op.create_index('ix_contact_deletions_user_id_deleted_at_id', 'contact_deletions', ['user_id', 'deleted_at', 'id'], unique=False)
+    op.create_index('ix_contact_deletions_deleted_at', 'contact_deletions', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contact_deletions_deleted_at', table_name='contact_deletions')
+    op.drop_index('ix_contact_deletions_user_id_deleted_at_id', table_name='contact_deletions')
+    op.create_index('ix_contact_deletions_user_id_id', 'contact_deletions', ['user_id', 'id'], unique=False)
@@ -0,0 +1,74 @@
+"""contact counters per owner
+
+Revision ID: f1dc26f53c2f
+Revises: 8d2b6c4e1f57
+Create Date: 2026-10-19 18:21:09.114602
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1dc26f53c2f'
+down_revision: Union[str, None] = '8d2b6c4e1f57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Every contact write updated the global row user_id = 0 as well, so all
+    # writes queued on its lock. The trigger now touches the owner's row only;
+    # row 0 counts the contacts without an owner and the totals are summed.
+    op.execute("""
+    CREATE OR REPLACE FUNCTION contact_counters_apply(
+        p_user_id integer, p_total integer, p_favourites integer
+    ) RETURNS void AS $$
+    BEGIN
+        INSERT INTO contact_counters (user_id, total, favourites, generation)
+        VALUES (COALESCE(p_user_id, 0), p_total, p_favourites, 1)
+        ON CONFLICT (user_id) DO UPDATE
+        SET total = contact_counters.total + EXCLUDED.total,
+            favourites = contact_counters.favourites + EXCLUDED.favourites,
+            generation = contact_counters.generation + 1;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    op.execute("LOCK TABLE contacts IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+    UPDATE contact_counters
+    SET total = (SELECT count(*) FROM contacts WHERE user_id IS NULL),
+        favourites = (SELECT count(*) FROM contacts WHERE user_id IS NULL AND favourite)
+    WHERE user_id = 0
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+    CREATE OR REPLACE FUNCTION contact_counters_apply(
+        p_user_id integer, p_total integer, p_favourites integer
+    ) RETURNS void AS $$
+    BEGIN
+        IF p_user_id IS NOT NULL THEN
+            INSERT INTO contact_counters (user_id, total, favourites)
+            VALUES (p_user_id, 0, 0)
+            ON CONFLICT (user_id) DO NOTHING;
+        END IF;
+        UPDATE contact_counters
+        SET total = total + p_total,
+            favourites = favourites + p_favourites,
+            generation = generation + 1
+        WHERE user_id = p_user_id OR user_id = 0;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+    op.execute("LOCK TABLE contacts IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("""
+    INSERT INTO contact_counters (user_id, total, favourites)
+    SELECT 0, count(*), count(*) FILTER (WHERE favourite)
+    FROM contacts
+    ON CONFLICT (user_id) DO UPDATE
+    SET total = EXCLUDED.total, favourites = EXCLUDED.favourites
+    """)
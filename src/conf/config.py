@@ -17,9 +17,48 @@ class Settings(BaseSettings):
     REDIS_DOMAIN: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str = "None"
+    REDIS_TIMEOUT_MS: int = 250
+    REDIS_BREAKER_FAILURES: int = 5
+    REDIS_BREAKER_RESET: int = 5
     CLOUDINARY_NAME: str = "name"
     CLOUDINARY_API_KEY: int = 568222682695474123123
     CLOUDINARY_API_SECRET: str = "secret"
+    SEARCH_CACHE_TTL: int = 30
+    SEARCH_CACHE_MAX_ROWS: int = 200
+    CONTACT_EVENTS_HISTORY: int = 1000
+    CONTACT_EVENTS_QUEUE_SIZE: int = 100
+    CONTACT_EVENTS_HEARTBEAT: int = 15
+    CONTACT_EVENTS_RETRY_MS: int = 3000
+    CONTACT_CHANGES_LAG: int = 5
+    CONTACT_DELETIONS_RETENTION_DAYS: int = 30
+    CONTACT_DELETIONS_PRUNE_INTERVAL: int = 60 * 60
+    CONTACT_COUNTS_EXACT_OWNERS: int = 10_000
+    RESPONSE_CACHE_TTL: int = 60
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    COMPRESSION_LEVEL: int = 6
+    STATIC_MAX_AGE: int = 7 * 24 * 60 * 60
+    SECURITY_BYPASS_PATHS: list[str] = ["/static", "/api/healthchecker"]
+    IP_ALLOW_FILE: str = ""
+    IP_DENY_FILE: str = ""
+    IP_POLICY_RELOAD_INTERVAL: int = 30
+    USER_AGENT_BAN_FILE: str = ""
+    USER_AGENT_CACHE_SIZE: int = 4096
+    USER_AGENT_RELOAD_INTERVAL: int = 30
+    AUTO_BAN_THRESHOLD: int = 10
+    AUTO_BAN_WINDOW: int = 60
+    AUTO_BAN_BASE_TTL: int = 60
+    AUTO_BAN_MAX_TTL: int = 24 * 60 * 60
+    AUTO_BAN_STRIKE_PATHS: list[str] = ["/api/auth/login"]
+    RATE_LIMIT_SYNC_MS: int = 100
+    TRUSTED_PROXIES: list[str] = []
+    CACHE_BACKEND: str = "redis"
+    CACHE_MAX_ENTRIES: int = 100_000
+    USER_CACHE_TTL: int = 300
+    USER_CACHE_JITTER: float = 0.1
+    USER_CACHE_BETA: float = 1.0
+    EMAIL_FILTER_CAPACITY: int = 1_000_000
+    EMAIL_FILTER_ERROR_RATE: float = 0.001
+    EMAIL_FILTER_RELOAD_INTERVAL: int = 5 * 60
 
     @field_validator("ALGORITHM")
     @classmethod
@@ -39,6 +78,22 @@ class Settings(BaseSettings):
             raise ValueError("ALGORITHM must be HS256 or HS512")
         return v
 
+    @field_validator("CACHE_BACKEND")
+    @classmethod
+    def validate_cache_backend(cls, v):
+        """
+        The validate_cache_backend function checks the backend of the caches and rate limits:
+        redis shares them between the workers, memory keeps them in the process and needs no Redis server.
+
+        :param cls: Pass the class object to the function
+        :param v: Pass the name of the backend that is being validated
+        :return: The value of the argument v
+        :doc-author: Trelent
+        """
+        if v not in ["memory", "redis"]:
+            raise ValueError("CACHE_BACKEND must be memory or redis")
+        return v
+
     class Config:
         extra = "ignore"
         env_file = ".env"
@@ -7,3 +7,9 @@ VERIFICATION_ERROR = "Verification error"
 ALREADY_CONFIRMED = "Your email is already confirmed"
 EMAIL_CONFIRMED = "Email confirmed"
 CHECK_YOUR_EMAIL = "Check your email."
+INVALID_CURSOR = "Invalid cursor"
+CURSOR_EXPIRED = "The cursor is too old, sync everything again"
+PRECONDITION_FAILED = "The resource was changed, reload it and try again"
+INVALID_FIELDS = "Unknown fields"
+TOO_MANY_REQUESTS = "Too Many Requests"
+BANNED = "You are banned"
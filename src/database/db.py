@@ -1,5 +1,6 @@
 import contextlib
 
+from fastapi import Request
 from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.ext.asyncio import create_async_engine
@@ -52,15 +53,22 @@ class DataBaseSessionManager:
 sessionmanager = DataBaseSessionManager(config.DB_URL)
 
 
-async def get_db():
+async def get_db(request: Request):
     """
     The get_db function is a coroutine that returns an async context manager.
     When the context manager is entered, it yields a database session; when the
     context manager exits, it closes the session. The get_db function itself can be
     used as an async context manager:
+    Sub-requests of a batch find the batch's session in request.state and reuse it,
+    the batch request closes it.
 
+    :param request: Request: Look for a session shared by a batch
     :return: A context manager that allows you to use async with
     :doc-author: Trelent
     """
+    shared_session = getattr(request.state, "db_session", None)
+    if shared_session is not None:
+        yield shared_session
+        return
     async with sessionmanager.session() as session:
         yield session
@@ -4,9 +4,12 @@ from datetime import date
 from sqlalchemy import Boolean
 from sqlalchemy import Date
 from sqlalchemy import DateTime
+from sqlalchemy import DDL
 from sqlalchemy import Enum
+from sqlalchemy import event
 from sqlalchemy import ForeignKey
 from sqlalchemy import func
+from sqlalchemy import Index
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy.orm import DeclarativeBase
@@ -37,6 +40,12 @@ class Contact(Base):
     )
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
     user: Mapped["User"] = relationship("User", backref="contacts", lazy="joined")
+    version: Mapped[int] = mapped_column(Integer, server_default="1")
+
+    __table_args__ = (
+        Index("ix_contacts_user_id_updated_at_id", "user_id", "updated_at", "id"),
+    )
+    __mapper_args__ = {"version_id_col": version}
 
 
 class Role(enum.Enum):
@@ -63,3 +72,158 @@ class User(Base):
     confirmed: Mapped[bool] = mapped_column(Boolean, default=False, nullable=True)
 
 
+# Contacts without an owner are counted in the row user_id = 0.
+class ContactCounter(Base):
+    __tablename__ = "contact_counters"
+    user_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    total: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    favourites: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    generation: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+
+class ContactDeletion(Base):
+    __tablename__ = "contact_deletions"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    contact_id: Mapped[int] = mapped_column(Integer)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    deleted_at: Mapped[date] = mapped_column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_contact_deletions_user_id_deleted_at_id", "user_id", "deleted_at", "id"),
+        Index("ix_contact_deletions_deleted_at", "deleted_at"),
+    )
+
+
+CONTACT_COUNTERS_PG_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION contact_counters_apply(
+    p_user_id integer, p_total integer, p_favourites integer
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO contact_counters (user_id, total, favourites, generation)
+    VALUES (COALESCE(p_user_id, 0), p_total, p_favourites, 1)
+    ON CONFLICT (user_id) DO UPDATE
+    SET total = contact_counters.total + EXCLUDED.total,
+        favourites = contact_counters.favourites + EXCLUDED.favourites,
+        generation = contact_counters.generation + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION contact_counters_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM contact_counters_apply(
+            OLD.user_id, -1, -COALESCE(OLD.favourite::integer, 0)
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM contact_counters_apply(
+            NEW.user_id, 1, COALESCE(NEW.favourite::integer, 0)
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+CONTACT_COUNTERS_PG_TRIGGER = """
+CREATE TRIGGER contacts_counters
+AFTER INSERT OR DELETE OR UPDATE ON contacts
+FOR EACH ROW EXECUTE FUNCTION contact_counters_trigger();
+"""
+
+CONTACT_DELETIONS_PG_FUNCTION = """
+CREATE OR REPLACE FUNCTION contact_deletions_trigger() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO contact_deletions (contact_id, user_id, deleted_at)
+    VALUES (OLD.id, OLD.user_id, now());
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+CONTACT_DELETIONS_PG_TRIGGER = """
+CREATE TRIGGER contacts_deletions
+AFTER DELETE ON contacts
+FOR EACH ROW EXECUTE FUNCTION contact_deletions_trigger();
+"""
+
+CONTACT_DELETIONS_SQLITE_TRIGGER = """
+CREATE TRIGGER contacts_deletions AFTER DELETE ON contacts
+BEGIN
+    INSERT INTO contact_deletions (contact_id, user_id, deleted_at)
+    VALUES (OLD.id, OLD.user_id, CURRENT_TIMESTAMP);
+END
+"""
+
+CONTACT_COUNTERS_SQLITE_TRIGGERS = (
+    """
+    CREATE TRIGGER contacts_counters_insert AFTER INSERT ON contacts
+    BEGIN
+        INSERT OR IGNORE INTO contact_counters (user_id, total, favourites)
+        VALUES (COALESCE(NEW.user_id, 0), 0, 0);
+        UPDATE contact_counters
+        SET total = total + 1,
+            favourites = favourites + COALESCE(NEW.favourite, 0),
+            generation = generation + 1
+        WHERE user_id = COALESCE(NEW.user_id, 0);
+    END
+    """,
+    """
+    CREATE TRIGGER contacts_counters_delete AFTER DELETE ON contacts
+    BEGIN
+        UPDATE contact_counters
+        SET total = total - 1,
+            favourites = favourites - COALESCE(OLD.favourite, 0),
+            generation = generation + 1
+        WHERE user_id = COALESCE(OLD.user_id, 0);
+    END
+    """,
+    """
+    CREATE TRIGGER contacts_counters_update AFTER UPDATE ON contacts
+    BEGIN
+        UPDATE contact_counters
+        SET total = total - 1,
+            favourites = favourites - COALESCE(OLD.favourite, 0),
+            generation = generation + 1
+        WHERE user_id = COALESCE(OLD.user_id, 0);
+        INSERT OR IGNORE INTO contact_counters (user_id, total, favourites)
+        VALUES (COALESCE(NEW.user_id, 0), 0, 0);
+        UPDATE contact_counters
+        SET total = total + 1,
+            favourites = favourites + COALESCE(NEW.favourite, 0),
+            generation = generation + 1
+        WHERE user_id = COALESCE(NEW.user_id, 0);
+    END
+    """,
+)
+
+# The counters and the deletions log are kept by triggers, so every write path
+# (ORM, bulk statements, manual SQL) updates them in the same transaction.
+# Every write also bumps the generation of the owner's row, which is what list
+# ETags are keyed on, and touches no other row, so writes of different users
+# don't wait for each other. Production gets them from the alembic migration;
+# the DDL below covers metadata.create_all (e.g. the test database).
+event.listen(
+    Contact.__table__,
+    "after_create",
+    DDL(CONTACT_COUNTERS_PG_FUNCTIONS).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Contact.__table__,
+    "after_create",
+    DDL(CONTACT_COUNTERS_PG_TRIGGER).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Contact.__table__,
+    "after_create",
+    DDL(CONTACT_DELETIONS_PG_FUNCTION).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Contact.__table__,
+    "after_create",
+    DDL(CONTACT_DELETIONS_PG_TRIGGER).execute_if(dialect="postgresql"),
+)
+for trigger in (*CONTACT_COUNTERS_SQLITE_TRIGGERS, CONTACT_DELETIONS_SQLITE_TRIGGER):
+    event.listen(
+        Contact.__table__, "after_create", DDL(trigger).execute_if(dialect="sqlite")
+    )
@@ -0,0 +1,12 @@
+import redis.asyncio as redis
+
+from src.conf.config import config
+
+redis_client = redis.Redis(
+    host=config.REDIS_DOMAIN,
+    port=config.REDIS_PORT,
+    db=0,
+    password=config.REDIS_PASSWORD,
+    socket_timeout=config.REDIS_TIMEOUT_MS / 1000,
+    socket_connect_timeout=config.REDIS_TIMEOUT_MS / 1000,
+)
@@ -0,0 +1,169 @@
+from starlette.datastructures import Headers
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.middleware.gzip import GZipResponder
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+# Formats that are compressed already (or streamed, like server-sent events,
+# where buffering the gzip stream would hold events back) are sent as they are.
+SKIPPED_MEDIA_TYPES = (
+    "image/",
+    "video/",
+    "audio/",
+    "font/woff",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zip",
+    "application/pdf",
+    "application/octet-stream",
+    "text/event-stream",
+)
+COMPRESSIBLE_IMAGES = ("image/svg+xml",)
+# A gzip body is a different representation than the plain one, so it can't share
+# its strong ETag; the tag gets this suffix, which is removed again from the
+# conditional headers of the requests so the routes compare their own tags.
+GZIP_ETAG_SUFFIX = "-gzip"
+CONDITIONAL_HEADERS = (b"if-none-match", b"if-match")
+
+
+def is_compressible(content_type: str) -> bool:
+    """
+    The is_compressible function tells whether gzip is worth running on a media type.
+
+    :param content_type: str: The Content-Type header of the response
+    :return: True if the body should be compressed
+    :doc-author: Trelent
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in COMPRESSIBLE_IMAGES:
+        return True
+    return not media_type.startswith(SKIPPED_MEDIA_TYPES)
+
+
+def gzip_etag(etag: str) -> str:
+    """
+    The gzip_etag function returns the ETag of the gzip variant of a response.
+    Weak tags already allow other encodings of the same content and are kept.
+
+    :param etag: str: The ETag of the plain response
+    :return: The ETag of the gzip response
+    :doc-author: Trelent
+    """
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    if etag.endswith(f'{GZIP_ETAG_SUFFIX}"'):
+        return etag
+    return f'{etag[:-1]}{GZIP_ETAG_SUFFIX}"'
+
+
+def strip_gzip_etags(scope: Scope) -> Scope:
+    """
+    The strip_gzip_etags function removes the gzip suffix from the tags in
+    If-None-Match and If-Match, so the application sees the tags it made.
+
+    :param scope: Scope: The ASGI connection scope
+    :return: The scope, a copy with new headers if a tag had the suffix
+    :doc-author: Trelent
+    """
+    suffix = f'{GZIP_ETAG_SUFFIX}"'.encode()
+    if not any(
+        name in CONDITIONAL_HEADERS and suffix in value for name, value in scope["headers"]
+    ):
+        return scope
+    headers = [
+        (name, value.replace(suffix, b'"') if name in CONDITIONAL_HEADERS else value)
+        for name, value in scope["headers"]
+    ]
+    return {**scope, "headers": headers}
+
+
+class CompressionResponder(GZipResponder):
+    def __init__(self, *args, if_none_match: str = "", **kwargs):
+        """
+        The __init__ function sets up the responder of one request.
+
+        :param self: Represent the instance of the class
+        :param args: The arguments of GZipResponder
+        :param if_none_match: str: The If-None-Match header the client sent
+        :param kwargs: The keyword arguments of GZipResponder
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        super().__init__(*args, **kwargs)
+        self.if_none_match = if_none_match
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        The __call__ function runs the Starlette responder and gives the ETag of a
+        response it compressed the gzip suffix. A 304 keeps the tag the client
+        revalidated, so a cached gzip variant stays matched.
+
+        :param self: Represent the instance of the class
+        :param scope: Scope: The ASGI connection scope
+        :param receive: Receive: Receive ASGI messages from the client
+        :param send: Send: Send ASGI messages to the client
+        :return: Nothing
+        :doc-author: Trelent
+        """
+
+        async def send_tagged(message: Message):
+            if message["type"] == "http.response.start" and not self.content_encoding_set:
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if etag is not None and (
+                    "content-encoding" in headers
+                    or message["status"] == 304 and gzip_etag(etag) in self.if_none_match
+                ):
+                    headers["etag"] = gzip_etag(etag)
+            await send(message)
+
+        await super().__call__(scope, receive, send_tagged)
+
+    async def send_with_gzip(self, message: Message) -> None:
+        """
+        The send_with_gzip function lets the Starlette responder handle the response,
+        but marks responses with an incompressible media type like already encoded
+        ones, so their body is passed through untouched.
+
+        :param self: Represent the instance of the class
+        :param message: Message: The ASGI message sent by the application
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start" and not self.content_encoding_set:
+            headers = Headers(raw=message["headers"])
+            self.content_encoding_set = not is_compressible(
+                headers.get("content-type", "")
+            )
+
+
+class CompressionMiddleware(GZipMiddleware):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        The __call__ function compresses responses for clients that accept gzip.
+        Bodies under minimum_size are sent as they are, the level comes from the settings.
+        Compressed responses get their own ETag, see gzip_etag.
+
+        :param self: Represent the instance of the class
+        :param scope: Scope: The ASGI connection scope
+        :param receive: Receive: Receive ASGI messages from the client
+        :param send: Send: Send ASGI messages to the client
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "gzip" in headers.get("accept-encoding", ""):
+                responder = CompressionResponder(
+                    self.app,
+                    self.minimum_size,
+                    compresslevel=self.compresslevel,
+                    if_none_match=headers.get("if-none-match", ""),
+                )
+                await responder(strip_gzip_etags(scope), receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,150 @@
+from ipaddress import ip_address
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from src.middlewares import ip_middleware
+from src.middlewares import user_agent_middleware
+from src.services.auto_ban import auto_ban
+from src.services.client_address import client_address
+
+BANNED = JSONResponse(
+    status_code=status.HTTP_403_FORBIDDEN, content={"detail": "You are banned"}
+)
+NOT_ALLOWED = JSONResponse(
+    status_code=status.HTTP_403_FORBIDDEN, content={"detail": "Not allowed IP address"}
+)
+
+
+def client_ip(scope: Scope):
+    """
+    The client_ip function parses the client's address, which comes from
+    X-Forwarded-For when the connection is made by a trusted proxy.
+
+    :param scope: Scope: The ASGI connection scope
+    :return: An IPv4Address or IPv6Address, or None if the address can't be parsed
+    :doc-author: Trelent
+    """
+    try:
+        return ip_address(client_address(scope))
+    except ValueError:
+        return None
+
+
+def header(scope: Scope, name: bytes) -> str:
+    """
+    The header function returns one request header straight from the raw ASGI headers.
+
+    :param scope: Scope: The ASGI connection scope
+    :param name: bytes: The lowercased header name
+    :return: The header value, an empty string if it is missing
+    :doc-author: Trelent
+    """
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class SecurityMiddleware:
+    def __init__(
+        self, app: ASGIApp, bypass_paths: list[str] = (), strike_paths: list[str] = ()
+    ):
+        """
+        The __init__ function sets up the security middleware. It is a plain ASGI
+        middleware, so a request costs one function call instead of a task and a
+        streamed response per policy like @app.middleware("http") did.
+
+        :param self: Represent the instance of the class
+        :param app: ASGIApp: The application to protect
+        :param bypass_paths: list[str]: Paths (and everything below them) that skip the policies
+        :param strike_paths: list[str]: Paths where a 401 counts towards an automatic ban, like the login
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.app = app
+        self.bypass_exact = tuple(path.rstrip("/") or "/" for path in bypass_paths)
+        self.bypass_prefixes = tuple(path.rstrip("/") + "/" for path in bypass_paths)
+        self.strike_paths = frozenset(strike_paths)
+
+    def bypassed(self, path: str) -> bool:
+        """
+        The bypassed function checks the bypass table, e.g. /static or the health check.
+
+        :param self: Represent the instance of the class
+        :param path: str: The request path
+        :return: True if the request is not checked
+        :doc-author: Trelent
+        """
+        return path in self.bypass_exact or path.startswith(self.bypass_prefixes)
+
+    def verdict(self, scope: Scope, ip):
+        """
+        The verdict function applies every policy in one pass: the client's IP and
+        User-Agent are parsed once and checked in the order the old middlewares ran.
+
+        :param self: Represent the instance of the class
+        :param scope: Scope: The ASGI connection scope
+        :param ip: IPv4Address | IPv6Address | None: The client's address from client_ip
+        :return: The 403 response to send, or None if the request may go on
+        :doc-author: Trelent
+        """
+        if user_agent_middleware.is_user_agent_banned(header(scope, b"user-agent")):
+            return BANNED
+        if ip is None:
+            return NOT_ALLOWED
+        if auto_ban.is_banned(str(ip)):
+            return BANNED
+        if ip_middleware.is_ip_banned(ip):
+            return BANNED
+        if not ip_middleware.is_ip_allowed(ip):
+            return NOT_ALLOWED
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """
+        The __call__ function rejects requests that fail a policy with 403 and passes
+        the others to the application. A 401 on one of the strike paths counts as a strike
+        towards an automatic ban of the client's IP, and so does a 429 for which the rate
+        limit left the address to strike in request.state.strike_ip.
+        Headers that dependencies put in request.state.response_headers, like the
+        RateLimit-* headers, are added to the response whatever the route returns.
+
+        :param self: Represent the instance of the class
+        :param scope: Scope: The ASGI connection scope
+        :param receive: Receive: Receive ASGI messages from the client
+        :param send: Send: Send ASGI messages to the client
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if scope["type"] != "http" or self.bypassed(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        ip = client_ip(scope)
+        response = self.verdict(scope, ip)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        status_code = None
+        state = scope.setdefault("state", {})
+
+        async def send_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                extra = state.get("response_headers")
+                if extra:
+                    message["headers"] = [*message.get("headers", ())] + [
+                        (name.lower().encode(), value.encode()) for name, value in extra.items()
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_status)
+        if status_code == status.HTTP_429_TOO_MANY_REQUESTS and state.get("strike_ip"):
+            await auto_ban.strike(state["strike_ip"])
+        elif status_code == status.HTTP_401_UNAUTHORIZED and scope["path"] in self.strike_paths:
+            await auto_ban.strike(str(ip))
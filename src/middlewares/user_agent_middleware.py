@@ -1,30 +1,23 @@
-import re
-from typing import Callable
-
-from fastapi import Request
-from fastapi import status
-from fastapi.responses import JSONResponse
+from src.conf.config import config
+from src.services.user_agent_policy import UserAgentPolicy
 
 user_agent_ban_list = [r"bot-Yandex", r"Googlebot"]
 
+user_agent_policy = UserAgentPolicy(
+    user_agent_ban_list,
+    file=config.USER_AGENT_BAN_FILE,
+    cache_size=config.USER_AGENT_CACHE_SIZE,
+)
+
 
-async def user_agent_ban_middleware(request: Request, call_next: Callable):
+def is_user_agent_banned(user_agent: str) -> bool:
     """
-    The user_agent_ban_middleware function is a middleware function that checks the user-agent header of an incoming request.
-    If the user-agent matches any of the patterns in our ban list, then we return a 403 Forbidden response with a detail message.
-    Otherwise, we call next and return whatever response comes back from that.
+    The is_user_agent_banned function checks the user-agent header of an incoming request.
+    If the user-agent matches any of the patterns in our ban list, the security middleware
+    returns a 403 Forbidden response.
 
-    :param request: Request: Access the request object
-    :param call_next: Callable: Call the next middleware in the chain
-    :return: A jsonresponse object with a status code of 403 and a content of {&quot;detail&quot;: &quot;you are banned&quot;}
+    :param user_agent: str: The User-Agent header, an empty string if it is missing
+    :return: True if the user agent is banned
     :doc-author: Trelent
     """
-    user_agent = request.headers.get("user-agent")
-    for ban_pattern in user_agent_ban_list:
-        if re.search(ban_pattern, user_agent):
-            return JSONResponse(
-                status_code=status.HTTP_403_FORBIDDEN,
-                content={"detail": "You are banned"},
-            )
-    response = await call_next(request)
-    return response
+    return user_agent_policy.is_banned(user_agent)
@@ -1,20 +1,65 @@
 from datetime import datetime
 from datetime import timedelta
 
+from fastapi import HTTPException
+from fastapi import status
+from sqlalchemy import delete
 from sqlalchemy import extract
 from sqlalchemy import func
 from sqlalchemy import or_
 from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy import tuple_
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm import noload
+from sqlalchemy.orm.exc import StaleDataError
 
+from src.conf import messages
 from src.database.models import Contact
+from src.database.models import ContactCounter
+from src.database.models import ContactDeletion
 from src.database.models import User
+from src.schemas.contact import ContactPatchSchema
 from src.schemas.contact import ContactSchema
 from src.schemas.contact import ContactStatusUpdate
 from src.schemas.contact import ContactUpdateSchema
+from src.services.contact_events import publish_contact_event
+from src.services.etag import contact_etag
+from src.services.etag import match
+from src.services.response_cache import response_cache
+from src.services.search_cache import row_to_contact
+from src.services.search_cache import search_cache
+from src.services.sync_cursor import SyncCursor
 
 
-async def get_contacts(limit: int, offset: int, db: AsyncSession, current_user: User):
+def only_fields(stmt, fields: tuple[str, ...] | None):
+    """
+    The only_fields function limits a contact query to the fields of a sparse response.
+    Columns that were not asked for are not selected, and the owner is only joined
+    if the user field was asked for.
+
+    :param stmt: The select of contacts
+    :param fields: tuple[str, ...] | None: The fields of the response, None for all of them
+    :return: The select with the loader options applied
+    :doc-author: Trelent
+    """
+    if fields is None:
+        return stmt
+    columns = [getattr(Contact, name) for name in fields if name != "user"]
+    if "user" in fields:
+        return stmt.options(load_only(*columns, Contact.user_id))
+    return stmt.options(load_only(*columns), noload(Contact.user))
+
+
+async def get_contacts(
+    limit: int,
+    offset: int,
+    db: AsyncSession,
+    current_user: User,
+    fields: tuple[str, ...] | None = None,
+):
     """
     The get_contacts function returns a list of contacts for the current user.
         The limit and offset parameters are used to paginate the results.
@@ -24,10 +69,12 @@ async def get_contacts(limit: int, offset: int, db: AsyncSession, current_user:
     :param offset: int: Skip the first n rows of the database
     :param db: AsyncSession: Pass the database connection to the function
     :param current_user: User: Filter the contacts by user
+    :param fields: tuple[str, ...] | None: Load only these fields, None for all of them
     :return: A list of contacts
     :doc-author: Trelent
     """
     stmt = select(Contact).filter_by(user=current_user).offset(offset).limit(limit)
+    stmt = only_fields(stmt, fields)
     contacts = await db.execute(stmt)
     return contacts.scalars().all()
 
@@ -64,6 +111,62 @@ async def get_contact(contact_id: int, db: AsyncSession, current_user: User):
     return contact.scalar_one_or_none()
 
 
+async def get_contact_version(contact_id: int, db: AsyncSession, current_user: User):
+    """
+    The get_contact_version function returns only the version of a contact.
+    It is enough to compute the contact's ETag, so a conditional GET can be
+    answered without loading and serializing the row.
+
+    :param contact_id: int: Specify the contact id
+    :param db: AsyncSession: Pass in the database session
+    :param current_user: User: Ensure that the user can only access their own contacts
+    :return: The version of the contact, or None if it doesn't exist
+    :doc-author: Trelent
+    """
+    stmt = select(Contact.version).where(
+        Contact.id == contact_id, Contact.user_id == current_user.id
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def commit_versioned(db: AsyncSession):
+    """
+    The commit_versioned function commits the changes made to a loaded contact.
+    The UPDATE is guarded by the version the contact was loaded with, so a write
+    that slipped in after the If-Match check fails with 412 instead of being lost.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=messages.PRECONDITION_FAILED,
+        )
+
+
+def check_if_match(contact: Contact, if_match: str | None, current_user: User):
+    """
+    The check_if_match function rejects a write made against an old copy of the contact.
+
+    :param contact: Contact: The contact as it is stored now
+    :param if_match: str | None: The If-Match header of the request
+    :param current_user: User: The owner of the contact
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    if not match(if_match, contact_etag(contact.id, contact.version, current_user)):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=messages.PRECONDITION_FAILED,
+        )
+
+
 async def create_contact(body: ContactSchema, db: AsyncSession, current_user: User):
     """
     The create_contact function creates a new contact in the database.
@@ -77,12 +180,18 @@ async def create_contact(body: ContactSchema, db: AsyncSession, current_user: Us
     contact = Contact(**body.model_dump(exclude_unset=True), user=current_user)
     db.add(contact)
     await db.commit()
+    await response_cache.invalidate(current_user.id)
     await db.refresh(contact)
+    await publish_contact_event(current_user.id, "created", [contact.id])
     return contact
 
 
 async def update_contact(
-    contact_id: int, body: ContactUpdateSchema, db: AsyncSession, current_user: User
+    contact_id: int,
+    body: ContactUpdateSchema,
+    db: AsyncSession,
+    current_user: User,
+    if_match: str | None = None,
 ):
     """
     The update_contact function updates a contact in the database.
@@ -91,6 +200,7 @@ async def update_contact(
     :param body: ContactUpdateSchema: Validate the data sent in the request body
     :param db: AsyncSession: Access the database
     :param current_user: User: Check if the user is authenticated
+    :param if_match: str | None: The If-Match header, the update fails with 412 if it is stale
     :return: A contact object, which is the same as what we get from the create_contact function
     :doc-author: Trelent
     """
@@ -98,6 +208,7 @@ async def update_contact(
     result = await db.execute(stmt)
     contact = result.scalar_one_or_none()
     if contact:
+        check_if_match(contact, if_match, current_user)
         contact.name = body.name
         contact.lastname = body.lastname
         contact.email = body.email
@@ -105,8 +216,10 @@ async def update_contact(
         contact.birthday = body.birthday
         contact.notes = body.notes
         contact.favourite = body.favourite
-        await db.commit()
+        await commit_versioned(db)
+        await response_cache.invalidate(current_user.id)
         await db.refresh(contact)
+        await publish_contact_event(current_user.id, "updated", [contact.id])
     return contact
 
 
@@ -126,11 +239,17 @@ async def delete_contact(contact_id: int, db: AsyncSession, current_user: User):
     if contact:
         await db.delete(contact)
         await db.commit()
+        await response_cache.invalidate(current_user.id)
+        await publish_contact_event(current_user.id, "deleted", [contact.id])
     return contact
 
 
 async def update_status_contact(
-    contact_id: int, body: ContactStatusUpdate, db: AsyncSession, current_user: User
+    contact_id: int,
+    body: ContactStatusUpdate,
+    db: AsyncSession,
+    current_user: User,
+    if_match: str | None = None,
 ):
     """
     The update_status_contact function updates the status of a contact.
@@ -139,6 +258,7 @@ async def update_status_contact(
     :param body: ContactStatusUpdate: Get the favourite status of a contact
     :param db: AsyncSession: Pass the database session to the function
     :param current_user: User: Ensure that the user is only able to update their own contacts
+    :param if_match: str | None: The If-Match header, the update fails with 412 if it is stale
     :return: A contact object
     :doc-author: Trelent
     """
@@ -146,24 +266,127 @@ async def update_status_contact(
     result = await db.execute(stmt)
     contact = result.scalar_one_or_none()
     if contact:
+        check_if_match(contact, if_match, current_user)
         contact.favourite = body.favourite
-        await db.commit()
+        await commit_versioned(db)
+        await response_cache.invalidate(current_user.id)
         await db.refresh(contact)
+        await publish_contact_event(current_user.id, "updated", [contact.id])
     return contact
 
 
-async def search_contacts(search: str, db: AsyncSession, current_user: User):
+async def bulk_delete_contacts(ids: list[int], db: AsyncSession, current_user: User):
+    """
+    The bulk_delete_contacts function deletes many contacts with one DELETE statement.
+    Ids that don't exist or belong to another user are ignored.
+
+    :param ids: list[int]: The ids of the contacts to delete
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: Ensure that the user is only deleting their own contacts
+    :return: The ids of the contacts that were deleted
+    :doc-author: Trelent
+    """
+    stmt = (
+        delete(Contact)
+        .where(Contact.user_id == current_user.id, Contact.id.in_(ids))
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    deleted = list(result.scalars().all())
+    await db.commit()
+    await response_cache.invalidate(current_user.id)
+    await publish_contact_event(current_user.id, "deleted", deleted)
+    return deleted
+
+
+async def bulk_update_contacts(
+    ids: list[int], values: dict, db: AsyncSession, current_user: User
+):
+    """
+    The bulk_update_contacts function sets the same values on many contacts
+    with one UPDATE statement. Ids that don't exist or belong to another user are ignored.
+
+    :param ids: list[int]: The ids of the contacts to update
+    :param values: dict: The columns to set and their new values
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: Ensure that the user is only updating their own contacts
+    :return: The ids of the contacts that were updated
+    :doc-author: Trelent
+    """
+    stmt = (
+        update(Contact)
+        .where(Contact.user_id == current_user.id, Contact.id.in_(ids))
+        .values(**values, version=Contact.version + 1)
+        .returning(Contact.id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    updated = list(result.scalars().all())
+    await db.commit()
+    await response_cache.invalidate(current_user.id)
+    await publish_contact_event(current_user.id, "updated", updated)
+    return updated
+
+
+async def bulk_update_status_contacts(
+    ids: list[int], favourite: bool, db: AsyncSession, current_user: User
+):
+    """
+    The bulk_update_status_contacts function sets the favourite status of many contacts.
+
+    :param ids: list[int]: The ids of the contacts to update
+    :param favourite: bool: The new favourite status
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: Ensure that the user is only updating their own contacts
+    :return: The ids of the contacts that were updated
+    :doc-author: Trelent
+    """
+    return await bulk_update_contacts(ids, {"favourite": favourite}, db, current_user)
+
+
+async def bulk_patch_contacts(
+    ids: list[int], body: ContactPatchSchema, db: AsyncSession, current_user: User
+):
+    """
+    The bulk_patch_contacts function sets the fields given in the body on many contacts.
+    Only the fields that were sent are changed.
+
+    :param ids: list[int]: The ids of the contacts to update
+    :param body: ContactPatchSchema: The fields to change
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: Ensure that the user is only updating their own contacts
+    :return: The ids of the contacts that were updated
+    :doc-author: Trelent
+    """
+    values = body.model_dump(exclude_unset=True)
+    return await bulk_update_contacts(ids, values, db, current_user)
+
+
+async def search_contacts(
+    search: str,
+    db: AsyncSession,
+    current_user: User,
+    fields: tuple[str, ...] | None = None,
+):
     """
     The search_contacts function searches for contacts in the database.
         It takes a search string and returns all contacts that match the search criteria.
+        Results are kept in a short-lived cache shared by the workers, and a longer search
+        term is answered from the cached result of its prefix without querying the database.
+        Sparse results are not cached, the cache only holds complete contacts.
 
 
     :param search: str: Filter the contacts by name, lastname or email
     :param db: AsyncSession: Pass the database session to the function
     :param current_user: User: Filter the results by the user that is currently logged in
+    :param fields: tuple[str, ...] | None: Load only these fields, None for all of them
     :return: A list of contacts
     :doc-author: Trelent
     """
+    generation, rows = await search_cache.get(current_user.id, search)
+    if rows is not None:
+        return [row_to_contact(row, current_user) for row in rows]
     stmt = (
         select(Contact)
         .filter_by(user=current_user)
@@ -175,17 +398,28 @@ async def search_contacts(search: str, db: AsyncSession, current_user: User):
             )
         )
     )
+    if fields is not None:
+        result = await db.execute(only_fields(stmt, fields))
+        return result.scalars().all()
     result = await db.execute(stmt)
-    return result.scalars().all()
+    contacts = result.scalars().all()
+    await search_cache.put(current_user.id, search, contacts, generation)
+    return contacts
 
 
-async def get_birthday_contacts(days: int, db: AsyncSession, current_user: User):
+async def get_birthday_contacts(
+    days: int,
+    db: AsyncSession,
+    current_user: User,
+    fields: tuple[str, ...] | None = None,
+):
     """
     The get_birthday_contacts function returns a list of contacts whose birthday is within the next X days.
 
     :param days: int: Determine how many days in the future to look for birthdays
     :param db: AsyncSession: Pass the database session to the function
     :param current_user: User: Filter the contacts by user
+    :param fields: tuple[str, ...] | None: Load only these fields, None for all of them
     :return: A list of contacts
     :doc-author: Trelent
     """
@@ -227,5 +461,171 @@ async def get_birthday_contacts(days: int, db: AsyncSession, current_user: User)
             )
         )
     )
-    result = await db.execute(stmt)
+    result = await db.execute(only_fields(stmt, fields))
     return result.scalars().all()
+
+
+async def get_contact_counts(db: AsyncSession, current_user: User):
+    """
+    The get_contact_counts function returns how many contacts and favourites the user has.
+    The numbers come from the contact_counters table, which is kept up to date by
+    database triggers, so no COUNT(*) over the contacts table is needed.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: The owner of the contacts
+    :return: A ContactCounter object, with zeros if the user has never had contacts
+    :doc-author: Trelent
+    """
+    stmt = select(ContactCounter).filter_by(user_id=current_user.id)
+    result = await db.execute(stmt)
+    counter = result.scalar_one_or_none()
+    if counter is None:
+        counter = ContactCounter(
+            user_id=current_user.id, total=0, favourites=0, generation=0
+        )
+    return counter
+
+
+async def get_global_contact_counts(db: AsyncSession, exact_owners: int):
+    """
+    The get_global_contact_counts function returns how many contacts and favourites
+    exist in the whole database, as the sum of the counters of every user and of the
+    contacts without an owner. There is no global row: every contact write would
+    have to lock it. The sum reads one row per owner, so on PostgreSQL, once there
+    are more than exact_owners counter rows, the total is estimated from pg_class
+    instead and the favourites are not known.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param exact_owners: int: The most counter rows that are summed
+    :return: A dictionary with total, favourites and whether the numbers are estimated
+    :doc-author: Trelent
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        if await estimate_rows_count("contact_counters", db) > exact_owners:
+            return {
+                "total": await estimate_rows_count("contacts", db),
+                "favourites": None,
+                "estimated": True,
+            }
+    stmt = select(
+        func.coalesce(func.sum(ContactCounter.total), 0),
+        func.coalesce(func.sum(ContactCounter.favourites), 0),
+    )
+    result = await db.execute(stmt)
+    total, favourites = result.one()
+    return {"total": total, "favourites": favourites, "estimated": False}
+
+
+async def estimate_rows_count(table: str, db: AsyncSession) -> int:
+    """
+    The estimate_rows_count function reads the row estimate that PostgreSQL keeps
+    for a table. It costs a catalog lookup instead of a full scan, and is as fresh
+    as the last VACUUM/ANALYZE.
+
+    :param table: str: The name of the table
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The estimated number of rows, 0 if the table was never analyzed
+    :doc-author: Trelent
+    """
+    stmt = text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)")
+    result = await db.execute(stmt, {"table": table})
+    return max(result.scalar_one(), 0)
+
+
+async def get_database_time(db: AsyncSession) -> datetime:
+    """
+    The get_database_time function reads the database clock the way the timestamp
+    columns store it. They have no time zone, and now() on PostgreSQL has one, which
+    asyncpg refuses to compare with them, so PostgreSQL is asked for LOCALTIMESTAMP,
+    the value now() is stored as. SQLite stores and returns CURRENT_TIMESTAMP as it is.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The current time of the database, without a time zone
+    :doc-author: Trelent
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return await db.scalar(select(func.localtimestamp()))
+    return await db.scalar(select(func.now()))
+
+
+async def get_sync_horizon(lag: int, db: AsyncSession) -> datetime:
+    """
+    The get_sync_horizon function returns the time up to which changes are sent.
+    updated_at and deleted_at are the start time of the writing transaction, so a
+    slow transaction commits rows older than rows already sent. Rows younger than
+    lag seconds are held back until every transaction that could still commit
+    older ones has ended. The database clock is used, like for the rows.
+
+    :param lag: int: How many seconds a write transaction may take at most
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The horizon
+    :doc-author: Trelent
+    """
+    return await get_database_time(db) - timedelta(seconds=lag)
+
+
+async def get_contact_changes(
+    cursor: SyncCursor,
+    horizon: datetime,
+    limit: int,
+    db: AsyncSession,
+    current_user: User,
+):
+    """
+    The get_contact_changes function returns what changed in the user's contacts
+    after the cursor and up to the horizon: contacts created or updated later,
+    ordered by (updated_at, id) so the index on (user_id, updated_at, id) serves
+    the query, and the deletions logged later, ordered by (deleted_at, id) likewise.
+    One row more than the limit is read from each source to tell the caller
+    whether more changes are waiting.
+
+    :param cursor: SyncCursor: The position the client has synced up to
+    :param horizon: datetime: The time up to which changes are sent, see get_sync_horizon
+    :param limit: int: How many contacts and deletions to return at most
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: Filter the changes by user
+    :return: A tuple of the changed contacts and the deletions
+    :doc-author: Trelent
+    """
+    stmt = select(Contact).where(
+        Contact.user_id == current_user.id,
+        Contact.updated_at.is_not(None),
+        Contact.updated_at <= horizon,
+    )
+    if cursor.updated_at is not None:
+        stmt = stmt.where(
+            tuple_(Contact.updated_at, Contact.id)
+            > tuple_(cursor.updated_at, cursor.contact_id)
+        )
+    stmt = stmt.order_by(Contact.updated_at, Contact.id).limit(limit + 1)
+    contacts = await db.execute(stmt)
+
+    deletions_stmt = select(ContactDeletion).where(
+        ContactDeletion.user_id == current_user.id,
+        ContactDeletion.deleted_at <= horizon,
+    )
+    if cursor.deleted_at is not None:
+        deletions_stmt = deletions_stmt.where(
+            tuple_(ContactDeletion.deleted_at, ContactDeletion.id)
+            > tuple_(cursor.deleted_at, cursor.deletion_id)
+        )
+    deletions_stmt = deletions_stmt.order_by(
+        ContactDeletion.deleted_at, ContactDeletion.id
+    ).limit(limit + 1)
+    deletions = await db.execute(deletions_stmt)
+    return contacts.scalars().all(), deletions.scalars().all()
+
+
+async def prune_contact_deletions(before: datetime, db: AsyncSession) -> int:
+    """
+    The prune_contact_deletions function removes the deletions logged before a time.
+    Clients that last synced before it have to sync everything again.
+
+    :param before: datetime: The oldest deletion time that is kept
+    :param db: AsyncSession: Pass the database session to the function
+    :return: How many deletions were removed
+    :doc-author: Trelent
+    """
+    result = await db.execute(delete(ContactDeletion).where(ContactDeletion.deleted_at < before))
+    await db.commit()
+    return result.rowcount
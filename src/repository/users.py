@@ -7,24 +7,48 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.database.db import get_db
 from src.database.models import User
 from src.schemas.user import UserSchema
+from src.services.email_filter import registered_emails
+from src.services.response_cache import response_cache
 
 
 async def get_user_by_email(email: str, db: AsyncSession = Depends(get_db)):
     """
     The get_user_by_email function takes in an email and returns the user associated with that email.
         If no user is found, it will return None.
+        Emails that certainly have no account are answered without a query.
 
     :param email: str: Get the email of a user
     :param db: AsyncSession: Get the database session
     :return: A user object, which is the result of a database query
     :doc-author: Trelent
     """
+    if not registered_emails.might_exist(email):
+        return None
     stmt = select(User).filter_by(email=email)
     user = await db.execute(stmt)
     user = user.scalar_one_or_none()
     return user
 
 
+async def get_users_by_emails(emails: list[str], db: AsyncSession) -> list[User]:
+    """
+    The get_users_by_emails function loads the users of several emails with one query.
+        Emails without a user are left out of the result, and those that certainly
+        have no account aren't queried.
+
+    :param emails: list[str]: The emails to look up
+    :param db: AsyncSession: Get the database session
+    :return: A list of user objects
+    :doc-author: Trelent
+    """
+    emails = [email for email in emails if registered_emails.might_exist(email)]
+    if not emails:
+        return []
+    stmt = select(User).where(User.email.in_(emails))
+    users = await db.execute(stmt)
+    return list(users.scalars())
+
+
 async def create_user(body: UserSchema, db: AsyncSession = Depends(get_db)):
     """
     The create_user function creates a new user in the database.
@@ -45,6 +69,7 @@ async def create_user(body: UserSchema, db: AsyncSession = Depends(get_db)):
     db.add(new_user)
     await db.commit()
     await db.refresh(new_user)
+    await registered_emails.register(new_user.email)
     return new_user
 
 
@@ -91,6 +116,7 @@ async def update_avatar_url(email: str, url: str | None, db: AsyncSession) -> Us
     user = await get_user_by_email(email, db)
     user.avatar = url
     await db.commit()
+    await response_cache.invalidate(user.id)
     await db.refresh(user)
     return user
 
@@ -10,6 +10,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
+from src.database.models import Role
 from src.database.models import User
 from src.repository import users as repository_users
 from src.schemas.user import RequestEmail
@@ -81,7 +82,9 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.INVALID_PASSWORD
         )
-    access_token = await auth_service.create_access_token(data={"sub": user.email})
+    access_token = await auth_service.create_access_token(
+        data={"sub": user.email, "role": (user.role or Role.user).value}
+    )
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
     await repository_users.update_token(user, refresh_token, db)
     return {
@@ -117,7 +120,9 @@ async def refresh_token(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.INVALID_REFRESH_TOKEN
         )
 
-    access_token = await auth_service.create_access_token(data={"sub": email})
+    access_token = await auth_service.create_access_token(
+        data={"sub": email, "role": (user.role or Role.user).value}
+    )
     refresh_token = await auth_service.create_refresh_token(data={"sub": email})
     await repository_users.update_token(user, refresh_token, db)
     return {
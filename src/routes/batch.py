@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+from fastapi import Depends
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_db
+from src.database.models import User
+from src.schemas.batch import BatchRequest
+from src.schemas.batch import BatchResponse
+from src.services.auth import auth_service
+from src.services.batch import run_batch
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+
+@router.post("", response_model=BatchResponse)
+async def batch(
+    body: BatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The batch function runs several API calls in one HTTP request.
+    Authentication, middlewares and the database session are set up once for the
+    whole batch, and consecutive GET requests run concurrently.
+
+    :param body: BatchRequest: The list of sub-requests
+    :param request: Request: The batch request, sub-requests copy its client and headers
+    :param db: AsyncSession: Get the database session shared by the sub-requests
+    :param current_user: User: Get the current user shared by the sub-requests
+    :return: The responses of the sub-requests in the same order
+    :doc-author: Trelent
+    """
+    responses = await run_batch(request, body, current_user, db)
+    return {"responses": responses}
@@ -1,85 +1,213 @@
+from datetime import date
+from datetime import timedelta
+
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import HTTPException
 from fastapi import Path
 from fastapi import Query
+from fastapi import Request
+from fastapi import Response
 from fastapi import status
-from fastapi_limiter.depends import RateLimiter
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.conf import messages
+from src.conf.config import config
 from src.database.db import get_db
 from src.database.models import Role
 from src.database.models import User
 from src.repository import contacts as repository_contact
+from src.schemas.contact import ContactBulkFavourite
+from src.schemas.contact import ContactBulkIds
+from src.schemas.contact import ContactBulkPatch
+from src.schemas.contact import ContactBulkResult
+from src.schemas.contact import ContactChangesResponse
+from src.schemas.contact import ContactCompactList
 from src.schemas.contact import ContactResponse
 from src.schemas.contact import ContactSchema
+from src.schemas.contact import ContactStatsResponse
 from src.schemas.contact import ContactStatusUpdate
 from src.schemas.contact import ContactUpdateSchema
 from src.services.auth import auth_service
+from src.services.contact_events import contact_event_stream
+from src.services.content import NegotiatedRoute
+from src.services.content import render
+from src.services.content import response_media_type
+from src.services.etag import contact_etag
+from src.services.etag import contacts_etag
+from src.services.etag import etag_headers
+from src.services.etag import none_match
+from src.services.etag import not_modified
+from src.services.rate_limit import RateLimit
+from src.services.response_cache import response_cache
 from src.services.role import RoleAccess
+from src.services.serializers import contact_response
+from src.services.serializers import contacts_response
+from src.services.serializers import contacts_to_dicts
+from src.services.serializers import dump_contacts
+from src.services.serializers import parse_fields
+from src.services.sync_cursor import decode_cursor
+from src.services.sync_cursor import encode_cursor
+from src.services.sync_cursor import SyncCursor
 
-router = APIRouter(prefix="/contacts", tags=["contacts"])
+router = APIRouter(prefix="/contacts", tags=["contacts"], route_class=NegotiatedRoute)
 access_to_route_all = RoleAccess([Role.admin, Role.moderator])
 
 
-@router.get("/", response_model=list[ContactResponse])
+def contact_fields(fields: str | None = Query(None, examples=["id,name,lastname,phone"])):
+    """
+    The contact_fields function reads the fields query parameter of the list endpoints.
+    Only the listed fields are loaded from the database and sent to the client.
+
+    :param fields: str | None: A comma separated list of ContactResponse fields
+    :return: The selected fields, or None for all of them
+    :doc-author: Trelent
+    """
+    try:
+        return parse_fields(fields)
+    except ValueError as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{messages.INVALID_FIELDS}: {err}",
+        )
+
+
+@router.get("/", response_model=list[ContactResponse] | ContactCompactList)
 async def get_contacts(
+    request: Request,
     limit: int = Query(10, ge=10, le=500),
     offset: int = Query(0, ge=0),
+    response_format: str = Query("full", alias="format", pattern="^(full|compact)$"),
+    fields: tuple[str, ...] | None = Depends(contact_fields),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
     The get_contacts function returns a list of contacts.
+    The total number of the user's contacts is sent in the X-Total-Count header.
+    The ETag comes from the generation counter of the user's contacts, so a client
+    whose If-None-Match is still current gets 304 before any contact is loaded.
+    Serialized pages are cached in Redis, a hit is sent as it was stored.
 
+    :param request: Request: Read the If-None-Match header
     :param limit: int: Limit the number of contacts returned
     :param ge: Set a minimum value for the limit parameter
     :param le: Limit the number of contacts returned to 500
     :param offset: int: Specify the number of records to skip
     :param ge: Set a minimum value for the limit and offset parameters
+    :param response_format: str: compact returns the contacts with user_id and a separate users map
+    :param fields: tuple[str, ...] | None: Send only these fields of each contact
     :param db: AsyncSession: Get the database session
     :param current_user: User: Get the current user from the database
     :param : Get the contact by id
     :return: A list of contacts
     :doc-author: Trelent
     """
-    contacts = await repository_contact.get_contacts(limit, offset, db, current_user)
-    return contacts
+    if_none_match = request.headers.get("if-none-match")
+    media_type = response_media_type.get()
+    params = (limit, offset, response_format, ",".join(fields or ()), media_type)
+    generation, cached = await response_cache.get(current_user.id, "contacts", params)
+    if cached is not None:
+        if not none_match(if_none_match, cached.headers["ETag"]):
+            return not_modified(cached.headers["ETag"], cached.headers)
+        return Response(cached.body, headers=cached.headers, media_type=media_type)
+    counts = await repository_contact.get_contact_counts(db, current_user)
+    etag = contacts_etag(counts.generation, current_user, *params)
+    headers = {"X-Total-Count": str(counts.total)}
+    if not none_match(if_none_match, etag):
+        return not_modified(etag, headers)
+    headers.update(etag_headers(etag))
+    contacts = await repository_contact.get_contacts(
+        limit, offset, db, current_user, fields
+    )
+    body = dump_contacts(contacts, response_format, fields)
+    await response_cache.put(
+        current_user.id, "contacts", params, generation, body, headers
+    )
+    return Response(body, headers=headers, media_type=media_type)
 
 
 @router.get(
     "/all",
-    response_model=list[ContactResponse],
+    response_model=list[ContactResponse] | ContactCompactList,
     dependencies=[Depends(access_to_route_all)],
 )
 async def get_all_contacts(
     limit: int = Query(10, ge=10, le=500),
     offset: int = Query(0, ge=0),
+    response_format: str = Query("full", alias="format", pattern="^(full|compact)$"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
     The get_all_contacts function returns a list of contacts.
+    The total number of contacts is sent in the X-Total-Count header.
 
     :param limit: int: Limit the number of contacts returned
     :param ge: Specify the minimum value of the parameter
     :param le: Limit the number of contacts returned
     :param offset: int: Skip the first n records
     :param ge: Specify a lower limit for the value of the parameter
+    :param response_format: str: compact returns the contacts with user_id and a separate users map
     :param db: AsyncSession: Pass in the database connection
     :param current_user: User: Get the current user from the database
     :param : Limit the number of contacts returned
     :return: A list of contacts
     :doc-author: Trelent
     """
+    counts = await repository_contact.get_global_contact_counts(
+        db, config.CONTACT_COUNTS_EXACT_OWNERS
+    )
     contacts = await repository_contact.get_all_contacts(limit, offset, db)
-    return contacts
+    return contacts_response(
+        contacts, {"X-Total-Count": str(counts["total"])}, response_format
+    )
+
+
+@router.get(
+    "/all/stats",
+    response_model=ContactStatsResponse,
+    dependencies=[Depends(access_to_route_all)],
+)
+async def get_all_contacts_stats(db: AsyncSession = Depends(get_db)):
+    """
+    The get_all_contacts_stats function returns how many contacts and favourites
+    exist in the whole database. With many owners the total is estimated.
+
+    :param db: AsyncSession: Get the database session
+    :return: The total number of contacts and favourites
+    :doc-author: Trelent
+    """
+    return await repository_contact.get_global_contact_counts(
+        db, config.CONTACT_COUNTS_EXACT_OWNERS
+    )
+
+
+@router.get("/stats", response_model=ContactStatsResponse)
+async def get_contacts_stats(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The get_contacts_stats function returns how many contacts and favourites
+    the current user has.
+
+    :param db: AsyncSession: Get the database session
+    :param current_user: User: Get the current user
+    :return: The total number of the user's contacts and favourites
+    :doc-author: Trelent
+    """
+    counts = await repository_contact.get_contact_counts(db, current_user)
+    return {"total": counts.total, "favourites": counts.favourites}
 
 
 @router.post(
     "/",
     response_model=ContactResponse,
-    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
+    dependencies=[
+        Depends(RateLimit(times=2, seconds=5, tiers={Role.moderator: 5, Role.admin: 10}))
+    ],
     status_code=status.HTTP_201_CREATED,
 )
 async def create_contact(
@@ -98,12 +226,77 @@ async def create_contact(
     :doc-author: Trelent
     """
     contact = await repository_contact.create_contact(body, db, current_user)
-    return contact
+    return contact_response(contact, status.HTTP_201_CREATED)
+
+
+@router.post("/bulk/delete", response_model=ContactBulkResult)
+async def bulk_delete_contacts(
+    body: ContactBulkIds,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The bulk_delete_contacts function deletes many contacts in one transaction.
 
+    :param body: ContactBulkIds: The ids of the contacts to delete
+    :param db: AsyncSession: Get the database session
+    :param current_user: User: Get the current user
+    :return: The ids of the deleted contacts
+    :doc-author: Trelent
+    """
+    ids = await repository_contact.bulk_delete_contacts(body.ids, db, current_user)
+    return {"ids": ids}
+
+
+@router.post("/bulk/favourite", response_model=ContactBulkResult)
+async def bulk_update_status_contacts(
+    body: ContactBulkFavourite,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The bulk_update_status_contacts function sets the favourite status of many contacts
+    in one transaction.
 
-@router.get("/search/", response_model=list[ContactResponse])
+    :param body: ContactBulkFavourite: The ids of the contacts and the new status
+    :param db: AsyncSession: Get the database session
+    :param current_user: User: Get the current user
+    :return: The ids of the updated contacts
+    :doc-author: Trelent
+    """
+    ids = await repository_contact.bulk_update_status_contacts(
+        body.ids, body.favourite, db, current_user
+    )
+    return {"ids": ids}
+
+
+@router.patch("/bulk", response_model=ContactBulkResult)
+async def bulk_patch_contacts(
+    body: ContactBulkPatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The bulk_patch_contacts function changes the same fields on many contacts
+    in one transaction.
+
+    :param body: ContactBulkPatch: The ids of the contacts and the fields to change
+    :param db: AsyncSession: Get the database session
+    :param current_user: User: Get the current user
+    :return: The ids of the updated contacts
+    :doc-author: Trelent
+    """
+    ids = await repository_contact.bulk_patch_contacts(
+        body.ids, body.patch, db, current_user
+    )
+    return {"ids": ids}
+
+
+@router.get("/search/", response_model=list[ContactResponse] | ContactCompactList)
 async def search_contacts(
     search: str = Query(min_length=1),
+    response_format: str = Query("full", alias="format", pattern="^(full|compact)$"),
+    fields: tuple[str, ...] | None = Depends(contact_fields),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
@@ -111,46 +304,145 @@ async def search_contacts(
     The search_contacts function searches for contacts in the database.
 
     :param search: str: Get the search string from the query params
+    :param response_format: str: compact returns the contacts with user_id and a separate users map
+    :param fields: tuple[str, ...] | None: Send only these fields of each contact
     :param db: AsyncSession: Get the database session
     :param current_user: User: Get the current user
     :param : Search the contacts in the database
     :return: A list of contact objects
     :doc-author: Trelent
     """
-    contacts = await repository_contact.search_contacts(search, db, current_user)
-    return contacts
+    contacts = await repository_contact.search_contacts(
+        search, db, current_user, fields
+    )
+    return contacts_response(contacts, None, response_format, fields)
 
 
-@router.get("/birthdays/", response_model=list[ContactResponse])
+@router.get("/birthdays/", response_model=list[ContactResponse] | ContactCompactList)
 async def get_birthday_contacts(
     days: int = Query(7, ge=1),
+    response_format: str = Query("full", alias="format", pattern="^(full|compact)$"),
+    fields: tuple[str, ...] | None = Depends(contact_fields),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
     The get_birthday_contacts function returns a list of contacts that have birthdays within the next 7 days.
+    The serialized result is cached in Redis for the day it was computed on.
 
     :param days: int: Specify how many days in the future to look for birthdays
     :param ge: Specify that the value of days must be greater than or equal to 1
+    :param response_format: str: compact returns the contacts with user_id and a separate users map
+    :param fields: tuple[str, ...] | None: Send only these fields of each contact
     :param db: AsyncSession: Get the database session
     :param current_user: User: Get the current user
     :param : Specify the number of days to look ahead for birthdays
     :return: A list of contact objects
     :doc-author: Trelent
     """
-    contacts = await repository_contact.get_birthday_contacts(days, db, current_user)
-    return contacts
+    media_type = response_media_type.get()
+    params = (days, date.today(), response_format, ",".join(fields or ()), media_type)
+    generation, cached = await response_cache.get(current_user.id, "birthdays", params)
+    if cached is not None:
+        return Response(cached.body, media_type=media_type)
+    contacts = await repository_contact.get_birthday_contacts(
+        days, db, current_user, fields
+    )
+    body = dump_contacts(contacts, response_format, fields)
+    await response_cache.put(current_user.id, "birthdays", params, generation, body, {})
+    return Response(body, media_type=media_type)
+
+
+@router.get("/changes", response_model=ContactChangesResponse)
+async def get_contact_changes(
+    since: str | None = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The get_contact_changes function returns the contacts created or updated since the
+    cursor and the ids of the contacts deleted since then. The client stores the returned
+    cursor and sends it as since on the next sync; while has_more is true it should
+    ask again right away. Changes show up CONTACT_CHANGES_LAG seconds after they were
+    made. Deletions are kept for CONTACT_DELETIONS_RETENTION_DAYS, a cursor that is
+    older gets 410 and the client syncs everything again.
+
+    :param since: str | None: The cursor from the previous sync, empty for a full sync
+    :param limit: int: How many changes and deletions to return at most
+    :param db: AsyncSession: Get the database session
+    :param current_user: User: Get the current user
+    :return: The changed contacts, the deleted ids and the next cursor
+    :doc-author: Trelent
+    """
+    try:
+        cursor = decode_cursor(since)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=messages.INVALID_CURSOR
+        )
+    horizon = await repository_contact.get_sync_horizon(config.CONTACT_CHANGES_LAG, db)
+    retention = timedelta(days=config.CONTACT_DELETIONS_RETENTION_DAYS)
+    if cursor.synced_at is not None and cursor.synced_at < horizon - retention:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=messages.CURSOR_EXPIRED)
+    contacts, deletions = await repository_contact.get_contact_changes(
+        cursor, horizon, limit, db, current_user
+    )
+    has_more = len(contacts) > limit or len(deletions) > limit
+    contacts, deletions = contacts[:limit], deletions[:limit]
+    next_cursor = SyncCursor(
+        contacts[-1].updated_at if contacts else cursor.updated_at,
+        contacts[-1].id if contacts else cursor.contact_id,
+        deletions[-1].deleted_at if deletions else cursor.deleted_at,
+        deletions[-1].id if deletions else cursor.deletion_id,
+        cursor.synced_at if has_more else horizon,
+    )
+    return render(
+        {
+            "changed": contacts_to_dicts(contacts),
+            "deleted": [deletion.contact_id for deletion in deletions],
+            "cursor": encode_cursor(next_cursor),
+            "has_more": has_more,
+        }
+    )
+
+
+@router.get("/events", response_class=StreamingResponse)
+async def get_contact_events(
+    request: Request,
+    current_user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The get_contact_events function opens a server-sent event stream that pushes
+    created, updated and deleted events for the user's contacts, so clients don't
+    have to poll the contact list. A reconnecting client sends the Last-Event-ID
+    header and first gets the events it missed.
+
+    :param request: Request: Read the Last-Event-ID header
+    :param current_user: User: Get the current user
+    :return: A text/event-stream response
+    :doc-author: Trelent
+    """
+    return StreamingResponse(
+        contact_event_stream(current_user.id, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def get_contact(
+    request: Request,
     contact_id: int = Path(ge=1),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
     The get_contact function returns a contact by its id.
+    If the request has If-None-Match, only the version of the contact is read first,
+    and a client with a current copy gets 304 without the row being loaded.
 
+    :param request: Request: Read the If-None-Match header
     :param contact_id: int: Get the contact id from the path
     :param db: AsyncSession: Get the database session
     :param current_user: User: Get the current user from the auth_service
@@ -158,14 +450,25 @@ async def get_contact(
     :return: A contact object
     :doc-author: Trelent
     """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        version = await repository_contact.get_contact_version(
+            contact_id, db, current_user
+        )
+        if version is not None:
+            etag = contact_etag(contact_id, version, current_user)
+            if not none_match(if_none_match, etag):
+                return not_modified(etag)
     contact = await repository_contact.get_contact(contact_id, db, current_user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
-    return contact
+    etag = contact_etag(contact.id, contact.version, current_user)
+    return contact_response(contact, headers=etag_headers(etag))
 
 
 @router.put("/{contact_id}")
 async def update_contact(
+    request: Request,
     body: ContactUpdateSchema,
     contact_id: int = Path(ge=1),
     db: AsyncSession = Depends(get_db),
@@ -175,7 +478,9 @@ async def update_contact(
     The update_contact function updates a contact in the database.
         It takes an id, body and db as arguments. The body is validated using ContactUpdateSchema
         and then passed to repository_contact's update_contact function along with the id, db and current user.
+        With If-Match the update only goes through if the client's copy is current, otherwise 412 is returned.
 
+    :param request: Request: Read the If-Match header
     :param body: ContactUpdateSchema: Validate the request body
     :param contact_id: int: Get the id of the contact to be deleted
     :param db: AsyncSession: Get a database session
@@ -185,11 +490,12 @@ async def update_contact(
     :doc-author: Trelent
     """
     contact = await repository_contact.update_contact(
-        contact_id, body, db, current_user
+        contact_id, body, db, current_user, request.headers.get("if-match")
     )
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
-    return contact
+    etag = contact_etag(contact.id, contact.version, current_user)
+    return contact_response(contact, headers=etag_headers(etag))
 
 
 @router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -216,6 +522,7 @@ async def delete_contact(
     "/{contact_id}", response_model=ContactResponse, status_code=status.HTTP_200_OK
 )
 async def update_status_contact(
+    request: Request,
     body: ContactStatusUpdate,
     contact_id: int,
     db: AsyncSession = Depends(get_db),
@@ -223,7 +530,9 @@ async def update_status_contact(
 ):
     """
     The update_status_contact function updates the status of a contact.
+    With If-Match the update only goes through if the client's copy is current.
 
+    :param request: Request: Read the If-Match header
     :param body: ContactStatusUpdate: Get the status of the contact
     :param contact_id: int: Find the contact in the database
     :param db: AsyncSession: Get the database session
@@ -233,10 +542,11 @@ async def update_status_contact(
     :doc-author: Trelent
     """
     contact = await repository_contact.update_status_contact(
-        contact_id, body, db, current_user
+        contact_id, body, db, current_user, request.headers.get("if-match")
     )
     if contact is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Note not found"
         )
-    return contact
+    etag = contact_etag(contact.id, contact.version, current_user)
+    return contact_response(contact, headers=etag_headers(etag))
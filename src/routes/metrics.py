@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from fastapi import Depends
+
+from src.database.models import Role
+from src.services.metrics import metrics
+from src.services.role import RoleAccess
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+access_to_metrics = RoleAccess([Role.admin])
+
+
+@router.get("/", dependencies=[Depends(access_to_metrics)])
+async def get_metrics():
+    """
+    The get_metrics function returns the counters, gauges and ratios of this worker,
+    e.g. how often the search cache answered without querying the database.
+
+    :return: A dictionary with counters, gauges and ratios
+    :doc-author: Trelent
+    """
+    return metrics.snapshot()
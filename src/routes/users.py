@@ -1,20 +1,26 @@
-import pickle
-
 import cloudinary.uploader
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import File
-from fastapi_limiter.depends import RateLimiter
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import UploadFile
 from src.conf.config import config
 from src.database.db import get_db
+from src.database.models import Role
 from src.database.models import User
 from src.repository import users as repository_users
 from src.schemas.user import UserResponse
 from src.services.auth import auth_service
+from src.services.content import NegotiatedRoute
+from src.services.etag import none_match
+from src.services.etag import etag_headers
+from src.services.etag import not_modified
+from src.services.etag import user_etag
+from src.services.rate_limit import RateLimit
+from src.services.serializers import user_response
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=NegotiatedRoute)
 cloudinary.config(
     cloud_name=config.CLOUDINARY_NAME,
     api_key=config.CLOUDINARY_API_KEY,
@@ -26,25 +32,35 @@ cloudinary.config(
 @router.get(
     "/me",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
+    dependencies=[
+        Depends(RateLimit(times=2, seconds=5, tiers={Role.moderator: 5, Role.admin: 10}))
+    ],
 )
-async def get_current_user(user: User = Depends(auth_service.get_current_user)):
+async def get_current_user(
+    request: Request,
+    user: User = Depends(auth_service.get_current_user),
+):
     """
     The get_current_user function is a dependency that will be used by the
         get_current_active_user function. It uses the auth service to retrieve
         information about the current user, and returns it as a User object.
+        A client whose If-None-Match matches the profile's ETag gets 304 instead.
 
+    :param request: Request: Read the If-None-Match header
     :param user: User: Pass the user object to the function
     :return: The user object of the currently logged in user
     :doc-author: Trelent
     """
-    return user
+    etag = user_etag(user)
+    if not none_match(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return user_response(user, etag_headers(etag))
 
 
 @router.patch(
     "/avatar",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=2, seconds=5))],
+    dependencies=[Depends(RateLimit(times=2, seconds=5, strict=True))],
 )
 async def update_avatar(
     file: UploadFile = File(),
@@ -71,6 +87,5 @@ async def update_avatar(
         width=250, height=250, crop="fill", version=res.get("version")
     )
     user = await repository_users.update_avatar_url(user.email, res_url, db)
-    auth_service.cache.set(user.email, pickle.dumps(user))
-    auth_service.cache.expire(user.email, 300)
-    return user
+    await auth_service.cache.delete(user.email)
+    return user_response(user)
@@ -0,0 +1,28 @@
+from typing import Any
+from typing import Literal
+
+from pydantic import BaseModel
+from pydantic import Field
+
+
+class BatchRequestItem(BaseModel):
+    id: str | None = None
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str = Field(pattern=r"^/api/")
+    body: Any = None
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchRequestItem] = Field(min_length=1, max_length=20)
+    parallel: bool = True
+
+
+class BatchResponseItem(BaseModel):
+    id: str | None = None
+    status: int
+    headers: dict[str, str]
+    body: Any = None
+
+
+class BatchResponse(BaseModel):
+    responses: list[BatchResponseItem]
@@ -6,6 +6,8 @@ from pydantic import BaseModel
 from pydantic import EmailStr
 from pydantic import Field
 from pydantic import ConfigDict
+from pydantic import field_validator
+from pydantic import model_validator
 
 from src.schemas.user import UserResponse
 
@@ -28,7 +30,63 @@ class ContactStatusUpdate(BaseModel):
     favourite: bool
 
 
-class ContactResponse(BaseModel):
+class ContactPatchSchema(BaseModel):
+    name: Optional[str] = Field(None, min_length=3, max_length=50)
+    lastname: Optional[str] = Field(None, min_length=3, max_length=50)
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = None
+    birthday: Optional[date] = None
+    notes: Optional[str] = Field(None, max_length=250)
+    favourite: Optional[bool] = None
+
+    @field_validator("*")
+    @classmethod
+    def check_not_null(cls, value):
+        """
+        The check_not_null function rejects fields that are sent as null. A field left
+        out of a patch keeps its value, while null would be written to a column that
+        can't hold it.
+
+        :param cls: Pass the class object to the function
+        :param value: Pass the value of the field that is being validated
+        :return: The value of the field
+        :doc-author: Trelent
+        """
+        if value is None:
+            raise ValueError("Field can't be null")
+        return value
+
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        """
+        The check_not_empty function rejects a patch that sets no field at all.
+
+        :param self: Represent the instance of the class
+        :return: The validated patch
+        :doc-author: Trelent
+        """
+        if not self.model_fields_set:
+            raise ValueError("At least one field must be set")
+        return self
+
+
+class ContactBulkIds(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=500)
+
+
+class ContactBulkFavourite(ContactBulkIds):
+    favourite: bool
+
+
+class ContactBulkPatch(ContactBulkIds):
+    patch: ContactPatchSchema
+
+
+class ContactBulkResult(BaseModel):
+    ids: list[int]
+
+
+class ContactFieldsResponse(BaseModel):
     id: int = 1
     name: str | None
     lastname: str | None
@@ -39,8 +97,31 @@ class ContactResponse(BaseModel):
     favourite: bool | None
     created_at: datetime | None
     updated_at: datetime | None
-    user: UserResponse | None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class ContactResponse(ContactFieldsResponse):
+    user: UserResponse | None
+
+
+class ContactCompactResponse(ContactFieldsResponse):
+    user_id: int | None
+
+
+class ContactCompactList(BaseModel):
+    contacts: list[ContactCompactResponse]
+    users: dict[int, UserResponse]
+
+
+class ContactStatsResponse(BaseModel):
+    total: int
+    favourites: int | None
+    estimated: bool = False
+
+
+class ContactChangesResponse(BaseModel):
+    changed: list[ContactResponse]
+    deleted: list[int]
+    cursor: str
+    has_more: bool
@@ -1,12 +1,13 @@
 import pickle
+import time
 from datetime import datetime
 from datetime import timedelta
 from typing import Optional
 
 import pytz
-import redis
 from fastapi import Depends
 from fastapi import HTTPException
+from fastapi import Request
 from fastapi import status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
@@ -16,19 +17,18 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf.config import config
 from src.database.db import get_db
-from src.repository import users as repository_users
+from src.services.cache_backend import cache_backend
+from src.services.metrics import metrics
+from src.services.user_loader import user_loader
+from src.services.xfetch import jittered_ttl
+from src.services.xfetch import should_refresh
 
 
 class Auth:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = config.SECRET_KEY_JWT
     ALGORITHM = config.ALGORITHM
-    cache = redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
-    )
+    cache = cache_backend
 
     def verify_password(self, plain_password, hashed_password):
         """
@@ -141,15 +141,42 @@ class Auth:
                 detail="Could not validate credentials",
             )
 
+    def decode_access_token(self, token: str) -> dict | None:
+        """
+        The decode_access_token function returns the claims of a valid access token
+        without loading the user, for code that only needs to know who is calling.
+
+        :param self: Represent the instance of the class
+        :param token: str: The bearer token of the request
+        :return: The claims of the token, or None if it is invalid, expired or not an access token
+        :doc-author: Trelent
+        """
+        try:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except JWTError:
+            return None
+        if payload.get("scope") != "access_token" or payload.get("sub") is None:
+            return None
+        return payload
+
     async def get_current_user(
-        self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+        self,
+        request: Request,
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_db),
     ):
         """
         The get_current_user function is a dependency that will be used in the
             protected endpoints. It takes a token as an argument and returns the user
             if it's valid, otherwise raises an HTTPException with status code 401.
+            Sub-requests of a batch get the user that already authenticated the batch.
+            A user the rate limit's preamble already read from the cache isn't read again.
+            Concurrent cache misses are loaded together by the user loader.
+            Cached users are refreshed a little before they expire (XFetch), and their
+            TTLs are jittered, so the users cached together don't all expire together.
 
         :param self: Access the class attributes and methods
+        :param request: Request: Look for a user resolved by a batch
         :param token: str: Pass the token from the authorization header
         :param db: AsyncSession: Get the database session
         :return: A user object
@@ -160,6 +187,9 @@ class Auth:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+        batch_user = getattr(request.state, "current_user", None)
+        if batch_user is not None:
+            return batch_user
         try:
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             if payload["scope"] == "access_token":
@@ -173,18 +203,33 @@ class Auth:
 
         user_hash: str = str(email)
 
-        user = self.cache.get(user_hash)
+        if hasattr(request.state, "cached_user"):
+            cached = request.state.cached_user
+        else:
+            cached = await self.cache.get(user_hash)
+
+        user = None
+        if cached is not None:
+            entry = pickle.loads(cached)
+            if isinstance(entry, tuple):
+                user, delta, expires = entry
+                if should_refresh(delta, expires, config.USER_CACHE_BETA):
+                    metrics.incr("user_cache.early_refreshes")
+                    user = None
 
         if user is None:
             print("User from database")
-            user = await repository_users.get_user_by_email(email, db)
+            started = time.monotonic()
+            user = await user_loader.load(email, db)
             if user is None:
                 raise credentials_exception
-            self.cache.set(user_hash, pickle.dumps(user))
-            self.cache.expire(user_hash, 300)
+            delta = time.monotonic() - started
+            ttl = jittered_ttl(config.USER_CACHE_TTL, config.USER_CACHE_JITTER)
+            await self.cache.set(
+                user_hash, pickle.dumps((user, delta, time.time() + ttl)), ttl=ttl
+            )
         else:
             print("User from cache")
-            user = pickle.loads(user)
         return user
 
     def create_email_token(self, data: dict):
@@ -0,0 +1,248 @@
+import asyncio
+import time
+
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.database.redis_db import redis_client
+from src.services.cache_backend import cache_backend
+from src.services.metrics import metrics
+
+BANS_CHANNEL = "autoban:events"
+BAN_PREFIX = "autoban:ban:"
+LISTEN_TIMEOUT = 1.0
+
+STRIKE_SCRIPT = redis_client.register_script(
+    """
+    local strikes = redis.call('INCR', KEYS[1])
+    if strikes == 1 then
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+    end
+    if strikes < tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('DEL', KEYS[1])
+    local offences = redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[4])
+    local ttl = math.floor(math.min(tonumber(ARGV[3]) * 2 ^ (offences - 1), tonumber(ARGV[4])))
+    redis.call('SET', KEYS[3], offences, 'EX', ttl)
+    redis.call('PUBLISH', ARGV[5], ARGV[6] .. ' ' .. ttl)
+    return ttl
+    """
+)
+
+
+def ban_key(ip: str) -> str:
+    """
+    The ban_key function returns the Redis key of an address's ban.
+
+    :param ip: str: The client's IP address
+    :return: The Redis key
+    :doc-author: Trelent
+    """
+    return BAN_PREFIX + ip
+
+
+class AutoBan:
+    def __init__(
+        self,
+        backend,
+        threshold: int,
+        window: int,
+        base_ttl: int,
+        max_ttl: int,
+    ):
+        """
+        The __init__ function sets up the automatic bans, in the manner of fail2ban.
+        Every 429 and every failed login is a strike against the client's IP; threshold
+        strikes within window seconds ban the IP. The first ban lasts base_ttl seconds
+        and each further one twice as long as the last, up to max_ttl. Bans are kept in
+        Redis and published, and every worker mirrors them in memory, so checking a
+        request costs a dict lookup. With the memory backend the strikes are counted
+        in this process and there is nothing to mirror.
+
+        :param self: Represent the instance of the class
+        :param backend: The cache backend
+        :param threshold: int: How many strikes ban an IP
+        :param window: int: How many seconds the strikes are counted for
+        :param base_ttl: int: How many seconds the first ban lasts
+        :param max_ttl: int: The longest ban, also how long past offences are remembered
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.backend = backend
+        self.redis = backend.redis
+        self.breaker = backend.breaker
+        self.threshold = threshold
+        self.window = window
+        self.base_ttl = base_ttl
+        self.max_ttl = max_ttl
+        self.bans: dict[str, float] = {}
+        self._listener: asyncio.Task | None = None
+
+    def ban(self, ip: str, ttl: float):
+        """
+        The ban function bans an IP in this worker's memory.
+
+        :param self: Represent the instance of the class
+        :param ip: str: The client's IP address
+        :param ttl: float: How many seconds the ban lasts
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.bans[ip] = time.time() + ttl
+
+    def is_banned(self, ip: str) -> bool:
+        """
+        The is_banned function checks the bans mirrored in memory. Expired bans are dropped.
+
+        :param self: Represent the instance of the class
+        :param ip: str: The client's IP address
+        :return: True if the IP is banned
+        :doc-author: Trelent
+        """
+        expires = self.bans.get(ip)
+        if expires is None:
+            return False
+        if expires <= time.time():
+            self.bans.pop(ip, None)
+            return False
+        return True
+
+    async def strike(self, ip: str) -> int:
+        """
+        The strike function counts one offence of an IP and bans it once it reaches
+        the threshold. The ban takes effect in this worker at once; the others get it
+        from the channel. If Redis can't be reached, the strike is lost.
+
+        :param self: Represent the instance of the class
+        :param ip: str: The client's IP address
+        :return: How many seconds the IP is banned for, 0 if it wasn't banned
+        :doc-author: Trelent
+        """
+        if self.redis is None:
+            ttl = await self.count(ip)
+        else:
+            try:
+                async with self.breaker:
+                    ttl = await STRIKE_SCRIPT(
+                        keys=[f"autoban:strikes:{ip}", f"autoban:offences:{ip}", ban_key(ip)],
+                        args=[
+                            self.window,
+                            self.threshold,
+                            self.base_ttl,
+                            self.max_ttl,
+                            BANS_CHANNEL,
+                            ip,
+                        ],
+                        client=self.redis,
+                    )
+            except (RedisError, OSError) as err:
+                print(err)
+                return 0
+        ttl = int(ttl)
+        if ttl:
+            self.ban(ip, ttl)
+            metrics.incr("auto_ban.bans")
+            print(f"Banned {ip} for {ttl} seconds")
+        return ttl
+
+    async def count(self, ip: str) -> int:
+        """
+        The count function does what the strike script does, with the operations of the
+        cache backend. It is used with the memory backend, where nothing runs in between.
+
+        :param self: Represent the instance of the class
+        :param ip: str: The client's IP address
+        :return: How many seconds the IP is to be banned for, 0 if it isn't
+        :doc-author: Trelent
+        """
+        strikes_key = f"autoban:strikes:{ip}"
+        if await self.backend.incr(strikes_key, ttl=self.window) < self.threshold:
+            return 0
+        await self.backend.delete(strikes_key)
+        offences_key = f"autoban:offences:{ip}"
+        offences = await self.backend.incr(offences_key)
+        await self.backend.expire(offences_key, self.max_ttl)
+        ttl = int(min(self.base_ttl * 2 ** (offences - 1), self.max_ttl))
+        await self.backend.set(ban_key(ip), str(offences), ttl)
+        return ttl
+
+    async def load(self):
+        """
+        The load function copies the bans that are in Redis into memory,
+        so a worker that starts or reconnects knows the bans made before.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        keys = [key async for key in self.redis.scan_iter(match=BAN_PREFIX + "*", count=1000)]
+        if not keys:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.pttl(key)
+            ttls = await pipe.execute()
+        for key, ttl in zip(keys, ttls):
+            if ttl > 0:
+                self.ban(key.decode()[len(BAN_PREFIX):], ttl / 1000)
+
+    def dispatch(self, message: str):
+        """
+        The dispatch function mirrors one published ban.
+
+        :param self: Represent the instance of the class
+        :param message: str: The IP and the seconds of the ban separated by a space
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        ip, _, ttl = message.rpartition(" ")
+        self.ban(ip, int(ttl))
+
+    async def _listen(self):
+        """
+        The _listen function mirrors the bans of every worker for as long as this one runs
+        and reconnects after Redis errors. It polls the channel, since a blocking read
+        would run into the socket timeout of the client whenever no ban is published.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    async with self.breaker:
+                        await pubsub.subscribe(BANS_CHANNEL)
+                        await self.load()
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=LISTEN_TIMEOUT
+                        )
+                        if message is not None and message["type"] == "message":
+                            self.dispatch(message["data"].decode())
+            except (RedisError, OSError) as err:
+                print(err)
+                await asyncio.sleep(1)
+
+    def start(self):
+        """
+        The start function starts mirroring the bans if it is not running yet.
+        There is nothing to mirror with the memory backend.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if self.redis is not None and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+
+auto_ban = AutoBan(
+    cache_backend,
+    threshold=config.AUTO_BAN_THRESHOLD,
+    window=config.AUTO_BAN_WINDOW,
+    base_ttl=config.AUTO_BAN_BASE_TTL,
+    max_ttl=config.AUTO_BAN_MAX_TTL,
+)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+
+from fastapi import Request
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.exceptions import HTTPException
+
+from src.database.models import User
+from src.schemas.batch import BatchRequest
+from src.schemas.batch import BatchRequestItem
+
+BATCH_PATH = "/api/batch"
+FORWARDED_HEADERS = (b"authorization", b"user-agent", b"accept", b"accept-language")
+STREAMING_MEDIA_TYPES = ("text/event-stream",)
+
+
+def error_item(item: BatchRequestItem, status_code: int, detail: str) -> dict:
+    """
+    The error_item function builds the result of a sub-request that could not be run.
+
+    :param item: BatchRequestItem: The sub-request
+    :param status_code: int: The HTTP status of the error
+    :param detail: str: The error message
+    :return: A dictionary in the shape of BatchResponseItem
+    :doc-author: Trelent
+    """
+    return {
+        "id": item.id,
+        "status": status_code,
+        "headers": {},
+        "body": {"detail": detail},
+    }
+
+
+async def dispatch(request: Request, item: BatchRequestItem, state: dict) -> dict:
+    """
+    The dispatch function runs one sub-request against the application's router,
+    inside the current process. The outer middleware stack is not run again, the
+    batch request already went through it. The state dictionary becomes the
+    request.state of the sub-request, which is how the authenticated user and the
+    shared database session are handed to get_current_user and get_db.
+    Streams like the contact events never end, so a streaming response is cut off
+    as soon as it starts: the sub-request sees the client disconnect and the item
+    is answered 400.
+
+    :param request: Request: The batch request
+    :param item: BatchRequestItem: The sub-request to run
+    :param state: dict: The request.state of the sub-request
+    :return: A dictionary in the shape of BatchResponseItem
+    :doc-author: Trelent
+    """
+    path, _, query = item.path.partition("?")
+    if path.rstrip("/") == BATCH_PATH:
+        return error_item(item, status.HTTP_400_BAD_REQUEST, "Nested batches are not allowed")
+    parent = request.scope
+    headers = [(key, value) for key, value in parent["headers"] if key in FORWARDED_HEADERS]
+    body = b""
+    if item.body is not None:
+        body = json.dumps(item.body).encode()
+        headers.append((b"content-type", b"application/json"))
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http",
+        "asgi": parent.get("asgi", {"version": "3.0"}),
+        "http_version": parent.get("http_version", "1.1"),
+        "method": item.method,
+        "scheme": parent.get("scheme", "http"),
+        "server": parent.get("server"),
+        "client": parent.get("client"),
+        "root_path": parent.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        "state": state,
+        "app": parent.get("app"),
+        "starlette.exception_handlers": parent.get("starlette.exception_handlers"),
+    }
+    finished = asyncio.Event()
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    response = {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "headers": {}}
+    chunks = []
+    streaming = False
+
+    async def send(message):
+        nonlocal streaming
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {
+                key.decode("latin-1"): value.decode("latin-1")
+                for key, value in message.get("headers", [])
+                if key != b"content-length"
+            }
+            if response["headers"].get("content-type", "").startswith(STREAMING_MEDIA_TYPES):
+                streaming = True
+                finished.set()
+        elif message["type"] == "http.response.body" and not streaming:
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app.router(scope, receive, send)
+    except HTTPException as err:
+        return error_item(item, err.status_code, err.detail)
+    except Exception as err:
+        print(err)
+        return error_item(item, status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal Server Error")
+    finally:
+        finished.set()
+
+    if streaming:
+        return error_item(
+            item, status.HTTP_400_BAD_REQUEST, "Streaming responses are not allowed in a batch"
+        )
+    content = b"".join(chunks)
+    result = content.decode("utf-8", errors="replace") if content else None
+    if content and response["headers"].get("content-type", "").startswith("application/json"):
+        result = json.loads(content)
+    return {
+        "id": item.id,
+        "status": response["status"],
+        "headers": response["headers"],
+        "body": result,
+    }
+
+
+def split_groups(body: BatchRequest) -> list[list[BatchRequestItem]]:
+    """
+    The split_groups function splits the sub-requests into groups that run one after another.
+    With parallel enabled, consecutive GET requests form one group that runs concurrently;
+    every other request is a group of its own, so writes keep their order.
+
+    :param body: BatchRequest: The batch request body
+    :return: A list of groups of sub-requests
+    :doc-author: Trelent
+    """
+    groups: list[list[BatchRequestItem]] = []
+    for item in body.requests:
+        if body.parallel and item.method == "GET" and groups and groups[-1][0].method == "GET":
+            groups[-1].append(item)
+        else:
+            groups.append([item])
+    return groups
+
+
+async def run_batch(
+    request: Request, body: BatchRequest, current_user: User, db: AsyncSession
+) -> list[dict]:
+    """
+    The run_batch function runs all sub-requests of a batch and collects their results
+    in the same order. Every sub-request reuses the user that authenticated the batch.
+    Sequential sub-requests also share the batch's database session. An AsyncSession
+    can't be used by several coroutines at once, so each request of a concurrent
+    group of reads borrows its own session from the pool.
+
+    :param request: Request: The batch request
+    :param body: BatchRequest: The batch request body
+    :param current_user: User: The user that authenticated the batch
+    :param db: AsyncSession: The database session of the batch
+    :return: A list of dictionaries in the shape of BatchResponseItem
+    :doc-author: Trelent
+    """
+    results = []
+    for group in split_groups(body):
+        if len(group) == 1:
+            state = {"current_user": current_user, "db_session": db}
+            result = await dispatch(request, group[0], state)
+            if result["status"] >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+                await db.rollback()
+            results.append(result)
+            continue
+        results.extend(
+            await asyncio.gather(
+                *(dispatch(request, item, {"current_user": current_user}) for item in group)
+            )
+        )
+    return results
@@ -0,0 +1,320 @@
+import time
+from collections import OrderedDict
+
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.database.redis_db import redis_client
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.metrics import metrics
+
+# INCRBY that sets the TTL of a counter when the increment creates it,
+# so fixed windows don't slide with every hit.
+INCR_SCRIPT = redis_client.register_script(
+    """
+    local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+    if value == tonumber(ARGV[1]) and tonumber(ARGV[2]) > 0 then
+        redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return value
+    """
+)
+
+
+class MemoryBackend:
+    redis = None
+    breaker = None
+
+    def __init__(self, max_entries: int):
+        """
+        The __init__ function sets up a cache in this process, for single-node deployments,
+        development and tests, where no Redis server is needed. Entries expire after their TTL
+        and the least recently used ones are evicted beyond max_entries. The event loop runs
+        one coroutine at a time and no method awaits, so every operation, counters included,
+        is atomic. Services that use Redis scripts treat redis = None as single-node mode.
+        The Redis backend also falls back to it while Redis is unavailable.
+
+        :param self: Represent the instance of the class
+        :param max_entries: int: How many entries are kept
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, tuple[object, float | None]] = OrderedDict()
+
+    def _lookup(self, key: str):
+        """
+        The _lookup function returns a live entry and marks it as recently used.
+        An expired entry is dropped.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :return: A tuple of the value and its expiry time, or None if there is no entry
+        :doc-author: Trelent
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, value, expires: float | None):
+        """
+        The _store function keeps an entry and evicts the least recently used ones beyond the limit.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :param value: The value
+        :param expires: float | None: When the entry expires, None if it doesn't
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.entries[key] = (value, expires)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def get(self, key: str):
+        """
+        The get function returns the value of a key.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :return: The value as bytes (an int for counters), or None if there is none
+        :doc-author: Trelent
+        """
+        entry = self._lookup(key)
+        return None if entry is None else entry[0]
+
+    async def set(self, key: str, value, ttl: float | None = None):
+        """
+        The set function stores a value, for ttl seconds if one is given.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :param value: bytes | str: The value, strings are stored encoded like Redis does
+        :param ttl: float | None: How many seconds the value is kept
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if isinstance(value, str):
+            value = value.encode()
+        self._store(key, value, time.time() + ttl if ttl else None)
+
+    async def delete(self, *keys: str):
+        """
+        The delete function removes keys.
+
+        :param self: Represent the instance of the class
+        :param keys: str: The keys
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        for key in keys:
+            self.entries.pop(key, None)
+
+    async def incr(self, key: str, amount: int = 1, ttl: float | None = None) -> int:
+        """
+        The incr function adds to a counter. A counter that doesn't exist starts at 0
+        and, if a ttl is given, expires ttl seconds after it was created.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key of the counter
+        :param amount: int: How much to add
+        :param ttl: float | None: How many seconds a new counter is kept
+        :return: The new value
+        :doc-author: Trelent
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            value, expires = amount, time.time() + ttl if ttl else None
+        else:
+            value, expires = int(entry[0]) + amount, entry[1]
+        self._store(key, value, expires)
+        return value
+
+    async def expire(self, key: str, ttl: float):
+        """
+        The expire function makes a key expire ttl seconds from now.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :param ttl: float: How many seconds the key is kept
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            self.entries[key] = (entry[0], time.time() + ttl)
+
+    async def ttl(self, key: str) -> float:
+        """
+        The ttl function returns how long a key is kept.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :return: The seconds left, 0 if the key doesn't exist or doesn't expire
+        :doc-author: Trelent
+        """
+        entry = self._lookup(key)
+        if entry is None or entry[1] is None:
+            return 0.0
+        return max(entry[1] - time.time(), 0.0)
+
+
+class RedisBackend:
+    def __init__(
+        self,
+        redis,
+        breaker: CircuitBreaker | None = None,
+        fallback: MemoryBackend | None = None,
+    ):
+        """
+        The __init__ function sets up the cache shared by all workers in Redis.
+        Services with Redis scripts run them on its redis client, guarded by its breaker.
+        While Redis can't be reached, or the breaker is open, the operations go to a
+        cache in this process instead: users are loaded from the database and kept
+        there, and counters count for this worker alone.
+
+        :param self: Represent the instance of the class
+        :param redis: The asyncio Redis client
+        :param breaker: CircuitBreaker | None: The breaker of the Redis calls
+        :param fallback: MemoryBackend | None: The cache used while Redis is unavailable
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.redis = redis
+        self.breaker = breaker if breaker is not None else CircuitBreaker("redis")
+        self.fallback = fallback if fallback is not None else MemoryBackend(10_000)
+
+    async def get(self, key: str):
+        """
+        The get function returns the value of a key.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :return: The value as bytes, or None if there is none
+        :doc-author: Trelent
+        """
+        try:
+            async with self.breaker:
+                return await self.redis.get(key)
+        except (RedisError, OSError):
+            metrics.incr("cache.degraded")
+            return await self.fallback.get(key)
+
+    async def set(self, key: str, value, ttl: float | None = None):
+        """
+        The set function stores a value, for ttl seconds if one is given.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :param value: bytes | str: The value
+        :param ttl: float | None: How many seconds the value is kept
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        try:
+            async with self.breaker:
+                await self.redis.set(key, value, px=int(ttl * 1000) if ttl else None)
+        except (RedisError, OSError):
+            metrics.incr("cache.degraded")
+            await self.fallback.set(key, value, ttl)
+
+    async def delete(self, *keys: str):
+        """
+        The delete function removes keys, from the fallback cache as well.
+
+        :param self: Represent the instance of the class
+        :param keys: str: The keys
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        await self.fallback.delete(*keys)
+        if not keys:
+            return
+        try:
+            async with self.breaker:
+                await self.redis.delete(*keys)
+        except (RedisError, OSError):
+            metrics.incr("cache.degraded")
+
+    async def incr(self, key: str, amount: int = 1, ttl: float | None = None) -> int:
+        """
+        The incr function adds to a counter in one round trip. A counter that doesn't
+        exist starts at 0 and, if a ttl is given, expires ttl seconds after it was created.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key of the counter
+        :param amount: int: How much to add
+        :param ttl: float | None: How many seconds a new counter is kept
+        :return: The new value
+        :doc-author: Trelent
+        """
+        try:
+            async with self.breaker:
+                value = await INCR_SCRIPT(
+                    keys=[key], args=[amount, int((ttl or 0) * 1000)], client=self.redis
+                )
+        except (RedisError, OSError):
+            metrics.incr("cache.degraded")
+            return await self.fallback.incr(key, amount, ttl)
+        return int(value)
+
+    async def expire(self, key: str, ttl: float):
+        """
+        The expire function makes a key expire ttl seconds from now.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :param ttl: float: How many seconds the key is kept
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        try:
+            async with self.breaker:
+                await self.redis.pexpire(key, int(ttl * 1000))
+        except (RedisError, OSError):
+            metrics.incr("cache.degraded")
+            await self.fallback.expire(key, ttl)
+
+    async def ttl(self, key: str) -> float:
+        """
+        The ttl function returns how long a key is kept.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key
+        :return: The seconds left, 0 if the key doesn't exist or doesn't expire
+        :doc-author: Trelent
+        """
+        try:
+            async with self.breaker:
+                return max(await self.redis.pttl(key), 0) / 1000
+        except (RedisError, OSError):
+            metrics.incr("cache.degraded")
+            return await self.fallback.ttl(key)
+
+
+def create_backend(name: str, max_entries: int):
+    """
+    The create_backend function returns the backend selected in the settings.
+
+    :param name: str: memory or redis
+    :param max_entries: int: How many entries the memory backend keeps
+    :return: A MemoryBackend or a RedisBackend
+    :doc-author: Trelent
+    """
+    if name == "memory":
+        return MemoryBackend(max_entries)
+    breaker = CircuitBreaker(
+        "redis",
+        failure_threshold=config.REDIS_BREAKER_FAILURES,
+        reset_timeout=config.REDIS_BREAKER_RESET,
+    )
+    return RedisBackend(redis_client, breaker, MemoryBackend(max_entries))
+
+
+cache_backend = create_backend(config.CACHE_BACKEND, config.CACHE_MAX_ENTRIES)
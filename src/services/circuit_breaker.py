@@ -0,0 +1,151 @@
+import time
+
+from redis.exceptions import ConnectionError
+from redis.exceptions import TimeoutError
+
+from src.services.metrics import metrics
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    The CircuitOpenError is raised instead of calling a service whose circuit is open.
+    It is a ConnectionError, so the callers fall back as if the service were unreachable.
+    """
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 5.0,
+        errors: tuple = (ConnectionError, TimeoutError, OSError),
+    ):
+        """
+        The __init__ function sets up a circuit breaker. After failure_threshold calls in
+        a row fail, the circuit opens and calls fail at once with CircuitOpenError instead
+        of waiting for a timeout each. After reset_timeout seconds the circuit is half open:
+        one call goes through as a probe and closes the circuit if it succeeds or opens it
+        again if it fails. The state is the gauge <name>.breaker_state: 0 closed,
+        1 half open, 2 open.
+
+        :param self: Represent the instance of the class
+        :param name: str: The name of the service, used in the metrics
+        :param failure_threshold: int: How many calls in a row fail before the circuit opens
+        :param reset_timeout: float: How many seconds the circuit stays open before a probe
+        :param errors: tuple: The exceptions that count as failures; others, like a
+            wrong command, say nothing about the service being down
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.errors = errors
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.set_state(CLOSED)
+
+    def set_state(self, state: str):
+        """
+        The set_state function moves the circuit to a state and reports it.
+
+        :param self: Represent the instance of the class
+        :param state: str: closed, half_open or open
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.state = state
+        metrics.set_gauge(f"{self.name}.breaker_state", STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """
+        The allow function decides if a call may go through. An open circuit turns
+        half open once reset_timeout has passed, and a half open one lets a single
+        probe through at a time.
+
+        :param self: Represent the instance of the class
+        :return: True if the call may go through
+        :doc-author: Trelent
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.set_state(HALF_OPEN)
+        if self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def success(self):
+        """
+        The success function records a call that went through and closes the circuit.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.failures = 0
+        self.probing = False
+        if self.state != CLOSED:
+            print(f"{self.name}: circuit closed")
+            self.set_state(CLOSED)
+
+    def failure(self):
+        """
+        The failure function records a failed call and opens the circuit after
+        failure_threshold failures in a row, or after a failed probe.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                print(f"{self.name}: circuit open")
+                metrics.incr(f"{self.name}.breaker_opened")
+            self.opened_at = time.monotonic()
+            self.set_state(OPEN)
+
+    async def __aenter__(self):
+        """
+        The __aenter__ function guards a call: async with breaker: await call().
+
+        :param self: Represent the instance of the class
+        :return: The breaker
+        :doc-author: Trelent
+        """
+        if not self.allow():
+            metrics.incr(f"{self.name}.breaker_rejected")
+            raise CircuitOpenError(f"{self.name}: circuit open")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """
+        The __aexit__ function records how the guarded call ended. A call that ended
+        with another error, or was cancelled, lets the next call probe instead.
+
+        :param self: Represent the instance of the class
+        :param exc_type: The type of the exception the call raised, None if it succeeded
+        :param exc: The exception
+        :param tb: The traceback
+        :return: False, so exceptions propagate
+        :doc-author: Trelent
+        """
+        if exc_type is None:
+            self.success()
+        elif issubclass(exc_type, self.errors):
+            self.failure()
+        else:
+            self.probing = False
+        return False
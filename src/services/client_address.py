@@ -0,0 +1,53 @@
+from ipaddress import ip_address
+from ipaddress import ip_network
+
+from starlette.types import Scope
+
+from src.conf.config import config
+
+TRUSTED_PROXIES = tuple(ip_network(proxy, strict=False) for proxy in config.TRUSTED_PROXIES)
+
+
+def is_trusted_proxy(address: str) -> bool:
+    """
+    The is_trusted_proxy function checks if an address belongs to one of the
+    proxies in front of the application, whose X-Forwarded-For can be believed.
+
+    :param address: str: The address
+    :return: True if the address is in TRUSTED_PROXIES
+    :doc-author: Trelent
+    """
+    try:
+        address = ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def client_address(scope: Scope) -> str:
+    """
+    The client_address function returns the address of the client. The header
+    X-Forwarded-For is written by the client itself, so it is only read when the
+    connection comes from a trusted proxy, and then from the right: the first
+    address that is not a trusted proxy was added by one.
+    The security middleware and the rate limit both use it, so bans, strikes and
+    limits are all kept for the same address.
+
+    :param scope: Scope: The ASGI connection scope, request.scope in a route
+    :return: The client's address, an empty string if the connection has none
+    :doc-author: Trelent
+    """
+    client = scope.get("client")
+    host = client[0] if client else ""
+    if not is_trusted_proxy(host):
+        return host
+    forwarded = [
+        value.decode("latin-1")
+        for name, value in scope["headers"]
+        if name == b"x-forwarded-for"
+    ]
+    for address in reversed(",".join(forwarded).split(",")):
+        address = address.strip()
+        if address and not is_trusted_proxy(address):
+            return address
+    return host
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import time
+from collections import defaultdict
+from collections import deque
+
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.database.redis_db import redis_client
+from src.services.cache_backend import cache_backend
+
+EVENTS_CHANNEL = "contacts:events"
+STREAM_TTL = 24 * 60 * 60
+LISTEN_TIMEOUT = 1.0
+
+PUBLISH_SCRIPT = redis_client.register_script(
+    """
+    local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('PUBLISH', ARGV[4], ARGV[5] .. '\\n' .. id .. '\\n' .. ARGV[2])
+    return id
+    """
+)
+
+
+def stream_key(user_id: int) -> str:
+    """
+    The stream_key function returns the name of the Redis stream with the user's recent events.
+
+    :param user_id: int: The owner of the contacts
+    :return: The key of the stream
+    :doc-author: Trelent
+    """
+    return f"contacts:events:{user_id}"
+
+
+def event_id_key(event_id: str) -> tuple[int, int]:
+    """
+    The event_id_key function turns a Redis stream id like 1713792000000-3 into
+    a tuple, so two ids can be compared.
+
+    :param event_id: str: The stream id
+    :return: A tuple of the milliseconds and the sequence number
+    :doc-author: Trelent
+    """
+    milliseconds, _, sequence = event_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+async def publish_contact_event(user_id: int, event_type: str, ids: list[int]):
+    """
+    The publish_contact_event function tells every worker that contacts were created,
+    updated or deleted. One script appends the event to the user's stream, which is kept
+    for clients that resume with Last-Event-ID, and publishes it on the shared channel.
+    Without Redis, the event goes to this worker's streams directly.
+    Publishing is best effort: the write is already committed, so a Redis error is only logged.
+
+    :param user_id: int: The owner of the contacts
+    :param event_type: str: created, updated or deleted
+    :param ids: list[int]: The ids of the contacts
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    if not ids:
+        return
+    data = json.dumps({"type": event_type, "ids": ids})
+    if broker.redis is None:
+        broker.publish_local(user_id, data)
+        return
+    try:
+        async with broker.breaker:
+            await PUBLISH_SCRIPT(
+                keys=[stream_key(user_id)],
+                args=[config.CONTACT_EVENTS_HISTORY, data, STREAM_TTL, EVENTS_CHANNEL, user_id],
+                client=broker.redis,
+            )
+    except (RedisError, OSError) as err:
+        print(err)
+
+
+class ContactEventBroker:
+    def __init__(self, backend, queue_size: int):
+        """
+        The __init__ function sets up the fan-out of this worker. The worker keeps a single
+        Redis subscription and copies every event into the queues of the open streams of
+        the event's owner, so an idle stream costs a queue and no Redis connection.
+        With the memory backend there is a single worker: events are dispatched here
+        and the recent ones are kept here for clients that resume.
+
+        :param self: Represent the instance of the class
+        :param backend: The cache backend, whose Redis client keeps and publishes the events
+        :param queue_size: int: How many events a slow client may fall behind
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.redis = backend.redis
+        self.breaker = backend.breaker
+        self.queue_size = queue_size
+        self._queues: dict[int, set[asyncio.Queue]] = defaultdict(set)
+        self._listener: asyncio.Task | None = None
+        self._history: dict[int, deque[tuple[str, str]]] = {}
+        self._last_id = (0, 0)
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        """
+        The subscribe function registers a new stream of the user and starts
+        the Redis listener if it is not running yet.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :return: The queue that receives the user's events
+        :doc-author: Trelent
+        """
+        if self.redis is not None and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._queues[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        """
+        The unsubscribe function removes a closed stream.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :param queue: asyncio.Queue: The queue of the closed stream
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        queues = self._queues.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._queues[user_id]
+
+    def dispatch(self, message: str):
+        """
+        The dispatch function copies one published event into the queues of its owner.
+        A queue that is full belongs to a client that stopped reading; it gets None,
+        which closes the stream, and the client resumes from its Last-Event-ID.
+
+        :param self: Represent the instance of the class
+        :param message: str: The published message, owner, id and data separated by newlines
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        user_id, event_id, data = message.split("\n", 2)
+        for queue in list(self._queues.get(int(user_id), ())):
+            if queue.full():
+                self.unsubscribe(int(user_id), queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+            else:
+                queue.put_nowait((event_id, data))
+
+    def publish_local(self, user_id: int, data: str):
+        """
+        The publish_local function dispatches an event without Redis. It gets an id like
+        the ones of a Redis stream, and the user's last events are kept for clients that resume.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :param data: str: The JSON data of the event
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        milliseconds = int(time.time() * 1000)
+        if milliseconds > self._last_id[0]:
+            self._last_id = (milliseconds, 0)
+        else:
+            self._last_id = (self._last_id[0], self._last_id[1] + 1)
+        event_id = f"{self._last_id[0]}-{self._last_id[1]}"
+        history = self._history.setdefault(user_id, deque(maxlen=config.CONTACT_EVENTS_HISTORY))
+        history.append((event_id, data))
+        self.dispatch(f"{user_id}\n{event_id}\n{data}")
+
+    async def _listen(self):
+        """
+        The _listen function reads the events channel for as long as the worker runs
+        and reconnects after Redis errors. It polls, so the socket timeout of the
+        client doesn't break an idle subscription.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    async with self.breaker:
+                        await pubsub.subscribe(EVENTS_CHANNEL)
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=LISTEN_TIMEOUT
+                        )
+                        if message is not None and message["type"] == "message":
+                            self.dispatch(message["data"].decode())
+            except (RedisError, OSError) as err:
+                print(err)
+                await asyncio.sleep(1)
+
+    async def history(self, user_id: int, last_event_id: str) -> list[tuple[str, str]]:
+        """
+        The history function returns the events the client missed after last_event_id.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :param last_event_id: str: The id of the last event the client received
+        :return: A list of (event id, data) tuples
+        :doc-author: Trelent
+        """
+        try:
+            last_key = event_id_key(last_event_id)
+            if self.redis is None:
+                return [
+                    (event_id, data)
+                    for event_id, data in self._history.get(user_id, ())
+                    if event_id_key(event_id) > last_key
+                ]
+            async with self.breaker:
+                entries = await self.redis.xrange(
+                    stream_key(user_id),
+                    min=f"({last_event_id}",
+                    max="+",
+                    count=config.CONTACT_EVENTS_HISTORY,
+                )
+        except (RedisError, OSError, ValueError) as err:
+            print(err)
+            return []
+        return [(event_id.decode(), fields[b"data"].decode()) for event_id, fields in entries]
+
+
+def format_event(event_id: str, data: str) -> str:
+    """
+    The format_event function formats one server-sent event.
+
+    :param event_id: str: The id the client sends back as Last-Event-ID
+    :param data: str: The JSON data of the event
+    :return: The text of the event
+    :doc-author: Trelent
+    """
+    return f"id: {event_id}\nevent: contacts\ndata: {data}\n\n"
+
+
+async def contact_event_stream(user_id: int, last_event_id: str | None):
+    """
+    The contact_event_stream function yields the server-sent events of one client.
+    It subscribes before reading the history, so no event is lost between the two,
+    and skips live events the history already sent. A comment is sent when nothing
+    happened for a while, so proxies keep the connection open.
+
+    :param user_id: int: The owner of the contacts
+    :param last_event_id: str | None: The Last-Event-ID header of a reconnecting client
+    :return: An async generator of event texts
+    :doc-author: Trelent
+    """
+    queue = broker.subscribe(user_id)
+    try:
+        yield f"retry: {config.CONTACT_EVENTS_RETRY_MS}\n\n"
+        last_key = None
+        if last_event_id:
+            for event_id, data in await broker.history(user_id, last_event_id):
+                last_key = event_id_key(event_id)
+                yield format_event(event_id, data)
+        while True:
+            try:
+                item = await asyncio.wait_for(
+                    queue.get(), timeout=config.CONTACT_EVENTS_HEARTBEAT
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if item is None:
+                break
+            event_id, data = item
+            if last_key is not None and event_id_key(event_id) <= last_key:
+                continue
+            yield format_event(event_id, data)
+    finally:
+        broker.unsubscribe(user_id, queue)
+
+
+broker = ContactEventBroker(cache_backend, config.CONTACT_EVENTS_QUEUE_SIZE)
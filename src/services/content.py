@@ -0,0 +1,160 @@
+import enum
+from contextvars import ContextVar
+from datetime import date
+from datetime import datetime
+from datetime import time
+from datetime import timezone
+from typing import Callable
+
+import msgpack
+import orjson
+from fastapi import Request
+from fastapi import Response
+from fastapi.routing import APIRoute
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+response_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON)
+
+
+def msgpack_default(obj):
+    """
+    The msgpack_default function packs the values msgpack has no type for.
+    Dates and datetimes become the native Timestamp extension (naive values are UTC,
+    dates are midnight), which clients decode with Unpacker(timestamp=3).
+
+    :param obj: The value to pack
+    :return: A value msgpack can pack
+    :doc-author: Trelent
+    """
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    if isinstance(obj, date):
+        return msgpack.Timestamp.from_datetime(
+            datetime.combine(obj, time(), tzinfo=timezone.utc)
+        )
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    raise TypeError(f"Cannot pack {type(obj).__name__}")
+
+
+def encode(content, media_type: str | None = None) -> bytes:
+    """
+    The encode function encodes a response body in the negotiated media type.
+
+    :param content: The dicts and lists to encode
+    :param media_type: str | None: The media type, the one negotiated for the request if None
+    :return: The encoded body
+    :doc-author: Trelent
+    """
+    if (media_type or response_media_type.get()) == MSGPACK:
+        return msgpack.packb(content, default=msgpack_default)
+    return orjson.dumps(content)
+
+
+def render(content, status_code: int = 200, headers: dict | None = None) -> Response:
+    """
+    The render function returns a response encoded in the negotiated media type.
+
+    :param content: The dicts and lists to send
+    :param status_code: int: The status code of the response
+    :param headers: dict | None: Extra headers of the response
+    :return: A JSON or MessagePack response
+    :doc-author: Trelent
+    """
+    media_type = response_media_type.get()
+    return Response(encode(content, media_type), status_code, headers, media_type)
+
+
+def negotiate(accept: str | None) -> str:
+    """
+    The negotiate function picks the response media type from the Accept header.
+    MessagePack is chosen when the client lists it with a quality at least as high as JSON.
+
+    :param accept: str | None: The Accept header
+    :return: application/msgpack or application/json
+    :doc-author: Trelent
+    """
+    if not accept:
+        return JSON
+    qualities = {}
+    for item in accept.split(","):
+        media_type, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.strip().lower()] = quality
+    msgpack_quality = max(qualities.get(media_type, 0.0) for media_type in MSGPACK_TYPES)
+    json_quality = max(qualities.get(JSON, 0.0), qualities.get("*/*", 0.0))
+    if msgpack_quality > 0 and msgpack_quality >= json_quality:
+        return MSGPACK
+    return JSON
+
+
+class MsgPackRequest(Request):
+    async def json(self):
+        """
+        The json function returns the decoded MessagePack body. FastAPI reads request
+        bodies through this method, so the routes validate it like a JSON body.
+
+        :param self: Represent the instance of the class
+        :return: The decoded body
+        :doc-author: Trelent
+        """
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body(), timestamp=3)
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        """
+        The get_route_handler function wraps the FastAPI handler of the route.
+        A MessagePack request body is handed to FastAPI as if it were JSON, and the
+        media type picked from the Accept header is kept for the render function.
+        Small JSON answers that don't go through render (stats, bulk results) are
+        converted afterwards, so a MessagePack client always gets MessagePack.
+
+        :param self: Represent the instance of the class
+        :return: The wrapped handler
+        :doc-author: Trelent
+        """
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip()
+            if content_type.lower() in MSGPACK_TYPES:
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (name, JSON.encode() if name == b"content-type" else value)
+                    for name, value in request.scope["headers"]
+                ]
+                request = MsgPackRequest(scope, request.receive)
+            media_type = negotiate(request.headers.get("accept"))
+            token = response_media_type.set(media_type)
+            try:
+                response = await handler(request)
+            finally:
+                response_media_type.reset(token)
+            if media_type == MSGPACK and response.media_type == JSON:
+                headers = {
+                    name: value
+                    for name, value in response.headers.items()
+                    if name not in ("content-length", "content-type")
+                }
+                body = msgpack.packb(orjson.loads(response.body)) if response.body else b""
+                response = Response(body, response.status_code, headers, MSGPACK)
+            if response.media_type != "text/event-stream":
+                response.headers["Vary"] = "Accept"
+            return response
+
+        return negotiated_handler
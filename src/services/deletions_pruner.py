@@ -0,0 +1,76 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.conf.config import config
+from src.database.db import sessionmanager
+from src.repository import contacts as repository_contacts
+from src.services.metrics import metrics
+
+
+class DeletionsPruner:
+    def __init__(self, retention_days: int):
+        """
+        The __init__ function sets up the cleanup of the deletions log, which the changes
+        feed reads and which would otherwise grow with every deleted contact.
+        Deletions are kept for retention_days; the changes feed sends 410 to clients
+        that last synced before that, so no client misses a pruned deletion.
+
+        :param self: Represent the instance of the class
+        :param retention_days: int: How many days a deletion is kept
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.retention = timedelta(days=retention_days)
+        self._watcher: asyncio.Task | None = None
+
+    async def prune(self) -> int:
+        """
+        The prune function removes the deletions older than the retention.
+        Every worker may run it, removing the same rows twice does no harm.
+        If the database can't be reached, the next run tries again.
+
+        :param self: Represent the instance of the class
+        :return: How many deletions were removed
+        :doc-author: Trelent
+        """
+        try:
+            async with sessionmanager.session() as session:
+                now = await repository_contacts.get_database_time(session)
+                pruned = await repository_contacts.prune_contact_deletions(
+                    now - self.retention, session
+                )
+        except (SQLAlchemyError, OSError) as err:
+            print(err)
+            return 0
+        metrics.incr("contact_deletions.pruned", pruned)
+        return pruned
+
+    async def watch(self, interval: int):
+        """
+        The watch function prunes the deletions now and every interval seconds after that.
+
+        :param self: Represent the instance of the class
+        :param interval: int: The number of seconds between two runs
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        while True:
+            await self.prune()
+            await asyncio.sleep(interval)
+
+    def start(self, interval: int):
+        """
+        The start function starts pruning if it is not running yet.
+
+        :param self: Represent the instance of the class
+        :param interval: int: The number of seconds between two runs
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self.watch(interval))
+
+
+deletions_pruner = DeletionsPruner(config.CONTACT_DELETIONS_RETENTION_DAYS)
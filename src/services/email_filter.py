@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import math
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.conf.config import config
+from src.database.db import sessionmanager
+from src.database.models import User
+from src.services.cache_backend import cache_backend
+from src.services.metrics import metrics
+
+EMAILS_CHANNEL = "emails:registered"
+LISTEN_TIMEOUT = 1.0
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        The __init__ function sets up an empty Bloom filter sized for capacity items,
+        so that no more than error_rate of the absent items look present. Present items
+        always look present. 1M emails at 0.1% take about 1.8 MB.
+
+        :param self: Represent the instance of the class
+        :param capacity: int: How many items the filter is sized for
+        :param error_rate: float: The share of false positives at capacity
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item: str):
+        """
+        The positions function returns the bits of an item, derived from one 128-bit
+        hash by double hashing.
+
+        :param self: Represent the instance of the class
+        :param item: str: The item
+        :return: The bit positions
+        :doc-author: Trelent
+        """
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, item: str):
+        """
+        The add function adds an item to the filter.
+
+        :param self: Represent the instance of the class
+        :param item: str: The item
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        """
+        The __contains__ function checks if an item may have been added.
+
+        :param self: Represent the instance of the class
+        :param item: str: The item
+        :return: False if the item was certainly not added
+        :doc-author: Trelent
+        """
+        return all(
+            self.bits[position >> 3] >> (position & 7) & 1 for position in self.positions(item)
+        )
+
+
+class RegisteredEmails:
+    def __init__(self, backend, capacity: int, error_rate: float):
+        """
+        The __init__ function sets up the negative cache of emails: a Bloom filter of every
+        registered email, so lookups of emails that certainly have no account, like a flood
+        of logins with random emails, are answered without a query. The filter is loaded
+        from the database at startup and every interval after that; new accounts are added
+        at signup and published, so every worker adds them. A negative is only trusted while
+        that is confirmed: the filter was loaded after this worker subscribed to the new
+        accounts, and the subscription has not dropped since. Otherwise, and until the first
+        load, every email may exist and the database is asked. Without Redis the workers
+        can't tell each other about new accounts, so the filter is not used at all.
+
+        :param self: Represent the instance of the class
+        :param backend: The cache backend, whose Redis client publishes the new accounts
+        :param capacity: int: How many emails the filter is sized for at least
+        :param error_rate: float: The share of unknown emails that still get a query
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.redis = backend.redis
+        self.breaker = backend.breaker
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom: BloomFilter | None = None
+        self.added: list[str] | None = None
+        self.subscriptions = 0
+        self.subscription: int | None = None
+        self.live = False
+        self.lock = asyncio.Lock()
+        self._watcher: asyncio.Task | None = None
+        self._listener: asyncio.Task | None = None
+
+    def might_exist(self, email: str) -> bool:
+        """
+        The might_exist function checks if an email may have an account.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email
+        :return: False if the email certainly has no account
+        :doc-author: Trelent
+        """
+        if self.bloom is None or email in self.bloom:
+            return True
+        if not self.live:
+            metrics.incr("email_filter.unconfirmed")
+            return True
+        metrics.incr("email_filter.rejected")
+        return False
+
+    def add(self, email: str):
+        """
+        The add function adds an email to the filter, and to the one being loaded if a load is running.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email of a new account
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if self.bloom is not None:
+            self.bloom.add(email)
+        if self.added is not None:
+            self.added.append(email)
+
+    async def register(self, email: str):
+        """
+        The register function adds the email of a new account here and tells the other workers.
+        If Redis can't be reached, they get it with their next load.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email of the new account
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.add(email)
+        if self.redis is None:
+            return
+        try:
+            async with self.breaker:
+                await self.redis.publish(EMAILS_CHANNEL, email)
+        except (RedisError, OSError) as err:
+            print(err)
+
+    def build(self, emails: list[str]) -> BloomFilter:
+        """
+        The build function creates a filter of the emails, with room for twice as many.
+
+        :param self: Represent the instance of the class
+        :param emails: list[str]: The registered emails
+        :return: The filter
+        :doc-author: Trelent
+        """
+        bloom = BloomFilter(max(self.capacity, 2 * len(emails)), self.error_rate)
+        for email in emails:
+            bloom.add(email)
+        return bloom
+
+    async def load(self) -> bool:
+        """
+        The load function reads every registered email and swaps in a new filter.
+        The filter is built in a thread, and the accounts registered in the meantime
+        are added to it before the swap. Its negatives are trusted if the subscription
+        to new accounts was up for the whole load. If the database can't be reached,
+        the filter stays as it was.
+
+        :param self: Represent the instance of the class
+        :return: True if the filter was replaced
+        :doc-author: Trelent
+        """
+        async with self.lock:
+            subscription = self.subscription
+            self.added = []
+            try:
+                async with sessionmanager.session() as session:
+                    emails = list(await session.scalars(select(User.email)))
+                bloom = await asyncio.to_thread(self.build, emails)
+            except (SQLAlchemyError, OSError) as err:
+                print(err)
+                return False
+            finally:
+                added, self.added = self.added, None
+            for email in added:
+                bloom.add(email)
+            self.bloom = bloom
+            self.live = subscription is not None and subscription == self.subscription
+        metrics.set_gauge("email_filter.emails", len(emails))
+        return True
+
+    async def watch(self, interval: int):
+        """
+        The watch function loads the filter now and every interval seconds after that,
+        which also drops the emails of accounts that no longer exist.
+
+        :param self: Represent the instance of the class
+        :param interval: int: The number of seconds between two loads
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        while True:
+            try:
+                await self.load()
+            except Exception as err:
+                print(err)
+            await asyncio.sleep(interval)
+
+    async def _listen(self):
+        """
+        The _listen function adds the accounts registered by every worker for as long
+        as this one runs. Once subscribed, the filter is loaded again, since accounts
+        may have been published before; while the subscription is down, negatives are
+        not trusted.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    async with self.breaker:
+                        await pubsub.subscribe(EMAILS_CHANNEL)
+                    self.subscriptions += 1
+                    self.subscription = self.subscriptions
+                    await self.load()
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=LISTEN_TIMEOUT
+                        )
+                        if message is not None and message["type"] == "message":
+                            self.add(message["data"].decode())
+            except (RedisError, OSError) as err:
+                print(err)
+                self.subscription = None
+                self.live = False
+                await asyncio.sleep(1)
+
+    def start(self, interval: int):
+        """
+        The start function starts loading the filter and listening for new accounts,
+        if it is not running yet. Without Redis there is nothing to start.
+
+        :param self: Represent the instance of the class
+        :param interval: int: The number of seconds between two loads
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if self.redis is None:
+            return
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self.watch(interval))
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+
+registered_emails = RegisteredEmails(
+    cache_backend,
+    capacity=config.EMAIL_FILTER_CAPACITY,
+    error_rate=config.EMAIL_FILTER_ERROR_RATE,
+)
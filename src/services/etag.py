@@ -0,0 +1,142 @@
+import hashlib
+
+from fastapi import Response
+from fastapi import status
+
+from src.database.models import User
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    The make_etag function builds a strong entity tag from the values that decide
+    what a response looks like. Equal parts always give the same tag, so it can be
+    computed from a version or generation number without serializing the body.
+
+    :param *parts: The values the response depends on
+    :return: A quoted entity tag
+    :doc-author: Trelent
+    """
+    raw = "|".join(str(part) for part in parts).encode()
+    return f'"{hashlib.blake2b(raw, digest_size=12).hexdigest()}"'
+
+
+def user_etag(user: User) -> str:
+    """
+    The user_etag function returns the entity tag of a user profile.
+
+    :param user: User: The user to tag
+    :return: A quoted entity tag
+    :doc-author: Trelent
+    """
+    return make_etag("user", user.id, user.updated_at, user.avatar, user.role)
+
+
+def contact_etag(contact_id: int, version: int, user: User) -> str:
+    """
+    The contact_etag function returns the entity tag of a single contact.
+    The response embeds the owner, so the owner's tag is part of it as well.
+
+    :param contact_id: int: The id of the contact
+    :param version: int: The version of the contact row
+    :param user: User: The owner of the contact
+    :return: A quoted entity tag
+    :doc-author: Trelent
+    """
+    return make_etag("contact", contact_id, version, user_etag(user))
+
+
+def contacts_etag(generation: int, user: User, *params) -> str:
+    """
+    The contacts_etag function returns the entity tag of a page of the user's contacts.
+    The generation counter changes on every write to the user's contacts, so the tag
+    is known before any contact row is read.
+
+    :param generation: int: The generation of the user's contacts
+    :param user: User: The owner of the contacts
+    :param *params: The query parameters of the page
+    :return: A quoted entity tag
+    :doc-author: Trelent
+    """
+    return make_etag("contacts", generation, user_etag(user), *params)
+
+
+def parse_etags(header: str | None) -> list[str] | None:
+    """
+    The parse_etags function splits an If-None-Match or If-Match header into tags.
+    Weak tags are returned without their W/ prefix.
+
+    :param header: str | None: The header value
+    :return: The list of tags, ["*"] for a wildcard, or None if the header is missing
+    :doc-author: Trelent
+    """
+    if header is None:
+        return None
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def none_match(header: str | None, etag: str) -> bool:
+    """
+    The none_match function evaluates If-None-Match against the current tag.
+    Like the RFC asks for GET, the comparison is weak.
+
+    :param header: str | None: The If-None-Match header
+    :param etag: str: The current entity tag
+    :return: True if the client's copy is stale and the body has to be sent
+    :doc-author: Trelent
+    """
+    tags = parse_etags(header)
+    if tags is None:
+        return True
+    return "*" not in tags and etag not in tags
+
+
+def match(header: str | None, etag: str) -> bool:
+    """
+    The match function evaluates If-Match against the current tag.
+    Weak tags never match, a missing header always does.
+
+    :param header: str | None: The If-Match header
+    :param etag: str: The current entity tag
+    :return: True if the write may go on
+    :doc-author: Trelent
+    """
+    if header is None:
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str, headers: dict | None = None) -> Response:
+    """
+    The not_modified function returns the empty 304 answer to a conditional GET.
+
+    :param etag: str: The current entity tag
+    :param headers: dict | None: Other headers the full response would have sent
+    :return: A 304 Not Modified response
+    :doc-author: Trelent
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={**(headers or {}), **etag_headers(etag)},
+    )
+
+
+def etag_headers(etag: str) -> dict:
+    """
+    The etag_headers function returns the headers that tag a full response.
+    Cache-Control asks clients to revalidate it with If-None-Match instead of using it blindly.
+
+    :param etag: str: The current entity tag
+    :return: The ETag and Cache-Control headers
+    :doc-author: Trelent
+    """
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+
+class Metrics:
+    def __init__(self):
+        """
+        The __init__ function sets up an empty registry of counters and gauges.
+        Counters only ever grow, gauges hold the last value that was set.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self._counters: dict[str, int] = defaultdict(int)
+        self._gauges: dict[str, float] = {}
+        self._ratios: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {}
+
+    def incr(self, name: str, value: int = 1):
+        """
+        The incr function increases the counter with the given name.
+
+        :param self: Represent the instance of the class
+        :param name: str: Name of the counter
+        :param value: int: How much to add to the counter
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        """
+        The set_gauge function stores the current value of a gauge.
+
+        :param self: Represent the instance of the class
+        :param name: str: Name of the gauge
+        :param value: float: The current value
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self._gauges[name] = value
+
+    def add_ratio(self, name: str, parts: tuple[str, ...], totals: tuple[str, ...]):
+        """
+        The add_ratio function registers a derived value that divides the sum of some
+        counters by the sum of others, e.g. hits / (hits + misses).
+        Registered ratios are computed every time a snapshot is taken.
+
+        :param self: Represent the instance of the class
+        :param name: str: Name of the ratio in the snapshot
+        :param parts: tuple[str, ...]: The counters on top of the fraction
+        :param totals: tuple[str, ...]: The counters that make up the total
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self._ratios[name] = (parts, totals)
+
+    def snapshot(self) -> dict:
+        """
+        The snapshot function returns a copy of all counters, gauges and ratios.
+        A ratio is 0.0 as long as none of its counters was incremented.
+
+        :param self: Represent the instance of the class
+        :return: A dictionary with counters, gauges and ratios
+        :doc-author: Trelent
+        """
+        ratios = {}
+        for name, (parts, totals) in self._ratios.items():
+            part = sum(self._counters.get(counter, 0) for counter in parts)
+            total = sum(self._counters.get(counter, 0) for counter in totals)
+            ratios[name] = part / total if total else 0.0
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "ratios": ratios,
+        }
+
+
+metrics = Metrics()
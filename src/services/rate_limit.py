@@ -0,0 +1,471 @@
+import asyncio
+import time
+from math import ceil
+from math import floor
+
+from fastapi import HTTPException
+from fastapi import Request
+from fastapi import status
+from redis.exceptions import RedisError
+
+from src.conf import messages
+from src.conf.config import config
+from src.database.models import Role
+from src.database.redis_db import redis_client
+from src.services.auth import auth_service
+from src.services.auto_ban import auto_ban
+from src.services.auto_ban import ban_key
+from src.services.cache_backend import cache_backend
+from src.services.client_address import client_address
+from src.services.metrics import metrics
+
+SYNC_BATCH = 500
+
+# GCRA keeps one number per key: the theoretical arrival time (TAT) of the next
+# request. Every request moves it interval = period / times seconds forward, and a
+# request is refused while the TAT would end up more than period seconds ahead of now.
+STRICT_SCRIPT = redis_client.register_script(
+    """
+    local now = tonumber(ARGV[1])
+    local interval = tonumber(ARGV[2])
+    local period = tonumber(ARGV[3])
+    local current = math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), now)
+    local tat = current + interval
+    local wait = tat - now - period
+    if wait > 0 then
+        return {tostring(wait), tostring(current - now)}
+    end
+    redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+    return {'0', tostring(tat - now)}
+    """
+)
+RECONCILE_SCRIPT = redis_client.register_script(
+    """
+    local now = tonumber(ARGV[1])
+    local tats = {}
+    for index, key in ipairs(KEYS) do
+        local interval = tonumber(ARGV[index * 2])
+        local count = tonumber(ARGV[index * 2 + 1])
+        local tat = math.max(tonumber(redis.call('GET', key) or '0'), now) + interval * count
+        if count > 0 then
+            redis.call('SET', key, tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+        end
+        tats[index] = tostring(tat)
+    end
+    return tats
+    """
+)
+# The preamble of a request: the ban of the client's address, the strict limit and
+# the cached user, in one round trip. A banned address stops there.
+PREAMBLE_SCRIPT = redis_client.register_script(
+    """
+    local ban = redis.call('PTTL', KEYS[1])
+    if ban > 0 then
+        return {tostring(ban), '0', '0', false}
+    end
+    local wait, used = '0', '0'
+    if ARGV[4] == '1' then
+        local now = tonumber(ARGV[1])
+        local interval = tonumber(ARGV[2])
+        local period = tonumber(ARGV[3])
+        local current = math.max(tonumber(redis.call('GET', KEYS[2]) or '0'), now)
+        local tat = current + interval
+        if tat - now - period > 0 then
+            wait, used = tostring(tat - now - period), tostring(current - now)
+        else
+            redis.call('SET', KEYS[2], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+            used = tostring(tat - now)
+        end
+    end
+    local user = false
+    if ARGV[5] == '1' then
+        user = redis.call('GET', KEYS[3])
+    end
+    return {'0', wait, used, user}
+    """
+)
+
+
+class Preamble:
+    def __init__(
+        self,
+        wait: float,
+        used: float,
+        banned: float = 0.0,
+        fetched: bool = False,
+        user: bytes | None = None,
+    ):
+        """
+        The __init__ function keeps what the preamble of a request found out.
+
+        :param self: Represent the instance of the class
+        :param wait: float: How many seconds to wait before retrying, 0 if the request is allowed
+        :param used: float: How many seconds of budget are in use
+        :param banned: float: How many seconds the client's address stays banned, 0 if it isn't
+        :param fetched: bool: Whether the cached user was looked up
+        :param user: bytes | None: The cached user, None if it isn't cached
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.wait = wait
+        self.used = used
+        self.banned = banned
+        self.fetched = fetched
+        self.user = user
+
+
+class Bucket:
+    __slots__ = ("tat", "interval", "period", "pending")
+
+    def __init__(self, interval: float, period: float):
+        """
+        The __init__ function sets up the GCRA state of one key in this worker.
+
+        :param self: Represent the instance of the class
+        :param interval: float: The seconds one request costs
+        :param period: float: The seconds of the limit, which is also the burst
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.tat = 0.0
+        self.interval = interval
+        self.period = period
+        self.pending = 0
+
+
+class HybridRateLimiter:
+    def __init__(self, backend, sync_interval: float):
+        """
+        The __init__ function sets up the rate limits of this worker. Requests are
+        counted against GCRA buckets in memory, and the budget consumed is added to the
+        shared state in Redis every sync_interval seconds, in one script call for all keys,
+        which also brings back what the other workers consumed. Between two syncs each
+        worker can let through what the others consumed since the last one, so a shorter
+        interval is more exact and a longer one costs fewer round trips. Limits that must
+        be exact use strict mode, which asks Redis on every request. With the memory
+        backend this worker is the only one, so its buckets are exact and nothing is synced.
+
+        :param self: Represent the instance of the class
+        :param backend: The cache backend
+        :param sync_interval: float: The seconds between two syncs with Redis
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.backend = backend
+        self.redis = backend.redis
+        self.breaker = backend.breaker
+        self.sync_interval = sync_interval
+        self.buckets: dict[str, Bucket] = {}
+        self.touched: set[str] = set()
+        self._syncer: asyncio.Task | None = None
+
+    def consume(self, key: str, times: int, seconds: float) -> tuple[float, float]:
+        """
+        The consume function takes one request from the key's bucket in memory.
+        A bucket whose limit changed, e.g. because the user got another role,
+        keeps what was consumed and continues with the new limit.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key of the limit
+        :param times: int: How many requests are allowed
+        :param seconds: float: Within how many seconds
+        :return: A tuple of how many seconds to wait before retrying (0 if the request
+            is allowed) and how many seconds of budget are in use afterwards
+        :doc-author: Trelent
+        """
+        interval = seconds / times
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket(interval, seconds)
+        elif bucket.interval != interval or bucket.period != seconds:
+            bucket.interval, bucket.period = interval, seconds
+        now = time.time()
+        current = max(bucket.tat, now)
+        wait = current + interval - now - seconds
+        if wait > 0:
+            return wait, current - now
+        bucket.tat = current + interval
+        bucket.pending += 1
+        self.touched.add(key)
+        return 0.0, bucket.tat - now
+
+    async def acquire(
+        self, key: str, times: int, seconds: float, strict: bool = False
+    ) -> tuple[float, float]:
+        """
+        The acquire function takes one request from the key's budget, in memory or,
+        in strict mode, in Redis. If Redis can't be reached, strict limits are enforced
+        by this worker alone.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key of the limit
+        :param times: int: How many requests are allowed
+        :param seconds: float: Within how many seconds
+        :param strict: bool: Whether every request is checked in Redis
+        :return: A tuple of how many seconds to wait before retrying (0 if the request
+            is allowed) and how many seconds of budget are in use afterwards
+        :doc-author: Trelent
+        """
+        if not strict or self.redis is None:
+            return self.consume(key, times, seconds)
+        try:
+            async with self.breaker:
+                wait, used = await STRICT_SCRIPT(
+                    keys=[key], args=[time.time(), seconds / times, seconds], client=self.redis
+                )
+        except (RedisError, OSError) as err:
+            print(err)
+            metrics.incr("rate_limit.errors")
+            return self.consume(key, times, seconds)
+        return float(wait), float(used)
+
+    async def preamble(
+        self,
+        key: str,
+        times: int,
+        seconds: float,
+        strict: bool,
+        ip: str,
+        user_key: str | None,
+    ) -> Preamble:
+        """
+        The preamble function runs every Redis check of a request in one script call:
+        the ban of the client's address (the middleware only knows the bans mirrored so
+        far), the strict limit and the cached user of the token. A limit kept in memory
+        is checked first, so a refused request costs no round trip, and an anonymous
+        request on such a limit costs none at all. If Redis can't be reached, the limit
+        is enforced by this worker and the user is left to the auth service. With the
+        memory backend the bans are all in memory already, and the user is read from it.
+
+        :param self: Represent the instance of the class
+        :param key: str: The key of the limit
+        :param times: int: How many requests are allowed
+        :param seconds: float: Within how many seconds
+        :param strict: bool: Whether the limit is checked in Redis
+        :param ip: str: The client's address
+        :param user_key: str | None: The cache key of the caller's user, None for anonymous requests
+        :return: A Preamble
+        :doc-author: Trelent
+        """
+        wait = used = 0.0
+        if not strict or self.redis is None:
+            wait, used = self.consume(key, times, seconds)
+            if wait > 0 or user_key is None:
+                return Preamble(wait, used)
+            if self.redis is None:
+                return Preamble(wait, used, 0.0, True, await self.backend.get(user_key))
+        try:
+            async with self.breaker:
+                banned, strict_wait, strict_used, user = await PREAMBLE_SCRIPT(
+                    keys=[ban_key(ip), key, user_key or key],
+                    args=[
+                        time.time(),
+                        seconds / times,
+                        seconds,
+                        int(strict),
+                        int(user_key is not None),
+                    ],
+                    client=self.redis,
+                )
+        except (RedisError, OSError) as err:
+            print(err)
+            metrics.incr("rate_limit.errors")
+            if strict:
+                wait, used = self.consume(key, times, seconds)
+            return Preamble(wait, used)
+        if strict:
+            wait, used = float(strict_wait), float(strict_used)
+        return Preamble(wait, used, int(banned) / 1000, user_key is not None, user)
+
+    async def sync(self):
+        """
+        The sync function adds the requests counted since the last sync to Redis and
+        moves every touched bucket to the shared TAT. Requests counted while the script
+        runs are kept on top of it. Buckets that are idle and full are dropped.
+        If Redis can't be reached, the counts are kept for the next sync.
+        With the memory backend the buckets are only dropped.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        now = time.time()
+        keys = [key for key in self.touched if key in self.buckets]
+        self.touched = set()
+        if self.redis is None:
+            for key in keys:
+                self.buckets[key].pending = 0
+            keys = []
+        for start in range(0, len(keys), SYNC_BATCH):
+            batch = keys[start:start + SYNC_BATCH]
+            args = [now]
+            counts = []
+            for key in batch:
+                bucket = self.buckets[key]
+                counts.append(bucket.pending)
+                args.extend((bucket.interval, bucket.pending))
+                bucket.pending = 0
+            try:
+                async with self.breaker:
+                    tats = await RECONCILE_SCRIPT(keys=batch, args=args, client=self.redis)
+            except (RedisError, OSError) as err:
+                print(err)
+                metrics.incr("rate_limit.errors")
+                for key, count in zip(batch, counts):
+                    self.buckets[key].pending += count
+                self.touched.update(batch)
+                continue
+            metrics.incr("rate_limit.syncs")
+            for key, tat in zip(batch, tats):
+                bucket = self.buckets[key]
+                bucket.tat = max(bucket.tat, float(tat) + bucket.pending * bucket.interval)
+        for key in [key for key, bucket in self.buckets.items() if bucket.tat < now]:
+            if key not in self.touched:
+                del self.buckets[key]
+
+    async def _run(self):
+        """
+        The _run function syncs with Redis for as long as the worker runs.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as err:
+                print(err)
+
+    def start(self):
+        """
+        The start function starts syncing with Redis if it is not running yet.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if self._syncer is None or self._syncer.done():
+            self._syncer = asyncio.create_task(self._run())
+
+
+def identify(request: Request) -> tuple[str, Role]:
+    """
+    The identify function returns who a limit is counted for. A valid access token
+    identifies its user wherever the requests come from, so users behind one NAT don't
+    share a budget and one user can't multiply it with many addresses. Anonymous
+    requests are counted per client address.
+    The role comes from the token, so no user is loaded for the check.
+
+    :param request: Request: The incoming request
+    :return: A tuple of the identity and the role of the caller
+    :doc-author: Trelent
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = auth_service.decode_access_token(token)
+        if payload is not None:
+            try:
+                role = Role(payload.get("role", Role.user.value))
+            except ValueError:
+                role = Role.user
+            return f"user:{payload['sub']}", role
+    return f"ip:{client_address(request.scope)}", Role.user
+
+
+def rate_limit_headers(times: int, seconds: float, used: float) -> dict[str, str]:
+    """
+    The rate_limit_headers function describes the state of a limit with the
+    RateLimit-* headers of the IETF draft, so clients can pace themselves.
+
+    :param times: int: How many requests are allowed
+    :param seconds: float: Within how many seconds
+    :param used: float: How many seconds of budget are in use
+    :return: The headers
+    :doc-author: Trelent
+    """
+    interval = seconds / times
+    remaining = max(0, min(times, floor((seconds - used) / interval + 1e-9)))
+    return {
+        "RateLimit-Limit": str(times),
+        "RateLimit-Remaining": str(remaining),
+        "RateLimit-Reset": str(ceil(max(used, 0))),
+        "RateLimit-Policy": f"{times};w={seconds:g}",
+    }
+
+
+class RateLimit:
+    def __init__(
+        self,
+        times: int,
+        seconds: float,
+        strict: bool = False,
+        tiers: dict[Role, int] | None = None,
+    ):
+        """
+        The __init__ function declares the rate limit of a route, used as
+        dependencies=[Depends(RateLimit(times=2, seconds=5, tiers={Role.admin: 20}))].
+        Roles without a tier, and anonymous callers, get times requests.
+
+        :param self: Represent the instance of the class
+        :param times: int: How many requests a client may send
+        :param seconds: float: Within how many seconds
+        :param strict: bool: Check every request in Redis, for limits that must be exact
+        :param tiers: dict[Role, int] | None: How many requests the roles with a higher quota may send
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.times = times
+        self.seconds = seconds
+        self.strict = strict
+        self.tiers = tiers or {}
+
+    async def __call__(self, request: Request):
+        """
+        The __call__ function counts the request against the caller's limit on this route.
+        It is the preamble stage of the request: the ban check, the limit and the cached
+        user are fetched in one Redis round trip, and the user is handed to
+        get_current_user through request.state.cached_user.
+        Allowed requests get the RateLimit-* headers through request.state.response_headers,
+        which the security middleware adds to whatever response the route returns.
+        Once the limit is used up, the answer is 429 with Retry-After. Only a 429 of an
+        anonymous caller counts as a strike against its address, through
+        request.state.strike_ip: users behind one NAT would otherwise get it banned.
+
+        :param self: Represent the instance of the class
+        :param request: Request: The incoming request
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        identity, role = identify(request)
+        times = self.tiers.get(role, self.times)
+        key = f"ratelimit:{identity}:{request.method}:{request.scope['path']}"
+        ip = client_address(request.scope)
+        user_key = identity[len("user:"):] if identity.startswith("user:") else None
+        preamble = await rate_limiter.preamble(
+            key, times, self.seconds, self.strict, ip, user_key
+        )
+        if preamble.banned:
+            auto_ban.ban(ip, preamble.banned)
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=messages.BANNED)
+        if preamble.fetched:
+            request.state.cached_user = preamble.user
+        headers = rate_limit_headers(times, self.seconds, preamble.used)
+        if preamble.wait > 0:
+            metrics.incr("rate_limit.rejected")
+            if user_key is None:
+                request.state.strike_ip = ip
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=messages.TOO_MANY_REQUESTS,
+                headers={**headers, "Retry-After": str(ceil(preamble.wait))},
+            )
+        response_headers = getattr(request.state, "response_headers", None)
+        if response_headers is None:
+            request.state.response_headers = headers
+        else:
+            response_headers.update(headers)
+
+
+rate_limiter = HybridRateLimiter(cache_backend, config.RATE_LIMIT_SYNC_MS / 1000)
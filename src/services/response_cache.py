@@ -0,0 +1,186 @@
+import json
+
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.database.redis_db import redis_client
+from src.services.cache_backend import cache_backend
+from src.services.metrics import metrics
+
+GENERATION_TTL = 24 * 60 * 60
+
+GET_SCRIPT = redis_client.register_script(
+    """
+    local generation = redis.call('GET', KEYS[1]) or '0'
+    local entry = redis.call('HMGET', ARGV[1] .. generation .. ':' .. ARGV[2], 'headers', 'body')
+    return {generation, entry[1], entry[2]}
+    """
+)
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, headers: dict):
+        """
+        The __init__ function keeps a serialized response read from the cache.
+
+        :param self: Represent the instance of the class
+        :param body: bytes: The JSON body
+        :param headers: dict: The headers sent with the body
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.body = body
+        self.headers = headers
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: int):
+        """
+        The __init__ function sets up a cache of serialized responses in the cache backend.
+        Every user has a generation number and the entries are stored under it,
+        so a write makes all of the user's entries unreachable with one INCR
+        and the old ones simply expire. In Redis an entry is a hash read by a script
+        together with the generation; in memory it is the headers and the body in one value.
+
+        :param self: Represent the instance of the class
+        :param backend: The cache backend
+        :param ttl: int: How many seconds an entry is kept
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.backend = backend
+        self.redis = backend.redis
+        self.breaker = backend.breaker
+        self.ttl = ttl
+
+    @staticmethod
+    def generation_key(user_id: int) -> str:
+        """
+        The generation_key function returns the key of the user's generation number.
+
+        :param user_id: int: The owner of the cached responses
+        :return: The Redis key
+        :doc-author: Trelent
+        """
+        return f"responses:generation:{user_id}"
+
+    @staticmethod
+    def entry_prefix(user_id: int, name: str) -> str:
+        """
+        The entry_prefix function returns the start of the keys of one endpoint's entries.
+        The generation and the query parameters are appended to it.
+
+        :param user_id: int: The owner of the cached responses
+        :param name: str: The name of the endpoint
+        :return: The key prefix
+        :doc-author: Trelent
+        """
+        return f"responses:{user_id}:{name}:"
+
+    async def get(self, user_id: int, name: str, params: tuple):
+        """
+        The get function reads the user's generation and the entry stored under it
+        in one round trip. The generation is returned as well, so the caller can
+        store a fresh response under the generation it read before the query.
+        If Redis can't be reached, the request goes to the database and nothing is stored.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the cached responses
+        :param name: str: The name of the endpoint
+        :param params: tuple: The query parameters of the request
+        :return: A tuple of the generation and a CachedResponse, or None on a miss
+        :doc-author: Trelent
+        """
+        if self.redis is None:
+            generation = int(await self.backend.get(self.generation_key(user_id)) or 0)
+            key = f"{self.entry_prefix(user_id, name)}{generation}:{':'.join(map(str, params))}"
+            entry = await self.backend.get(key)
+            if entry is None:
+                metrics.incr("response_cache.misses")
+                return generation, None
+            metrics.incr("response_cache.hits")
+            headers, _, body = entry.partition(b"\n")
+            return generation, CachedResponse(body, json.loads(headers))
+        try:
+            async with self.breaker:
+                generation, headers, body = await GET_SCRIPT(
+                    keys=[self.generation_key(user_id)],
+                    args=[self.entry_prefix(user_id, name), ":".join(map(str, params))],
+                    client=self.redis,
+                )
+        except (RedisError, OSError) as err:
+            print(err)
+            metrics.incr("response_cache.errors")
+            return None, None
+        if body is None:
+            metrics.incr("response_cache.misses")
+            return int(generation), None
+        metrics.incr("response_cache.hits")
+        return int(generation), CachedResponse(body, json.loads(headers))
+
+    async def put(
+        self,
+        user_id: int,
+        name: str,
+        params: tuple,
+        generation: int | None,
+        body: bytes,
+        headers: dict,
+    ):
+        """
+        The put function stores a serialized response under the generation read by get.
+        If a write bumped the generation in the meantime, the entry is never read and expires.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the cached responses
+        :param name: str: The name of the endpoint
+        :param params: tuple: The query parameters of the request
+        :param generation: int | None: The generation returned by get, None skips the store
+        :param body: bytes: The JSON body
+        :param headers: dict: The headers to send with the body
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if generation is None:
+            return
+        key = f"{self.entry_prefix(user_id, name)}{generation}:{':'.join(map(str, params))}"
+        if self.redis is None:
+            await self.backend.set(key, json.dumps(headers).encode() + b"\n" + body, self.ttl)
+            return
+        try:
+            async with self.breaker, self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={"headers": json.dumps(headers), "body": body})
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except (RedisError, OSError) as err:
+            print(err)
+
+    async def invalidate(self, user_id: int):
+        """
+        The invalidate function bumps the user's generation. It is called by each write
+        to the user's contacts and to the user itself, whose profile is part of every contact.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the cached responses
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        key = self.generation_key(user_id)
+        if self.redis is None:
+            await self.backend.incr(key, ttl=GENERATION_TTL)
+            return
+        try:
+            async with self.breaker, self.redis.pipeline(transaction=False) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, GENERATION_TTL)
+                await pipe.execute()
+        except (RedisError, OSError) as err:
+            print(err)
+
+
+response_cache = ResponseCache(cache_backend, config.RESPONSE_CACHE_TTL)
+metrics.add_ratio(
+    "response_cache.hit_ratio",
+    ("response_cache.hits",),
+    ("response_cache.hits", "response_cache.misses"),
+)
@@ -0,0 +1,195 @@
+import pickle
+from types import SimpleNamespace
+
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.database.models import Contact
+from src.database.redis_db import redis_client
+from src.services.cache_backend import cache_backend
+from src.services.metrics import metrics
+from src.services.response_cache import response_cache
+from src.services.serializers import CONTACT_FIELDS
+
+LIKE_WILDCARDS = ("%", "_", "\\")
+ROW_FIELDS = (*CONTACT_FIELDS, "user_id")
+
+# Reads the user's generation and the first entry stored under it among the
+# terms, which are the search term followed by its prefixes, longest first.
+GET_SCRIPT = redis_client.register_script(
+    """
+    local generation = redis.call('GET', KEYS[1]) or '0'
+    for index = 2, #ARGV do
+        local entry = redis.call('GET', ARGV[1] .. generation .. ':' .. ARGV[index])
+        if entry then
+            return {generation, ARGV[index], entry}
+        end
+    end
+    return {generation}
+    """
+)
+
+
+def matches(row: dict, needle: str) -> bool:
+    """
+    The matches function repeats the ILIKE filter of search_contacts in memory.
+    A contact matches if the lowercased needle is part of its name, lastname or email.
+
+    :param row: dict: The cached row of the contact
+    :param needle: str: The lowercased search term
+    :return: True if the contact matches the search term
+    :doc-author: Trelent
+    """
+    return any(
+        needle in (row[name] or "").lower() for name in ("name", "lastname", "email")
+    )
+
+
+def contact_to_row(contact: Contact) -> dict:
+    """
+    The contact_to_row function copies the columns of a contact that the responses need.
+
+    :param contact: Contact: The contact loaded from the database
+    :return: A dict of plain values
+    :doc-author: Trelent
+    """
+    return {name: getattr(contact, name) for name in ROW_FIELDS}
+
+
+def row_to_contact(row: dict, user) -> SimpleNamespace:
+    """
+    The row_to_contact function turns a cached row back into an object the serializers
+    can read like a contact. It is not an ORM instance, so it never joins a session.
+
+    :param row: dict: The cached row
+    :param user: User: The owner of the contact
+    :return: The contact
+    :doc-author: Trelent
+    """
+    return SimpleNamespace(**row, user=user)
+
+
+class SearchCache:
+    def __init__(self, backend, ttl: int, max_rows: int):
+        """
+        The __init__ function sets up a cache of search results in the cache backend,
+        so every worker sees the same entries. The entries are stored under the user's
+        generation of the response cache, which every write to the user's contacts bumps,
+        so a write makes them unreachable on every worker and the old ones simply expire.
+        Results are kept as rows of plain values, not as ORM instances. Only result sets
+        up to max_rows are kept, so every cached entry is complete and can be used to
+        answer longer search terms.
+
+        :param self: Represent the instance of the class
+        :param backend: The cache backend
+        :param ttl: int: How many seconds a result stays valid
+        :param max_rows: int: The biggest result set that is cached
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.backend = backend
+        self.redis = backend.redis
+        self.breaker = backend.breaker
+        self.ttl = ttl
+        self.max_rows = max_rows
+
+    @staticmethod
+    def entry_prefix(user_id: int) -> str:
+        """
+        The entry_prefix function returns the start of the keys of the user's entries.
+        The generation and the search term are appended to it.
+
+        :param user_id: int: The owner of the contacts
+        :return: The key prefix
+        :doc-author: Trelent
+        """
+        return f"search:{user_id}:"
+
+    async def get(self, user_id: int, term: str) -> tuple[int | None, list[dict] | None]:
+        """
+        The get function looks up a search result for the user, with its generation in
+        the same round trip. If the term itself is not cached, the longest cached prefix
+        of the term is filtered in memory, because every contact matching the longer term
+        also matches its prefix. Terms with LIKE wildcards always go to the database, the
+        in-memory filter can't repeat them. Like ILIKE, the lookup ignores the case of the term.
+        If Redis can't be reached, the search goes to the database and nothing is stored.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :param term: str: The search string
+        :return: A tuple of the generation and a list of rows, or None if the database has to be queried
+        :doc-author: Trelent
+        """
+        term = term.lower()
+        terms = [term]
+        if not any(char in term for char in LIKE_WILDCARDS):
+            terms += [term[:length] for length in range(len(term) - 1, 0, -1)]
+        if self.redis is None:
+            generation = int(
+                await self.backend.get(response_cache.generation_key(user_id)) or 0
+            )
+            found, entry = None, None
+            for candidate in terms:
+                key = f"{self.entry_prefix(user_id)}{generation}:{candidate}"
+                entry = await self.backend.get(key)
+                if entry is not None:
+                    found = candidate
+                    break
+        else:
+            try:
+                async with self.breaker:
+                    result = await GET_SCRIPT(
+                        keys=[response_cache.generation_key(user_id)],
+                        args=[self.entry_prefix(user_id), *terms],
+                        client=self.redis,
+                    )
+            except (RedisError, OSError) as err:
+                print(err)
+                metrics.incr("search_cache.errors")
+                return None, None
+            generation = int(result[0])
+            found, entry = (result[1].decode(), result[2]) if len(result) > 1 else (None, None)
+        if entry is None:
+            metrics.incr("search_cache.misses")
+            return generation, None
+        rows = pickle.loads(entry)
+        if found == term:
+            metrics.incr("search_cache.hits")
+            return generation, rows
+        metrics.incr("search_cache.refinements")
+        return generation, [row for row in rows if matches(row, term)]
+
+    async def put(self, user_id: int, term: str, contacts: list, generation: int | None):
+        """
+        The put function stores the result of a database search under the generation
+        read by get. Nothing is stored if the result is too big; if a write bumped the
+        generation in the meantime, the entry is never read and expires.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The owner of the contacts
+        :param term: str: The search string
+        :param contacts: list: The contacts returned by the database
+        :param generation: int | None: The generation returned by get, None skips the store
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if generation is None or len(contacts) > self.max_rows:
+            return
+        key = f"{self.entry_prefix(user_id)}{generation}:{term.lower()}"
+        value = pickle.dumps([contact_to_row(contact) for contact in contacts])
+        if self.redis is None:
+            await self.backend.set(key, value, self.ttl)
+            return
+        try:
+            async with self.breaker:
+                await self.redis.set(key, value, ex=self.ttl)
+        except (RedisError, OSError) as err:
+            print(err)
+
+
+search_cache = SearchCache(cache_backend, config.SEARCH_CACHE_TTL, config.SEARCH_CACHE_MAX_ROWS)
+metrics.add_ratio(
+    "search_cache.db_avoided",
+    ("search_cache.hits", "search_cache.refinements"),
+    ("search_cache.hits", "search_cache.refinements", "search_cache.misses"),
+)
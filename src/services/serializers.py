@@ -0,0 +1,208 @@
+from src.database.models import Contact
+from src.database.models import User
+from src.schemas.contact import ContactFieldsResponse
+from src.schemas.user import UserResponse
+from src.services.content import encode
+from src.services.content import render
+
+# Rows read from our own database already satisfy the response schemas, so they
+# are copied into plain dicts field by field instead of being validated again,
+# then encoded with orjson or msgpack (see src.services.content).
+# The field lists come from the schemas, which keeps the output and the OpenAPI
+# description in step.
+USER_FIELDS = tuple(UserResponse.model_fields)
+CONTACT_FIELDS = tuple(ContactFieldsResponse.model_fields)
+FIELDS = (*CONTACT_FIELDS, "user")
+COMPACT = "compact"
+
+
+def user_to_dict(user: User | None) -> dict | None:
+    """
+    The user_to_dict function copies the UserResponse fields of a user into a dict.
+
+    :param user: User | None: The user loaded from the database
+    :return: A dict ready for orjson, or None
+    :doc-author: Trelent
+    """
+    if user is None:
+        return None
+    return {name: getattr(user, name) for name in USER_FIELDS}
+
+
+def parse_fields(value: str | None) -> tuple[str, ...] | None:
+    """
+    The parse_fields function turns the fields query parameter into the fields of
+    the sparse response, in the order of the schema. The id is always included.
+
+    :param value: str | None: A comma separated list like id,name,phone
+    :return: The selected fields, or None for all of them
+    :doc-author: Trelent
+    """
+    if not value:
+        return None
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested.difference(FIELDS)
+    if unknown:
+        raise ValueError(", ".join(sorted(unknown)))
+    requested.add("id")
+    return tuple(name for name in FIELDS if name in requested)
+
+
+def split_fields(fields: tuple[str, ...] | None) -> tuple[tuple[str, ...], bool]:
+    """
+    The split_fields function separates the column fields from the embedded owner.
+
+    :param fields: tuple[str, ...] | None: The fields returned by parse_fields
+    :return: A tuple of the column names and whether the owner is included
+    :doc-author: Trelent
+    """
+    if fields is None:
+        return CONTACT_FIELDS, True
+    return tuple(name for name in fields if name != "user"), "user" in fields
+
+
+def contact_to_dict(
+    contact: Contact,
+    users: dict | None = None,
+    names: tuple[str, ...] = CONTACT_FIELDS,
+    with_user: bool = True,
+) -> dict:
+    """
+    The contact_to_dict function copies the ContactResponse fields of a contact into a dict.
+    The owner is converted once per list: the dicts of already seen owners are kept in users.
+
+    :param contact: Contact: The contact loaded from the database
+    :param users: dict | None: The owners converted so far, by id
+    :param names: tuple[str, ...]: The columns to copy
+    :param with_user: bool: Whether the owner is embedded
+    :return: A dict ready for orjson
+    :doc-author: Trelent
+    """
+    data = {name: getattr(contact, name) for name in names}
+    if not with_user:
+        return data
+    user = contact.user
+    if users is None or user is None:
+        data["user"] = user_to_dict(user)
+    else:
+        data["user"] = users.get(user.id)
+        if data["user"] is None:
+            data["user"] = users[user.id] = user_to_dict(user)
+    return data
+
+
+def contacts_to_dicts(contacts, fields: tuple[str, ...] | None = None) -> list[dict]:
+    """
+    The contacts_to_dicts function converts a list of contacts.
+
+    :param contacts: The contacts loaded from the database
+    :param fields: tuple[str, ...] | None: The fields to keep, None for all of them
+    :return: A list of dicts ready for orjson
+    :doc-author: Trelent
+    """
+    users = {}
+    names, with_user = split_fields(fields)
+    return [contact_to_dict(contact, users, names, with_user) for contact in contacts]
+
+
+def contacts_to_compact(contacts, fields: tuple[str, ...] | None = None) -> dict:
+    """
+    The contacts_to_compact function converts a list of contacts into the compact
+    envelope: the contacts carry only the user_id of their owner and every owner
+    appears once in the users map, so the size grows with the number of distinct owners.
+
+    :param contacts: The contacts loaded from the database
+    :param fields: tuple[str, ...] | None: The fields to keep, None for all of them
+    :return: A dict with contacts and users, ready for orjson
+    :doc-author: Trelent
+    """
+    users = {}
+    items = []
+    names, with_user = split_fields(fields)
+    for contact in contacts:
+        data = {name: getattr(contact, name) for name in names}
+        items.append(data)
+        if not with_user:
+            continue
+        user_id = data["user_id"] = contact.user_id
+        if user_id is not None and user_id not in users:
+            users[user_id] = user_to_dict(contact.user)
+    return {"contacts": items, "users": {str(key): user for key, user in users.items()}}
+
+
+def contacts_content(
+    contacts, response_format: str | None = None, fields: tuple[str, ...] | None = None
+):
+    """
+    The contacts_content function converts a list of contacts into the requested format.
+
+    :param contacts: The contacts loaded from the database
+    :param response_format: str | None: compact for the envelope with a users map, otherwise a plain list
+    :param fields: tuple[str, ...] | None: The fields to keep, None for all of them
+    :return: A list or dict ready for orjson
+    :doc-author: Trelent
+    """
+    if response_format == COMPACT:
+        return contacts_to_compact(contacts, fields)
+    return contacts_to_dicts(contacts, fields)
+
+
+def dump_contacts(
+    contacts, response_format: str | None = None, fields: tuple[str, ...] | None = None
+) -> bytes:
+    """
+    The dump_contacts function encodes a list of contacts as the body of
+    list[ContactResponse], or of ContactCompactList in the compact format,
+    in the media type negotiated for the request.
+
+    :param contacts: The contacts loaded from the database
+    :param response_format: str | None: compact for the envelope with a users map
+    :param fields: tuple[str, ...] | None: The fields to keep, None for all of them
+    :return: The encoded body
+    :doc-author: Trelent
+    """
+    return encode(contacts_content(contacts, response_format, fields))
+
+
+def contact_response(contact: Contact, status_code: int = 200, headers: dict | None = None):
+    """
+    The contact_response function returns a contact as a JSON or MessagePack response.
+
+    :param contact: Contact: The contact loaded from the database
+    :param status_code: int: The status code of the response
+    :param headers: dict | None: Extra headers of the response
+    :return: A response with the body of ContactResponse
+    :doc-author: Trelent
+    """
+    return render(contact_to_dict(contact), status_code, headers)
+
+
+def contacts_response(
+    contacts,
+    headers: dict | None = None,
+    response_format: str | None = None,
+    fields: tuple[str, ...] | None = None,
+):
+    """
+    The contacts_response function returns a list of contacts as a JSON or MessagePack response.
+
+    :param contacts: The contacts loaded from the database
+    :param headers: dict | None: Extra headers of the response
+    :param response_format: str | None: compact for the envelope with a users map
+    :param fields: tuple[str, ...] | None: The fields to keep, None for all of them
+    :return: A response with the body of list[ContactResponse] or ContactCompactList
+    :doc-author: Trelent
+    """
+    return render(contacts_content(contacts, response_format, fields), headers=headers)
+
+
+def user_response(user: User, headers: dict | None = None):
+    """
+    The user_response function returns a user as a JSON or MessagePack response.
+
+    :param user: User: The user loaded from the database
+    :param headers: dict | None: Extra headers of the response
+    :return: A response with the body of UserResponse
+    :doc-author: Trelent
+    """
+    return render(user_to_dict(user), headers=headers)
@@ -0,0 +1,89 @@
+import base64
+from datetime import datetime
+from typing import NamedTuple
+
+
+class SyncCursor(NamedTuple):
+    updated_at: datetime | None = None
+    contact_id: int = 0
+    deleted_at: datetime | None = None
+    deletion_id: int = 0
+    synced_at: datetime | None = None
+
+
+def format_time(value: datetime | None) -> str:
+    """
+    The format_time function writes a time of the cursor, an empty string for None.
+
+    :param value: datetime | None: The time
+    :return: The ISO format of the time
+    :doc-author: Trelent
+    """
+    return value.isoformat() if value else ""
+
+
+def parse_time(value: str) -> datetime | None:
+    """
+    The parse_time function reads a time written by format_time. The database
+    times have no time zone, so a time with one was not written by format_time.
+
+    :param value: str: The ISO format of the time, or an empty string
+    :return: The time, or None
+    :raises: ValueError: If the time is not valid or has a time zone
+    :doc-author: Trelent
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        raise ValueError("Cursor times have no time zone")
+    return parsed
+
+
+def encode_cursor(cursor: SyncCursor) -> str:
+    """
+    The encode_cursor function turns a sync position into an opaque string for the client.
+    The position is the (updated_at, id) of the last changed contact that was sent,
+    the (deleted_at, id) of the last deletion that was sent, and the time up to
+    which everything was sent.
+
+    :param cursor: SyncCursor: The position to encode
+    :return: A url-safe string
+    :doc-author: Trelent
+    """
+    raw = "|".join(
+        (
+            format_time(cursor.updated_at),
+            str(cursor.contact_id),
+            format_time(cursor.deleted_at),
+            str(cursor.deletion_id),
+            format_time(cursor.synced_at),
+        )
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value: str | None) -> SyncCursor:
+    """
+    The decode_cursor function reads a string made by encode_cursor.
+    A missing cursor means the client has never synced and gets everything.
+
+    :param value: str | None: The cursor sent by the client
+    :return: The decoded sync position
+    :raises: ValueError: If the cursor is not valid
+    :doc-author: Trelent
+    """
+    if not value:
+        return SyncCursor()
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        updated_at, contact_id, deleted_at, deletion_id, synced_at = raw.split("|")
+        return SyncCursor(
+            parse_time(updated_at),
+            int(contact_id),
+            parse_time(deleted_at),
+            int(deletion_id),
+            parse_time(synced_at),
+        )
+    except (ValueError, UnicodeDecodeError) as err:
+        raise ValueError("Invalid cursor") from err
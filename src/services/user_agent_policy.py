@@ -0,0 +1,225 @@
+import asyncio
+import os
+import re
+from functools import lru_cache
+
+REGEX_CHARACTERS = frozenset(r".^$*+?{}[]\|()")
+QUANTIFIERS = frozenset("*+?{")
+MAX_TRIE_PREFIX = 200
+MAX_CACHED_LENGTH = 512
+DEFAULT_FLAGS = re.compile("").flags
+
+
+def split_prefix(pattern: str) -> tuple[str, str]:
+    """
+    The split_prefix function splits a pattern into the literal text it starts with
+    and the regex that follows, e.g. Googlebot/\\d+ into Googlebot and /\\d+.
+    A character followed by a quantifier stays with the regex, and a pattern with
+    an alternation has no prefix, since its branches don't share the start.
+
+    :param pattern: str: A ban pattern, a regular expression or a plain substring
+    :return: A tuple of the literal prefix and the rest of the pattern
+    :doc-author: Trelent
+    """
+    if "|" in pattern:
+        return "", pattern
+    end = 0
+    while end < len(pattern) and pattern[end] not in REGEX_CHARACTERS:
+        end += 1
+    if end < len(pattern) and pattern[end] in QUANTIFIERS:
+        end -= 1
+    end = max(0, min(end, MAX_TRIE_PREFIX))
+    return pattern[:end], pattern[end:]
+
+
+def compile_patterns(patterns) -> list[re.Pattern]:
+    """
+    The compile_patterns function compiles the ban list into as few regexes as possible.
+    The literal prefixes of the patterns are merged into a trie, e.g. Googlebot and
+    Google-Read-Aloud become Google(?:\\-Read\\-Aloud|bot), so at each position of the
+    User-Agent the regex engine follows one path of the trie instead of trying every
+    pattern, much like an Aho-Corasick automaton for the plain names of bot lists. Once
+    a pattern has matched nothing longer needs to be tried, since only whether something
+    matches counts.
+    Every pattern is compiled on its own first, so an invalid one is reported by name.
+    Patterns with groups, whose backreferences would point elsewhere in the merged regex,
+    and patterns with global flags like (?i), which only work at the start of a regex,
+    are kept as regexes of their own.
+
+    :param patterns: The ban patterns, regular expressions or plain substrings
+    :return: The compiled regexes, an empty list if the list is empty
+    :raises: re.error: If a pattern is not a valid regular expression
+    :doc-author: Trelent
+    """
+    trie = {}
+    separate = []
+    for pattern in patterns:
+        try:
+            compiled = re.compile(pattern)
+        except re.error as err:
+            raise re.error(f"Invalid User-Agent pattern {pattern!r}: {err.msg}") from err
+        if compiled.groups or compiled.flags != DEFAULT_FLAGS:
+            separate.append(compiled)
+            continue
+        prefix, rest = split_prefix(pattern)
+        node = trie
+        for character in prefix:
+            node = node.setdefault(character, {})
+        node.setdefault("", set()).add(rest)
+    if not trie:
+        return separate
+
+    def walk(node: dict) -> str:
+        rests = node.get("", ())
+        if "" in rests:
+            return ""
+        branches = [
+            re.escape(character) + walk(child)
+            for character, child in sorted(node.items())
+            if character
+        ]
+        branches.extend(f"(?:{rest})" for rest in sorted(rests))
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return [re.compile(walk(trie)), *separate]
+
+
+def read_patterns(lines) -> list[str]:
+    """
+    The read_patterns function keeps the patterns of a ban file, one per line.
+    Blank lines and lines starting with # are skipped.
+
+    :param lines: The lines of the file
+    :return: The patterns
+    :doc-author: Trelent
+    """
+    patterns = []
+    for line in lines:
+        pattern = line.rstrip("\r\n")
+        if pattern.strip() and not pattern.lstrip().startswith("#"):
+            patterns.append(pattern)
+    return patterns
+
+
+class UserAgentPolicy:
+    def __init__(self, patterns, file: str | None = None, cache_size: int = 4096):
+        """
+        The __init__ function sets up the User-Agent ban list. The patterns are compiled
+        into one regex, and the verdicts are kept in an LRU cache because real traffic
+        only has a few thousand distinct User-Agents. When a file is configured, it
+        replaces the built-in list and reload picks up its changes.
+
+        :param self: Represent the instance of the class
+        :param patterns: The built-in ban patterns
+        :param file: str | None: A file with one pattern per line
+        :param cache_size: int: How many verdicts are kept
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.file = file
+        self.mtime = None
+        self.cache_size = cache_size
+        self._watcher: asyncio.Task | None = None
+        self.load(patterns)
+        self.read_file()
+
+    def load(self, patterns):
+        """
+        The load function replaces the ban list. The new regexes and an empty verdict
+        cache are swapped in together, so no verdict of the old list survives.
+        If a pattern is invalid, the list stays as it was.
+
+        :param self: Represent the instance of the class
+        :param patterns: The ban patterns
+        :return: Nothing
+        :raises: re.error: If a pattern is not a valid regular expression
+        :doc-author: Trelent
+        """
+        patterns = list(patterns)
+        compiled = compile_patterns(patterns)
+
+        @lru_cache(maxsize=self.cache_size)
+        def verdict(user_agent: str) -> bool:
+            return any(regex.search(user_agent) is not None for regex in compiled)
+
+        self.patterns = patterns
+        self.verdict = verdict
+
+    def read_file(self) -> bool:
+        """
+        The read_file function loads the ban file if it changed since the last call.
+        A file that can't be read or has an invalid pattern leaves the list as it was.
+
+        :param self: Represent the instance of the class
+        :return: True if the list changed
+        :doc-author: Trelent
+        """
+        if not self.file:
+            return False
+        try:
+            mtime = os.stat(self.file).st_mtime_ns
+            if mtime == self.mtime:
+                return False
+            with open(self.file, encoding="utf-8") as file:
+                self.load(read_patterns(file))
+        except (OSError, ValueError, re.error) as err:
+            print(err)
+            return False
+        self.mtime = mtime
+        return True
+
+    async def reload(self) -> bool:
+        """
+        The reload function reads the ban file in a thread if it changed.
+
+        :param self: Represent the instance of the class
+        :return: True if the list changed
+        :doc-author: Trelent
+        """
+        return await asyncio.to_thread(self.read_file)
+
+    async def watch(self, interval: int):
+        """
+        The watch function reloads the ban file every interval seconds for as long as the worker runs.
+        A reload that fails keeps the previous list and the next check tries again.
+
+        :param self: Represent the instance of the class
+        :param interval: int: The number of seconds between two checks
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as err:
+                print(err)
+
+    def start(self, interval: int):
+        """
+        The start function starts watching the ban file if one is configured.
+
+        :param self: Represent the instance of the class
+        :param interval: int: The number of seconds between two checks
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        if self.file and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.create_task(self.watch(interval))
+
+    def is_banned(self, user_agent: str) -> bool:
+        """
+        The is_banned function checks a User-Agent against the ban list.
+        Very long values are checked without being cached, so they can't push
+        the common User-Agents out of the cache.
+
+        :param self: Represent the instance of the class
+        :param user_agent: str: The User-Agent header, an empty string if it is missing
+        :return: True if the user agent is banned
+        :doc-author: Trelent
+        """
+        if len(user_agent) > MAX_CACHED_LENGTH:
+            return self.verdict.__wrapped__(user_agent)
+        return self.verdict(user_agent)
@@ -0,0 +1,130 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import sessionmanager
+from src.database.models import User
+from src.repository import users as repository_users
+from src.services.metrics import metrics
+
+
+class UserLoader:
+    def __init__(self):
+        """
+        The __init__ function sets up the loader of users by email, in the manner of a
+        DataLoader. Concurrent loads of the same email share one in-flight load
+        (single flight), and the distinct emails asked for in the same tick of the event
+        loop are loaded together with one query. After a cache expiry or a deploy,
+        a burst of requests therefore costs one query instead of one per request.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.pending: dict[str, asyncio.Future] = {}
+        self.batch: dict[str, asyncio.Future] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    async def load(self, email: str, db: AsyncSession) -> User | None:
+        """
+        The load function returns the user of an email. A load already in flight for
+        the email is joined; otherwise the email is added to the batch of this tick.
+        The batch is queried with a session of its own, so no request depends on
+        another one finishing, and every caller gets its own copy of the user, merged
+        into its session without a query.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email of the user
+        :param db: AsyncSession: The database session of the request
+        :return: The user, or None if there is no user with that email
+        :doc-author: Trelent
+        """
+        metrics.incr("user_loader.loads")
+        future = self.pending.get(email)
+        if future is not None:
+            metrics.incr("user_loader.coalesced")
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.pending[email] = future
+            future.add_done_callback(lambda _: self.pending.pop(email, None))
+            if not self.batch:
+                asyncio.get_running_loop().call_soon(self.dispatch)
+            self.batch[email] = future
+        user = await asyncio.shield(future)
+        if user is None:
+            return None
+        return await db.merge(user, load=False)
+
+    def dispatch(self):
+        """
+        The dispatch function starts the query of the batch collected in this tick.
+        The task is kept until it is done, the event loop only holds a weak reference.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        batch, self.batch = self.batch, {}
+        task = asyncio.get_running_loop().create_task(self.fetch(batch))
+        self.tasks.add(task)
+        task.add_done_callback(lambda done: self.finished(done, batch))
+
+    def finished(self, task: asyncio.Task, batch: dict[str, asyncio.Future]):
+        """
+        The finished function forgets the task of a batch once it is done. If the task
+        was cancelled or failed before it handed out the users, the loads still waiting
+        on the batch are cancelled or fail with its error, instead of waiting forever.
+
+        :param self: Represent the instance of the class
+        :param task: asyncio.Task: The task that ran fetch
+        :param batch: dict[str, asyncio.Future]: The futures of the loads, by email
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        self.tasks.discard(task)
+        if task.cancelled():
+            for future in batch.values():
+                future.cancel()
+            return
+        err = task.exception()
+        if err is None:
+            return
+        print(err)
+        for future in batch.values():
+            if not future.done():
+                future.set_exception(err)
+
+    async def fetch(self, batch: dict[str, asyncio.Future]):
+        """
+        The fetch function loads the users of a batch with one query and hands every
+        waiting load its user, detached from the session, which is closed afterwards.
+        If the query fails, every load of the batch fails with it.
+
+        :param self: Represent the instance of the class
+        :param batch: dict[str, asyncio.Future]: The futures of the loads, by email
+        :return: Nothing
+        :doc-author: Trelent
+        """
+        metrics.incr("user_loader.queries")
+        try:
+            async with sessionmanager.session() as session:
+                users = await repository_users.get_users_by_emails(list(batch), session)
+                for user in users:
+                    session.expunge(user)
+        except Exception as err:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(err)
+            return
+        found = {user.email: user for user in users}
+        for email, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(email))
+
+
+user_loader = UserLoader()
+metrics.add_ratio(
+    "user_loader.coalescing_ratio",
+    ("user_loader.coalesced",),
+    ("user_loader.loads",),
+)
@@ -0,0 +1,36 @@
+import math
+import random
+import time
+
+
+def jittered_ttl(ttl: float, jitter: float) -> float:
+    """
+    The jittered_ttl function shortens a TTL by a random share of up to jitter,
+    so entries written together, e.g. after a deploy, don't expire together.
+
+    :param ttl: float: The TTL in seconds
+    :param jitter: float: The largest share of the TTL to take off, e.g. 0.1
+    :return: The TTL to use
+    :doc-author: Trelent
+    """
+    return ttl * (1 - jitter * random.random())
+
+
+def should_refresh(delta: float, expires: float, beta: float, now: float | None = None) -> bool:
+    """
+    The should_refresh function decides if a cache hit recomputes its entry before it
+    expires, as in XFetch (Vattani et al., Optimal Probabilistic Cache Stampede
+    Prevention). The closer the expiry and the longer the entry takes to compute, the
+    likelier a request refreshes it early, so one request usually refreshes a hot entry
+    before it expires, instead of all of them at the moment it does.
+
+    :param delta: float: How many seconds the entry took to compute
+    :param expires: float: When the entry expires, as a time.time() timestamp
+    :param beta: float: How eagerly to refresh, 1 is the default of the paper
+    :param now: float | None: The current time, time.time() if None
+    :return: True if the entry is to be recomputed
+    :doc-author: Trelent
+    """
+    if now is None:
+        now = time.time()
+    return now - delta * beta * math.log(1 - random.random()) >= expires
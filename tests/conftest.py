@@ -7,8 +7,12 @@ from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.pool import StaticPool
 
+# The tests need no Redis server: caches and rate limits are kept in the process.
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
 from main import app
 from src.database.db import get_db
+from src.database.db import sessionmanager
 from src.database.models import Base
 from src.database.models import User
 from src.services.auth import auth_service
@@ -119,6 +123,8 @@ def client():
             await session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    # Services that open their own sessions, like the user loader, use the test database too.
+    sessionmanager._session_maker = TestingSessionLocal
     yield TestClient(app)
 
 
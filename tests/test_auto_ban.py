@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from redis.exceptions import ConnectionError
+
+from src.services.auto_ban import AutoBan
+from src.services.cache_backend import RedisBackend
+
+
+class TestAutoBan(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function creates the automatic bans around a mocked Redis client before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis = MagicMock()
+        self.redis.evalsha = AsyncMock()
+        self.auto_ban = AutoBan(RedisBackend(self.redis), threshold=3, window=60, base_ttl=60, max_ttl=3600)
+
+    async def test_strike_below_threshold(self):
+        """
+        The test_strike_below_threshold function checks that a strike only counts
+        until the script reports a ban.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis.evalsha.return_value = 0
+        self.assertEqual(await self.auto_ban.strike("10.0.0.1"), 0)
+        self.assertFalse(self.auto_ban.is_banned("10.0.0.1"))
+        args = self.redis.evalsha.call_args.args
+        self.assertEqual(
+            args[2:5],
+            ("autoban:strikes:10.0.0.1", "autoban:offences:10.0.0.1", "autoban:ban:10.0.0.1"),
+        )
+        self.assertEqual(args[5:9], (60, 3, 60, 3600))
+
+    async def test_ban_is_mirrored_and_expires(self):
+        """
+        The test_ban_is_mirrored_and_expires function checks that a ban takes effect
+        in memory at once, that published bans are mirrored and that both expire.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis.evalsha.return_value = 120
+        with patch("src.services.auto_ban.time.time", return_value=1000.0):
+            self.assertEqual(await self.auto_ban.strike("10.0.0.1"), 120)
+            self.auto_ban.dispatch("2001:db8::1 60")
+            self.assertTrue(self.auto_ban.is_banned("10.0.0.1"))
+            self.assertTrue(self.auto_ban.is_banned("2001:db8::1"))
+        with patch("src.services.auto_ban.time.time", return_value=1061.0):
+            self.assertTrue(self.auto_ban.is_banned("10.0.0.1"))
+            self.assertFalse(self.auto_ban.is_banned("2001:db8::1"))
+        with patch("src.services.auto_ban.time.time", return_value=1121.0):
+            self.assertFalse(self.auto_ban.is_banned("10.0.0.1"))
+
+    async def test_redis_errors_lose_the_strike(self):
+        """
+        The test_redis_errors_lose_the_strike function checks that an unreachable
+        Redis doesn't fail the request that caused the strike.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis.evalsha.side_effect = ConnectionError("down")
+        self.assertEqual(await self.auto_ban.strike("10.0.0.1"), 0)
+        self.assertFalse(self.auto_ban.is_banned("10.0.0.1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import patch
+
+from src.services.auto_ban import AutoBan
+from src.services.cache_backend import MemoryBackend
+
+
+class TestMemoryBackend(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function creates a small cache in memory before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.backend = MemoryBackend(max_entries=2)
+
+    async def test_values_expire(self):
+        """
+        The test_values_expire function checks that values are returned like Redis
+        returns them until their TTL is over.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with patch("src.services.cache_backend.time.time", return_value=1000.0):
+            await self.backend.set("a", "value", ttl=10)
+            await self.backend.set("b", b"forever")
+            self.assertEqual(await self.backend.get("a"), b"value")
+            self.assertEqual(await self.backend.ttl("a"), 10)
+            self.assertEqual(await self.backend.ttl("b"), 0)
+        with patch("src.services.cache_backend.time.time", return_value=1010.0):
+            self.assertIsNone(await self.backend.get("a"))
+            self.assertEqual(await self.backend.get("b"), b"forever")
+        await self.backend.delete("b", "missing")
+        self.assertIsNone(await self.backend.get("b"))
+
+    async def test_least_recently_used_is_evicted(self):
+        """
+        The test_least_recently_used_is_evicted function checks that the entry read
+        longest ago is dropped once the cache is full.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        await self.backend.set("a", b"1")
+        await self.backend.set("b", b"2")
+        await self.backend.get("a")
+        await self.backend.set("c", b"3")
+        self.assertEqual(await self.backend.get("a"), b"1")
+        self.assertIsNone(await self.backend.get("b"))
+
+    async def test_counters_keep_their_window(self):
+        """
+        The test_counters_keep_their_window function checks that a counter gets its TTL
+        when it is created and that later increments don't extend it.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with patch("src.services.cache_backend.time.time", return_value=1000.0):
+            self.assertEqual(await self.backend.incr("hits", ttl=60), 1)
+        with patch("src.services.cache_backend.time.time", return_value=1050.0):
+            self.assertEqual(await self.backend.incr("hits", 2, ttl=60), 3)
+        with patch("src.services.cache_backend.time.time", return_value=1060.0):
+            self.assertEqual(await self.backend.incr("hits", ttl=60), 1)
+
+    async def test_auto_ban_in_memory(self):
+        """
+        The test_auto_ban_in_memory function checks that strikes are counted in memory
+        and that repeated bans get longer without a Redis server.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        auto_ban = AutoBan(
+            MemoryBackend(100), threshold=2, window=60, base_ttl=60, max_ttl=3600
+        )
+        self.assertEqual(await auto_ban.strike("10.0.0.1"), 0)
+        self.assertEqual(await auto_ban.strike("10.0.0.1"), 60)
+        self.assertTrue(auto_ban.is_banned("10.0.0.1"))
+        await auto_ban.strike("10.0.0.1")
+        self.assertEqual(await auto_ban.strike("10.0.0.1"), 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
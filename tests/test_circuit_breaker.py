@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from redis.exceptions import ConnectionError
+from redis.exceptions import ResponseError
+
+from src.services.cache_backend import MemoryBackend
+from src.services.cache_backend import RedisBackend
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.circuit_breaker import CircuitOpenError
+from src.services.metrics import metrics
+
+
+async def fail():
+    """
+    The fail function stands in for a call to a Redis server that is down.
+
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    raise ConnectionError("down")
+
+
+class TestCircuitBreaker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function creates a breaker that opens after two failures before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=5)
+
+    async def call(self, call):
+        """
+        The call function runs a call through the breaker and swallows its connection errors.
+
+        :param self: Represent the instance of the class
+        :param call: The coroutine function to call
+        :return: None
+        :doc-author: Trelent
+        """
+        try:
+            async with self.breaker:
+                await call()
+        except ConnectionError:
+            pass
+
+    async def test_opens_and_fails_fast(self):
+        """
+        The test_opens_and_fails_fast function checks that the circuit opens after the
+        failures in a row, that calls are then refused without being made, and that
+        other errors don't count.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with self.assertRaises(ResponseError):
+            async with self.breaker:
+                raise ResponseError("WRONGTYPE")
+        await self.call(fail)
+        self.assertEqual(self.breaker.state, "closed")
+        await self.call(fail)
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(metrics.snapshot()["gauges"]["test.breaker_state"], 2)
+        call = AsyncMock()
+        with self.assertRaises(CircuitOpenError):
+            async with self.breaker:
+                await call()
+        call.assert_not_called()
+
+    async def test_half_open_probe(self):
+        """
+        The test_half_open_probe function checks that an open circuit lets one probe
+        through after the reset timeout, opens again if it fails and closes if it succeeds.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with patch("src.services.circuit_breaker.time.monotonic", return_value=100.0):
+            await self.call(fail)
+            await self.call(fail)
+        with patch("src.services.circuit_breaker.time.monotonic", return_value=106.0):
+            self.assertTrue(self.breaker.allow())
+            self.assertEqual(self.breaker.state, "half_open")
+            self.assertFalse(self.breaker.allow())
+            self.breaker.failure()
+            self.assertEqual(self.breaker.state, "open")
+        with patch("src.services.circuit_breaker.time.monotonic", return_value=112.0):
+            await self.call(AsyncMock())
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(metrics.snapshot()["gauges"]["test.breaker_state"], 0)
+
+    async def test_backend_degrades_to_memory(self):
+        """
+        The test_backend_degrades_to_memory function checks that the Redis backend keeps
+        working in memory while Redis is down and stops calling it once the circuit is open.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        redis = MagicMock()
+        redis.get = AsyncMock(side_effect=ConnectionError("down"))
+        redis.set = AsyncMock(side_effect=ConnectionError("down"))
+        backend = RedisBackend(redis, self.breaker, MemoryBackend(10))
+        self.assertIsNone(await backend.get("user"))
+        await backend.set("user", b"cached", ttl=300)
+        self.assertEqual(await backend.get("user"), b"cached")
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(redis.get.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
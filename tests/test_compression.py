@@ -0,0 +1,140 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi import Request
+from fastapi import Response
+from fastapi.testclient import TestClient
+
+from src.middlewares.compression import CompressionMiddleware
+from src.services.static_files import PrecompressedStaticFiles
+from src.services.static_files import precompress
+
+BODY = b"contact " * 500
+
+
+def make_app(directory: Path) -> FastAPI:
+    """
+    The make_app function builds an app with the compression middleware, a text and
+    an image endpoint and a precompressed static mount.
+
+    :param directory: Path: The static directory
+    :return: The app
+    :doc-author: Trelent
+    """
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1000, compresslevel=6)
+
+    @app.get("/text")
+    async def text(size: int = len(BODY)):
+        return Response(BODY[:size], media_type="text/plain")
+
+    @app.get("/tagged")
+    async def tagged(request: Request):
+        if request.headers.get("if-none-match") == '"v1"':
+            return Response(status_code=304, headers={"ETag": '"v1"'})
+        return Response(BODY, media_type="text/plain", headers={"ETag": '"v1"'})
+
+    @app.get("/image")
+    async def image():
+        return Response(BODY, media_type="image/png")
+
+    app.mount("/static", PrecompressedStaticFiles(directory=directory), name="static")
+    return app
+
+
+class TestCompression(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function writes a stylesheet and its precompressed variant to a temporary
+        static directory before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        path = Path(self.directory.name)
+        path.joinpath("product.css").write_bytes(b"body { color: red; }\n" * 100)
+        self.assertEqual(precompress(path), [path.joinpath("product.css.gz")])
+        self.client = TestClient(make_app(path))
+
+    def test_threshold_and_media_types(self):
+        """
+        The test_threshold_and_media_types function checks that big text bodies are
+        gzipped, while small bodies and images are sent as they are.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        response = self.client.get("/text")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.content, BODY)
+        response = self.client.get("/text", params={"size": 100})
+        self.assertNotIn("content-encoding", response.headers)
+        response = self.client.get("/image")
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.content, BODY)
+
+    def test_static_files_are_served_precompressed(self):
+        """
+        The test_static_files_are_served_precompressed function checks that the .gz
+        variant is sent with cache headers, answers If-None-Match with 304, and that
+        clients without gzip get the plain file.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        response = self.client.get("/static/product.css")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertTrue(response.headers["content-type"].startswith("text/css"))
+        self.assertIn("max-age", response.headers["cache-control"])
+        self.assertEqual(response.content, b"body { color: red; }\n" * 100)
+        raw = Path(self.directory.name, "product.css.gz").read_bytes()
+        self.assertEqual(response.headers["content-length"], str(len(raw)))
+        self.assertEqual(gzip.decompress(raw), response.content)
+
+        response = self.client.get(
+            "/static/product.css",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            "/static/product.css", headers={"Accept-Encoding": "identity"}
+        )
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["vary"], "Accept-Encoding")
+
+    def test_gzip_variant_has_its_own_etag(self):
+        """
+        The test_gzip_variant_has_its_own_etag function checks that a compressed response
+        doesn't share the strong ETag of the plain one, and that its tag still
+        revalidates with 304.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        response = self.client.get("/tagged", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(response.headers["etag"], '"v1"')
+        response = self.client.get("/tagged")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["etag"], '"v1-gzip"')
+
+        response = self.client.get("/tagged", headers={"If-None-Match": '"v1-gzip"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], '"v1-gzip"')
+        response = self.client.get("/tagged", headers={"If-None-Match": '"v1"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["etag"], '"v1"')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+from src.services import contact_events
+from src.services.cache_backend import MemoryBackend
+from src.services.contact_events import ContactEventBroker
+from src.services.contact_events import contact_event_stream
+from src.services.contact_events import publish_contact_event
+
+
+class TestContactEvents(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function replaces the worker's broker with one that has no Redis listener.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.broker = ContactEventBroker(MemoryBackend(10), queue_size=2)
+        self.broker._listen = AsyncMock()
+        patcher = patch.object(contact_events, "broker", self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_resume_skips_events_from_history(self):
+        """
+        The test_resume_skips_events_from_history function checks that a reconnecting
+        client first gets the missed events and then only newer live events.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.broker.history = AsyncMock(return_value=[("5-0", '{"ids": [1]}')])
+        stream = contact_event_stream(7, "4-0")
+        self.assertTrue((await anext(stream)).startswith("retry:"))
+        self.assertEqual(await anext(stream), 'id: 5-0\nevent: contacts\ndata: {"ids": [1]}\n\n')
+        self.broker.dispatch('7\n5-0\n{"ids": [1]}')
+        self.broker.dispatch('8\n6-0\n{"ids": [2]}')
+        self.broker.dispatch('7\n6-0\n{"ids": [3]}')
+        self.assertEqual(await anext(stream), 'id: 6-0\nevent: contacts\ndata: {"ids": [3]}\n\n')
+        await stream.aclose()
+        self.assertEqual(self.broker._queues, {})
+
+    async def test_slow_client_is_disconnected(self):
+        """
+        The test_slow_client_is_disconnected function checks that a client whose queue
+        is full gets its stream closed instead of blocking the other clients.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        queue = self.broker.subscribe(7)
+        for number in range(3):
+            self.broker.dispatch(f'7\n{number}-0\n{{"ids": [{number}]}}')
+        self.assertEqual(queue.get_nowait(), ("1-0", '{"ids": [1]}'))
+        self.assertIsNone(queue.get_nowait())
+        self.assertEqual(self.broker._queues, {})
+
+    async def test_memory_backend_dispatches_locally(self):
+        """
+        The test_memory_backend_dispatches_locally function checks that without Redis an event
+        reaches the streams of this worker and is kept for a client that resumes.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        queue = self.broker.subscribe(7)
+        await publish_contact_event(7, "created", [1])
+        await publish_contact_event(7, "deleted", [2])
+        first, data = queue.get_nowait()
+        self.assertEqual(data, '{"type": "created", "ids": [1]}')
+        second, _ = queue.get_nowait()
+        self.assertEqual(
+            await self.broker.history(7, first), [(second, '{"type": "deleted", "ids": [2]}')]
+        )
+        self.broker._listen.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
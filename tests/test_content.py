@@ -0,0 +1,56 @@
+import unittest
+from datetime import date
+from datetime import datetime
+from datetime import timezone
+
+import msgpack
+
+from src.database.models import Role
+from src.services.content import JSON
+from src.services.content import MSGPACK
+from src.services.content import encode
+from src.services.content import negotiate
+
+
+class TestContentNegotiation(unittest.TestCase):
+
+    def test_negotiate(self):
+        """
+        The test_negotiate function checks which media type is picked from the Accept header.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.assertEqual(negotiate(None), JSON)
+        self.assertEqual(negotiate("*/*"), JSON)
+        self.assertEqual(negotiate("application/msgpack"), MSGPACK)
+        self.assertEqual(negotiate("application/x-msgpack, */*;q=0.5"), MSGPACK)
+        self.assertEqual(negotiate("application/json, application/msgpack;q=0.9"), JSON)
+        self.assertEqual(negotiate("application/msgpack;q=0"), JSON)
+
+    def test_msgpack_uses_native_timestamps(self):
+        """
+        The test_msgpack_uses_native_timestamps function checks that dates and datetimes
+        are packed as Timestamp extensions and enums as their values.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        content = {
+            "birthday": date(1960, 5, 17),
+            "created_at": datetime(2024, 4, 22, 12, 30, 15, 123456),
+            "role": Role.admin,
+        }
+        data = msgpack.unpackb(encode(content, MSGPACK), timestamp=3)
+        self.assertEqual(data["birthday"], datetime(1960, 5, 17, tzinfo=timezone.utc))
+        self.assertEqual(
+            data["created_at"],
+            datetime(2024, 4, 22, 12, 30, 15, 123456, tzinfo=timezone.utc),
+        )
+        self.assertEqual(data["role"], "admin")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import contextlib
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+
+from src.services.deletions_pruner import DeletionsPruner
+
+
+class TestDeletionsPruner(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function replaces the database session and the delete with mocks before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.session = MagicMock()
+        self.session.scalar = AsyncMock(return_value=datetime(2026, 10, 31))
+        patcher = patch(
+            "src.services.deletions_pruner.sessionmanager.session",
+            contextlib.asynccontextmanager(self.open_session),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch(
+            "src.services.deletions_pruner.repository_contacts.prune_contact_deletions",
+            AsyncMock(return_value=3),
+        )
+        self.prune_deletions = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def open_session(self):
+        """
+        The open_session function stands in for the session of a run.
+
+        :param self: Represent the instance of the class
+        :return: An async generator that yields the mock session
+        :doc-author: Trelent
+        """
+        yield self.session
+
+    async def test_prune_keeps_the_retention(self):
+        """
+        The test_prune_keeps_the_retention function checks that the deletions older than
+        the retention, by the database clock, are removed, that PostgreSQL is asked for
+        its clock without a time zone, like the columns store it, and that database
+        errors don't stop the pruner.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        pruner = DeletionsPruner(retention_days=30)
+        self.assertEqual(await pruner.prune(), 3)
+        self.prune_deletions.assert_awaited_once_with(datetime(2026, 10, 1), self.session)
+
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        await pruner.prune()
+        stmt = self.session.scalar.await_args.args[0]
+        self.assertIn("LOCALTIMESTAMP", str(stmt.compile(dialect=postgresql.dialect())))
+
+        self.prune_deletions.side_effect = OperationalError("DELETE", {}, Exception("down"))
+        self.assertEqual(await pruner.prune(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+from main import app
+from src.services.auth import auth_service
+
+app.user_middleware = []
+
+
+def test_batch(client, get_token):
+    """
+    The test_batch function tests the /api/batch endpoint.
+    It sends two reads that run concurrently, a write, a nested batch and an unknown path,
+    and checks that every sub-request gets its own status in the original order.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {"Authorization": f"Bearer {get_token}"}
+        response = client.post(
+            "api/batch",
+            headers=headers,
+            json={
+                "requests": [
+                    {"id": "list", "path": "/api/contacts/?limit=10"},
+                    {"id": "stats", "path": "/api/contacts/stats"},
+                    {
+                        "id": "favourite",
+                        "method": "POST",
+                        "path": "/api/contacts/bulk/favourite",
+                        "body": {"ids": [1], "favourite": True},
+                    },
+                    {"id": "nested", "method": "POST", "path": "/api/batch"},
+                    {"id": "missing", "path": "/api/missing"},
+                ]
+            },
+        )
+        assert response.status_code == 200, response.text
+        results = response.json()["responses"]
+        assert [result["id"] for result in results] == [
+            "list",
+            "stats",
+            "favourite",
+            "nested",
+            "missing",
+        ]
+        assert results[0]["status"] == 200
+        assert results[0]["body"] == []
+        assert results[0]["headers"]["x-total-count"] == "0"
+        assert results[1]["body"]["total"] == 0
+        assert results[2]["status"] == 200
+        assert results[2]["body"] == {"ids": []}
+        assert results[3]["status"] == 400
+        assert results[4]["status"] == 404
+        assert redis_mock.get.call_count == 1
+
+
+def test_batch_rejects_streams(client, get_token):
+    """
+    The test_batch_rejects_streams function checks that a sub-request to the contact
+    events, a stream that never ends, is answered 400 instead of holding up the batch.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {"Authorization": f"Bearer {get_token}"}
+        response = client.post(
+            "api/batch",
+            headers=headers,
+            json={
+                "requests": [
+                    {"id": "events", "path": "/api/contacts/events"},
+                    {"id": "stats", "path": "/api/contacts/stats"},
+                ]
+            },
+        )
+        assert response.status_code == 200, response.text
+        results = response.json()["responses"]
+        assert results[0]["status"] == 400
+        assert results[0]["body"]["detail"] == "Streaming responses are not allowed in a batch"
+        assert results[1]["status"] == 200
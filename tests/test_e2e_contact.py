@@ -1,7 +1,18 @@
+from datetime import date
+from datetime import datetime
+from datetime import timezone
 from unittest.mock import patch
 from unittest.mock import patch, MagicMock, AsyncMock
+
+import msgpack
+
 from main import app
+from src.conf.config import config
 from src.services.auth import auth_service
+from src.services.rate_limit import Preamble
+from src.services.rate_limit import rate_limiter
+from src.services.sync_cursor import SyncCursor
+from src.services.sync_cursor import encode_cursor
 
 app.user_middleware = []
 
@@ -17,7 +28,7 @@ def test_get_contacts(client, get_token):
     :return: A 200 response code and a list of contacts
     :doc-author: Trelent
     """
-    with patch.object(auth_service, "cache") as redis_mock:
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
         redis_mock.get.return_value = None
         headers = {"Authorization": f"Bearer {get_token}"}
         response = client.get("api/contacts", headers=headers)
@@ -36,11 +47,9 @@ def test_create_contacts(client, get_token, monkeypatch):
     :return: A 201 status code and a json object with the created contact
     :doc-author: Trelent
     """
-    with patch.object(auth_service, "cache") as redis_mock:
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
         redis_mock.get.return_value = None
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.identifier", AsyncMock())
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.http_callback", AsyncMock())
+        monkeypatch.setattr(rate_limiter, "preamble", AsyncMock(return_value=Preamble(0, 0)))
         headers = {"Authorization": f"Bearer {get_token}"}
         response = client.post(
             "api/contacts",
@@ -60,3 +69,293 @@ def test_create_contacts(client, get_token, monkeypatch):
         assert data["name"] == "test"
         assert data["lastname"] == "testovich"
         assert "password" not in data
+
+
+def test_contacts_compact_format(client, get_token):
+    """
+    The test_contacts_compact_format function tests the compact envelope of the contact list.
+    The contacts carry user_id and the owner is sent once in the users map.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {"Authorization": f"Bearer {get_token}"}
+        response = client.get(
+            "api/contacts", headers=headers, params={"format": "compact"}
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert len(data["contacts"]) == 1
+        user_id = data["contacts"][0]["user_id"]
+        assert "user" not in data["contacts"][0]
+        assert data["users"][str(user_id)]["email"] == "deadpool@example.com"
+
+        response = client.get(
+            "api/contacts", headers=headers, params={"format": "xml"}
+        )
+        assert response.status_code == 422, response.text
+
+
+def test_contacts_sparse_fields(client, get_token):
+    """
+    The test_contacts_sparse_fields function tests the fields parameter of the contact list.
+    Only the listed fields and the id are sent, and unknown fields are rejected.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {"Authorization": f"Bearer {get_token}"}
+        response = client.get(
+            "api/contacts", headers=headers, params={"fields": "phone,name"}
+        )
+        assert response.status_code == 200, response.text
+        assert response.json()[0] == {"id": 1, "name": "test", "phone": "123456789"}
+
+        response = client.get(
+            "api/contacts/search/",
+            headers=headers,
+            params={"search": "testo", "fields": "lastname,user", "format": "compact"},
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert set(data["contacts"][0]) == {"id", "lastname", "user_id"}
+        assert len(data["users"]) == 1
+
+        response = client.get(
+            "api/contacts", headers=headers, params={"fields": "name,password"}
+        )
+        assert response.status_code == 400, response.text
+
+
+def test_contacts_msgpack(client, get_token):
+    """
+    The test_contacts_msgpack function tests MessagePack content negotiation.
+    Responses are packed when the client accepts MessagePack, dates come back as
+    timestamps, and a MessagePack request body is validated like a JSON one.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {
+            "Authorization": f"Bearer {get_token}",
+            "Accept": "application/msgpack",
+        }
+        response = client.get("api/contacts", headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "application/msgpack"
+        contacts = msgpack.unpackb(response.content, timestamp=3)
+        assert contacts[0]["name"] == "test"
+        assert contacts[0]["birthday"].date() == date(1990, 1, 1)
+
+        response = client.patch(
+            f"api/contacts/{contacts[0]['id']}",
+            headers={**headers, "Content-Type": "application/msgpack"},
+            content=msgpack.packb({"favourite": False}),
+        )
+        assert response.status_code == 200, response.text
+        assert msgpack.unpackb(response.content)["favourite"] is False
+
+        response = client.get("api/contacts/stats", headers=headers)
+        assert response.status_code == 200, response.text
+        assert msgpack.unpackb(response.content)["total"] == 1
+
+
+def test_contact_etags(client, get_token):
+    """
+    The test_contact_etags function tests conditional requests on contacts.
+    A current If-None-Match gets 304 for the contact and the list, a stale If-Match
+    gets 412, and a write changes both ETags.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {"Authorization": f"Bearer {get_token}"}
+        response = client.get("api/contacts", headers=headers)
+        list_etag = response.headers["ETag"]
+        contact_id = response.json()[0]["id"]
+        response = client.get(f"api/contacts/{contact_id}", headers=headers)
+        assert response.status_code == 200, response.text
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            f"api/contacts/{contact_id}", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304, response.text
+        assert response.content == b""
+        response = client.get(
+            "api/contacts", headers={**headers, "If-None-Match": f"W/{list_etag}"}
+        )
+        assert response.status_code == 304, response.text
+        assert response.headers["X-Total-Count"] == "1"
+
+        response = client.patch(
+            f"api/contacts/{contact_id}",
+            headers={**headers, "If-Match": '"stale"'},
+            json={"favourite": False},
+        )
+        assert response.status_code == 412, response.text
+        response = client.patch(
+            f"api/contacts/{contact_id}",
+            headers={**headers, "If-Match": etag},
+            json={"favourite": True},
+        )
+        assert response.status_code == 200, response.text
+        assert response.headers["ETag"] != etag
+        response = client.patch(
+            f"api/contacts/{contact_id}",
+            headers={**headers, "If-Match": response.headers["ETag"]},
+            json={"favourite": False},
+        )
+        assert response.status_code == 200, response.text
+
+        response = client.get(
+            f"api/contacts/{contact_id}", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 200, response.text
+        response = client.get(
+            "api/contacts", headers={**headers, "If-None-Match": list_etag}
+        )
+        assert response.status_code == 200, response.text
+
+
+def test_contacts_total_count(client, get_token):
+    """
+    The test_contacts_total_count function tests that the contact counters follow
+    the writes made in the previous tests. The list endpoint sends the total in the
+    X-Total-Count header and the stats endpoint returns it together with favourites.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {"Authorization": f"Bearer {get_token}"}
+        response = client.get("api/contacts", headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.headers["X-Total-Count"] == "1"
+        response = client.get("api/contacts/stats", headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json() == {"total": 1, "favourites": 0, "estimated": False}
+        response = client.get("api/contacts/all", headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.headers["X-Total-Count"] == "1"
+
+
+def test_bulk_contacts(client, get_token):
+    """
+    The test_bulk_contacts function tests the bulk favourite, patch and delete endpoints.
+    Ids that don't belong to the user are skipped, and the counters follow the bulk writes.
+    A patch can't null a field.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {"Authorization": f"Bearer {get_token}"}
+        contact_id = client.get("api/contacts", headers=headers).json()[0]["id"]
+
+        response = client.post(
+            "api/contacts/bulk/favourite",
+            headers=headers,
+            json={"ids": [contact_id, 9999], "favourite": True},
+        )
+        assert response.status_code == 200, response.text
+        assert response.json() == {"ids": [contact_id]}
+        stats = client.get("api/contacts/stats", headers=headers).json()
+        assert stats["favourites"] == 1
+
+        response = client.patch(
+            "api/contacts/bulk",
+            headers=headers,
+            json={"ids": [contact_id], "patch": {"notes": "bulk notes"}},
+        )
+        assert response.status_code == 200, response.text
+        contact = client.get(f"api/contacts/{contact_id}", headers=headers).json()
+        assert contact["notes"] == "bulk notes"
+        assert contact["name"] == "test"
+
+        response = client.patch(
+            "api/contacts/bulk",
+            headers=headers,
+            json={"ids": [contact_id], "patch": {"name": None}},
+        )
+        assert response.status_code == 422, response.text
+
+        response = client.post(
+            "api/contacts/bulk/delete", headers=headers, json={"ids": [contact_id]}
+        )
+        assert response.status_code == 200, response.text
+        assert response.json() == {"ids": [contact_id]}
+        stats = client.get("api/contacts/stats", headers=headers).json()
+        assert stats == {"total": 0, "favourites": 0, "estimated": False}
+
+
+def test_contact_changes(client, get_token, monkeypatch):
+    """
+    The test_contact_changes function tests the changes feed.
+    Changes younger than the lag are held back. A full sync returns the tombstone
+    of the contact deleted by the bulk test, a sync from the returned cursor has
+    nothing new, and a cursor older than the retention of the deletions gets 410.
+    Cursors with a time zone were not made by the feed and get 400.
+
+    :param client: Make requests to the api
+    :param get_token: Get the token from the fixture
+    :param monkeypatch: Change the lag of the feed
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+        headers = {"Authorization": f"Bearer {get_token}"}
+        monkeypatch.setattr(config, "CONTACT_CHANGES_LAG", 3600)
+        response = client.get("api/contacts/changes", headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["deleted"] == []
+
+        monkeypatch.setattr(config, "CONTACT_CHANGES_LAG", 0)
+        response = client.get("api/contacts/changes", headers=headers)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["changed"] == []
+        assert data["deleted"] == [1]
+        assert data["has_more"] is False
+
+        response = client.get(
+            "api/contacts/changes", headers=headers, params={"since": data["cursor"]}
+        )
+        assert response.status_code == 200, response.text
+        assert response.json()["deleted"] == []
+
+        response = client.get(
+            "api/contacts/changes", headers=headers, params={"since": "not a cursor"}
+        )
+        assert response.status_code == 400, response.text
+
+        expired = encode_cursor(SyncCursor(synced_at=datetime(2000, 1, 1)))
+        response = client.get("api/contacts/changes", headers=headers, params={"since": expired})
+        assert response.status_code == 410, response.text
+
+        zoned = encode_cursor(SyncCursor(synced_at=datetime(2000, 1, 1, tzinfo=timezone.utc)))
+        response = client.get("api/contacts/changes", headers=headers, params={"since": zoned})
+        assert response.status_code == 400, response.text
@@ -0,0 +1,113 @@
+from ipaddress import ip_network
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from src.middlewares.security import SecurityMiddleware
+from src.services.auto_ban import auto_ban
+from src.services.rate_limit import Preamble
+from src.services.rate_limit import rate_limiter
+
+PROXY = "10.0.0.2"
+
+app.user_middleware = []
+secured = SecurityMiddleware(app, strike_paths=["/api/auth/login"])
+
+
+async def behind_proxy(scope, receive, send):
+    """
+    The behind_proxy function is the application as a reverse proxy at PROXY reaches it:
+    every connection comes from the proxy, the client is named in X-Forwarded-For.
+
+    :param scope: The ASGI connection scope
+    :param receive: Receive ASGI messages from the client
+    :param send: Send ASGI messages to the client
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    scope["client"] = (PROXY, 50000)
+    await secured(scope, receive, send)
+
+
+@pytest.fixture
+def proxied(client, monkeypatch):
+    """
+    The proxied function is a fixture that returns a test client behind a trusted proxy.
+    Bans and strikes are reset before and after the test.
+
+    :param client: Set up the test database
+    :param monkeypatch: Trust the proxy and reset the automatic bans
+    :return: A test client whose requests come from PROXY
+    :doc-author: Trelent
+    """
+    monkeypatch.setattr(
+        "src.services.client_address.TRUSTED_PROXIES", (ip_network("10.0.0.0/24"),)
+    )
+    monkeypatch.setattr(auto_ban, "bans", {})
+    monkeypatch.setattr(auto_ban, "threshold", 1)
+    yield TestClient(behind_proxy)
+    auto_ban.bans.clear()
+
+
+def login(proxied, client_ip: str):
+    """
+    The login function sends a failed login of a client through the proxy.
+
+    :param proxied: The test client behind the proxy
+    :param client_ip: str: The client's address in X-Forwarded-For
+    :return: The response
+    :doc-author: Trelent
+    """
+    return proxied.post(
+        "api/auth/login",
+        data={"username": "nobody@example.com", "password": "wrong"},
+        headers={"X-Forwarded-For": f"198.51.100.9, {client_ip}"},
+    )
+
+
+def test_failed_login_bans_client_not_proxy(proxied):
+    """
+    The test_failed_login_bans_client_not_proxy function checks that behind a trusted
+    proxy the policies and the strikes of failed logins apply to the client named in
+    X-Forwarded-For, not to the proxy, so one client can't lock out everybody else.
+
+    :param proxied: The test client behind the proxy
+    :return: None
+    :doc-author: Trelent
+    """
+    assert login(proxied, "192.168.1.7").status_code == 401
+    assert auto_ban.is_banned("192.168.1.7")
+    assert not auto_ban.is_banned(PROXY)
+    assert login(proxied, "192.168.1.7").status_code == 403
+    assert login(proxied, "192.168.1.8").status_code == 401
+    # The proxy itself is not in the allow list, the client is.
+    assert login(proxied, "82.220.71.77").status_code == 403
+
+
+def test_rate_limit_bans_are_enforced(proxied, monkeypatch):
+    """
+    The test_rate_limit_bans_are_enforced function checks that the bans the rate limit
+    records for the client behind the proxy, from an anonymous 429 or from the preamble,
+    are the ones the security middleware rejects.
+
+    :param proxied: The test client behind the proxy
+    :param monkeypatch: Replace the rate limiter's preamble
+    :return: None
+    :doc-author: Trelent
+    """
+    headers = {"X-Forwarded-For": "192.168.1.7"}
+    monkeypatch.setattr(rate_limiter, "preamble", AsyncMock(return_value=Preamble(1, 10)))
+    assert proxied.post("api/contacts/", json={}, headers=headers).status_code == 429
+    assert auto_ban.is_banned("192.168.1.7")
+    assert proxied.post("api/contacts/", json={}, headers=headers).status_code == 403
+
+    headers = {"X-Forwarded-For": "192.168.1.8"}
+    monkeypatch.setattr(
+        rate_limiter, "preamble", AsyncMock(return_value=Preamble(0, 0, banned=60))
+    )
+    assert proxied.post("api/contacts/", json={}, headers=headers).status_code == 403
+    assert auto_ban.is_banned("192.168.1.8")
+    assert not auto_ban.is_banned(PROXY)
+    assert proxied.get("api/contacts", headers=headers).status_code == 403
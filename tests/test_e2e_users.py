@@ -3,6 +3,8 @@ from unittest.mock import patch
 
 from main import app
 from src.services.auth import auth_service
+from src.services.rate_limit import Preamble
+from src.services.rate_limit import rate_limiter
 
 app.user_middleware = []
 
@@ -10,22 +12,20 @@ app.user_middleware = []
 def test__current_user(client, get_token, monkeypatch):
     """
     The test__current_user function tests the /api/users/me endpoint.
-    It does this by first patching the auth_service's cache with a mock object, and then setting up mocks for FastAPILimiter's redis, identifier, and http_callback functions.
+    It does this by first patching the auth_service's cache with a mock object, and then mocking the rate limiter so earlier tests don't use up its budget.
     Then it makes a GET request to /api/users/me with an Authorization header containing a valid JWT token (obtained from get_token).
     Finally it asserts that the response status code is 200.
 
     :param client: Make requests to the api
     :param get_token: Get a token for the user
-    :param monkeypatch: Replace the redis and identifier functions with asyncmock
+    :param monkeypatch: Replace the rate limiter with an asyncmock
     :return: The current user
     :doc-author: Trelent
     """
-    with patch.object(auth_service, "cache") as redis_mock:
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
         redis_mock.get.return_value = None
 
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.redis", AsyncMock())
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.identifier", AsyncMock())
-        monkeypatch.setattr("fastapi_limiter.FastAPILimiter.http_callback", AsyncMock())
+        monkeypatch.setattr(rate_limiter, "preamble", AsyncMock(return_value=Preamble(0, 0)))
 
         headers = {"Authorization": f"Bearer {get_token}"}
         response = client.get(
@@ -33,3 +33,32 @@ def test__current_user(client, get_token, monkeypatch):
             headers=headers,
         )
         assert response.status_code == 200, response.text
+
+
+def test_current_user_not_modified(client, get_token, monkeypatch):
+    """
+    The test_current_user_not_modified function tests that /api/users/me sends an ETag
+    and answers 304 with no body when the client's copy is current.
+
+    :param client: Make requests to the api
+    :param get_token: Get a token for the user
+    :param monkeypatch: Replace the rate limiter with an asyncmock
+    :return: None
+    :doc-author: Trelent
+    """
+    with patch.object(auth_service, "cache", new_callable=AsyncMock) as redis_mock:
+        redis_mock.get.return_value = None
+
+        monkeypatch.setattr(rate_limiter, "preamble", AsyncMock(return_value=Preamble(0, 0)))
+
+        headers = {"Authorization": f"Bearer {get_token}"}
+        response = client.get("api/users/me", headers=headers)
+        assert response.status_code == 200, response.text
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            "api/users/me", headers={**headers, "If-None-Match": etag}
+        )
+        assert response.status_code == 304, response.text
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
@@ -0,0 +1,152 @@
+import contextlib
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from src.repository import users as repository_users
+from src.services.cache_backend import MemoryBackend
+from src.services.cache_backend import RedisBackend
+from src.services.email_filter import BloomFilter
+from src.services.email_filter import RegisteredEmails
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives_and_few_false_positives(self):
+        """
+        The test_no_false_negatives_and_few_false_positives function checks that every
+        added email is found and that about error_rate of the others look present.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        bloom = BloomFilter(10_000, 0.01)
+        for index in range(10_000):
+            bloom.add(f"user{index}@example.com")
+        self.assertTrue(all(f"user{index}@example.com" in bloom for index in range(10_000)))
+        false_positives = sum(f"other{index}@example.com" in bloom for index in range(10_000))
+        self.assertLess(false_positives, 200)
+
+
+class TestRegisteredEmails(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function replaces the database session of the loads with a mock before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.session = MagicMock()
+        self.session.scalars = AsyncMock(return_value=["deadpool@example.com"])
+        patcher = patch(
+            "src.services.email_filter.sessionmanager.session",
+            contextlib.asynccontextmanager(self.open_session),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def open_session(self):
+        """
+        The open_session function stands in for the session of a load.
+
+        :param self: Represent the instance of the class
+        :return: An async generator that yields the mock session
+        :doc-author: Trelent
+        """
+        yield self.session
+
+    async def test_unknown_emails_skip_the_database(self):
+        """
+        The test_unknown_emails_skip_the_database function checks that every email may
+        exist until the filter is loaded, that unknown emails are then answered without
+        a query, and that new accounts are found at once.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        emails = RegisteredEmails(RedisBackend(MagicMock()), capacity=100, error_rate=0.001)
+        emails.redis.publish = AsyncMock()
+        emails.subscriptions = emails.subscription = 1
+        self.assertTrue(emails.might_exist("random@example.com"))
+        self.assertTrue(await emails.load())
+        self.assertFalse(emails.might_exist("random@example.com"))
+        self.assertTrue(emails.might_exist("deadpool@example.com"))
+
+        db = MagicMock()
+        db.execute = AsyncMock()
+        with patch.object(repository_users, "registered_emails", emails):
+            self.assertIsNone(await repository_users.get_user_by_email("random@example.com", db))
+            self.assertEqual(
+                await repository_users.get_users_by_emails(["random@example.com"], db), []
+            )
+            db.execute.assert_not_called()
+            await emails.register("new@example.com")
+            self.assertTrue(emails.might_exist("new@example.com"))
+
+    async def test_memory_backend_asks_the_database(self):
+        """
+        The test_memory_backend_asks_the_database function checks that without Redis,
+        where accounts registered by other workers never reach the filter, the filter
+        is not started and its negatives are never trusted.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        emails = RegisteredEmails(MemoryBackend(10), capacity=100, error_rate=0.001)
+        emails.start(60)
+        self.assertIsNone(emails._watcher)
+        await emails.load()
+        self.assertTrue(emails.might_exist("random@example.com"))
+
+    async def test_register_publishes(self):
+        """
+        The test_register_publishes function checks that a new account is published to
+        the other workers, and that accounts added during a load end up in the new filter.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        redis = MagicMock()
+        redis.publish = AsyncMock()
+        emails = RegisteredEmails(RedisBackend(redis), capacity=100, error_rate=0.001)
+        emails.added = []
+        await emails.register("new@example.com")
+        redis.publish.assert_awaited_once_with("emails:registered", "new@example.com")
+        self.assertEqual(emails.added, ["new@example.com"])
+
+    async def test_negatives_need_a_live_subscription(self):
+        """
+        The test_negatives_need_a_live_subscription function checks that with Redis a negative
+        is only trusted after a load that ran while subscribed to the new accounts, and not
+        once the subscription dropped or changed during the load.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        emails = RegisteredEmails(RedisBackend(MagicMock()), capacity=100, error_rate=0.001)
+        await emails.load()
+        self.assertTrue(emails.might_exist("random@example.com"))
+
+        emails.subscriptions = emails.subscription = 1
+        await emails.load()
+        self.assertFalse(emails.might_exist("random@example.com"))
+
+        async def reconnect(*args):
+            emails.subscriptions = emails.subscription = 2
+            return ["deadpool@example.com"]
+
+        self.session.scalars.side_effect = reconnect
+        await emails.load()
+        self.assertTrue(emails.might_exist("random@example.com"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from ipaddress import ip_address
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+from redis.exceptions import ConnectionError
+
+from src.services.ip_policy import IPNetworkSet
+from src.services.ip_policy import IPPolicy
+
+
+class TestIPNetworkSet(unittest.TestCase):
+
+    def test_networks_and_hosts(self):
+        """
+        The test_networks_and_hosts function checks CIDR networks, single hosts,
+        IPv6 and IPv4 clients seen through an IPv6 socket.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        networks = IPNetworkSet(["192.168.1.0/24", "10.0.0.7", "2001:db8::/32", "not an ip"])
+        self.assertIn(ip_address("192.168.1.200"), networks)
+        self.assertNotIn(ip_address("192.168.2.1"), networks)
+        self.assertIn(ip_address("10.0.0.7"), networks)
+        self.assertNotIn(ip_address("10.0.0.8"), networks)
+        self.assertIn(ip_address("2001:db8:1::5"), networks)
+        self.assertNotIn(ip_address("2001:db9::1"), networks)
+        self.assertIn(ip_address("::ffff:192.168.1.3"), networks)
+        self.assertEqual(networks.invalid, 1)
+
+    def test_overlapping_networks_are_merged(self):
+        """
+        The test_overlapping_networks_are_merged function checks that nested and
+        adjacent networks become one interval without changing the answers.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        networks = IPNetworkSet(["10.0.0.0/8", "10.1.0.0/16", "11.0.0.0/8", "10.2.3.4"])
+        self.assertEqual(len(networks), 1)
+        self.assertIn(ip_address("11.255.255.255"), networks)
+        self.assertNotIn(ip_address("12.0.0.0"), networks)
+        self.assertNotIn(ip_address("9.255.255.255"), networks)
+
+
+class TestIPPolicy(unittest.IsolatedAsyncioTestCase):
+
+    async def test_file_is_reloaded_when_changed(self):
+        """
+        The test_file_is_reloaded_when_changed function checks that a deny file replaces
+        the built-in list and that a change of the file is picked up by reload.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "deny.txt")
+            with open(path, "w") as file:
+                file.write("# feed\n203.0.113.0/24\n")
+            policy = IPPolicy(["127.0.0.1"], ["198.51.100.1"], files={"deny": path})
+            self.assertTrue(policy.is_banned(ip_address("203.0.113.9")))
+            self.assertFalse(policy.is_banned(ip_address("198.51.100.1")))
+            self.assertFalse(await policy.reload())
+
+            with open(path, "w") as file:
+                file.write("198.51.100.0/24\n")
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+            self.assertTrue(await policy.reload())
+            self.assertFalse(policy.is_banned(ip_address("203.0.113.9")))
+            self.assertTrue(policy.is_banned(ip_address("198.51.100.1")))
+            self.assertTrue(policy.is_allowed(ip_address("127.0.0.1")))
+
+    async def test_redis_lists_are_added(self):
+        """
+        The test_redis_lists_are_added function checks that the shared lists are read
+        when their version changes and kept when Redis is unreachable.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        redis = MagicMock()
+        redis.get = AsyncMock(return_value=b"1")
+        redis.smembers = AsyncMock(side_effect=[{b"10.0.0.0/8"}, {b"2001:db8::1"}])
+        policy = IPPolicy(["127.0.0.1"], [], redis=redis)
+        self.assertTrue(await policy.reload())
+        self.assertTrue(policy.is_allowed(ip_address("10.20.30.40")))
+        self.assertTrue(policy.is_allowed(ip_address("127.0.0.1")))
+        self.assertTrue(policy.is_banned(ip_address("2001:db8::1")))
+
+        self.assertFalse(await policy.reload())
+        redis.get.side_effect = ConnectionError("down")
+        self.assertFalse(await policy.reload())
+        self.assertTrue(policy.is_allowed(ip_address("10.20.30.40")))
+
+
+if __name__ == "__main__":
+    unittest.main()
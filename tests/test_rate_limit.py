@@ -0,0 +1,268 @@
+import unittest
+from ipaddress import ip_network
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from fastapi import Request
+from redis.exceptions import ConnectionError
+
+from src.database.models import Role
+from src.services.auth import auth_service
+from src.services.auto_ban import auto_ban
+from src.services.cache_backend import RedisBackend
+from src.services.rate_limit import HybridRateLimiter
+from src.services.rate_limit import RateLimit
+from src.services.rate_limit import identify
+
+
+class TestHybridRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function creates a limiter around a mocked Redis client before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis = MagicMock()
+        self.redis.evalsha = AsyncMock()
+        self.limiter = HybridRateLimiter(RedisBackend(self.redis), sync_interval=0.1)
+
+    async def test_local_bucket(self):
+        """
+        The test_local_bucket function checks that a burst of times requests passes
+        without Redis, that the next one waits for one interval and that the budget refills.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with patch("src.services.rate_limit.time.time", return_value=1000.0):
+            self.assertEqual(await self.limiter.acquire("key", 2, 5), (0, 2.5))
+            self.assertEqual(await self.limiter.acquire("key", 2, 5), (0, 5))
+            self.assertEqual(await self.limiter.acquire("key", 2, 5), (2.5, 5))
+        with patch("src.services.rate_limit.time.time", return_value=1002.5):
+            self.assertEqual(await self.limiter.acquire("key", 2, 5), (0, 5))
+        self.redis.evalsha.assert_not_called()
+
+    async def test_sync_adds_local_counts_and_reads_shared_state(self):
+        """
+        The test_sync_adds_local_counts_and_reads_shared_state function checks that
+        a sync sends the requests counted locally and takes over what other workers used.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with patch("src.services.rate_limit.time.time", return_value=1000.0):
+            await self.limiter.acquire("key", 2, 5)
+            self.redis.evalsha.return_value = [b"1005.0"]
+            await self.limiter.sync()
+            args = self.redis.evalsha.call_args.args
+            self.assertEqual(args[1:], (1, "key", 1000.0, 2.5, 1))
+            self.assertEqual(self.limiter.buckets["key"].pending, 0)
+            wait, used = await self.limiter.acquire("key", 2, 5)
+            self.assertEqual((wait, used), (2.5, 5))
+
+    async def test_failed_sync_keeps_counts(self):
+        """
+        The test_failed_sync_keeps_counts function checks that the counts survive
+        an unreachable Redis and are sent with the next sync.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        await self.limiter.acquire("key", 10, 5)
+        await self.limiter.acquire("key", 10, 5)
+        self.redis.evalsha.side_effect = ConnectionError("down")
+        await self.limiter.sync()
+        self.assertEqual(self.limiter.buckets["key"].pending, 2)
+        self.assertIn("key", self.limiter.touched)
+
+    async def test_strict_mode(self):
+        """
+        The test_strict_mode function checks that strict limits are decided by Redis
+        and by this worker when Redis can't be reached.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis.evalsha.return_value = [b"1.5", b"5"]
+        self.assertEqual(await self.limiter.acquire("key", 2, 5, strict=True), (1.5, 5))
+        self.redis.evalsha.side_effect = ConnectionError("down")
+        wait, used = await self.limiter.acquire("key", 2, 5, strict=True)
+        self.assertEqual(wait, 0)
+        self.assertIn("key", self.limiter.buckets)
+
+    async def test_preamble(self):
+        """
+        The test_preamble function checks that the ban, the strict limit and the cached
+        user come from one script call, and that anonymous requests on a limit kept in
+        memory don't call Redis at all.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        preamble = await self.limiter.preamble("key", 2, 5, False, "10.0.0.1", None)
+        self.assertEqual((preamble.wait, preamble.fetched), (0, False))
+        self.redis.evalsha.assert_not_called()
+
+        self.redis.evalsha.return_value = [b"0", b"0", b"0", b"user"]
+        preamble = await self.limiter.preamble("key", 2, 5, False, "10.0.0.1", "a@b.com")
+        self.assertEqual(preamble.wait, 0)
+        self.assertEqual((preamble.fetched, preamble.user), (True, b"user"))
+        keys = self.redis.evalsha.call_args.args[2:5]
+        self.assertEqual(keys, ("autoban:ban:10.0.0.1", "key", "a@b.com"))
+
+        self.redis.evalsha.return_value = [b"0", b"1.5", b"5", None]
+        preamble = await self.limiter.preamble("other", 2, 5, True, "10.0.0.1", "a@b.com")
+        self.assertEqual((preamble.wait, preamble.user), (1.5, None))
+
+        self.redis.evalsha.return_value = [b"30000", b"0", b"0", None]
+        preamble = await self.limiter.preamble("other", 2, 5, True, "10.0.0.1", None)
+        self.assertEqual(preamble.banned, 30)
+
+        self.redis.evalsha.side_effect = ConnectionError("down")
+        preamble = await self.limiter.preamble("other", 2, 5, True, "10.0.0.1", "a@b.com")
+        self.assertEqual((preamble.wait, preamble.fetched), (0, False))
+
+
+def make_request(headers: dict | None = None, host: str = "10.0.0.1") -> Request:
+    """
+    The make_request function creates a request to /api/users/me.
+
+    :param headers: dict | None: The request headers
+    :param host: str: The client's address
+    :return: The request
+    :doc-author: Trelent
+    """
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/users/me",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+            "client": (host, 50000),
+        }
+    )
+
+
+class TestRateLimit(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function replaces the shared limiter with one in memory before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis = MagicMock()
+        self.redis.evalsha = AsyncMock(return_value=[b"0", b"0", b"0", None])
+        patcher = patch(
+            "src.services.rate_limit.rate_limiter", HybridRateLimiter(RedisBackend(self.redis), 0.1)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_identity(self):
+        """
+        The test_identity function checks that valid tokens identify their user and role,
+        and that anonymous callers and invalid tokens are identified by address.
+        X-Forwarded-For only counts when a trusted proxy sent it.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        token = await auth_service.create_access_token({"sub": "a@b.com", "role": "admin"})
+        self.assertEqual(
+            identify(make_request({"Authorization": f"Bearer {token}"})),
+            ("user:a@b.com", Role.admin),
+        )
+        token = await auth_service.create_access_token({"sub": "a@b.com"})
+        self.assertEqual(
+            identify(make_request({"Authorization": f"Bearer {token}"})),
+            ("user:a@b.com", Role.user),
+        )
+        self.assertEqual(
+            identify(make_request({"Authorization": "Bearer nonsense"})),
+            ("ip:10.0.0.1", Role.user),
+        )
+        forwarded = {"X-Forwarded-For": "198.51.100.7, 203.0.113.5, 10.0.0.2"}
+        self.assertEqual(identify(make_request(forwarded)), ("ip:10.0.0.1", Role.user))
+        with patch("src.services.client_address.TRUSTED_PROXIES", (ip_network("10.0.0.0/24"),)):
+            self.assertEqual(identify(make_request(forwarded)), ("ip:203.0.113.5", Role.user))
+
+    async def test_tiers_and_headers(self):
+        """
+        The test_tiers_and_headers function checks that roles get their own quota,
+        that allowed requests carry the RateLimit-* headers and that the last one
+        is answered 429 with Retry-After. Only anonymous 429s leave an address to strike.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        limit = RateLimit(times=1, seconds=10, tiers={Role.admin: 2})
+        token = await auth_service.create_access_token({"sub": "a@b.com", "role": "admin"})
+        with patch("src.services.rate_limit.time.time", return_value=1000.0):
+            request = make_request({"Authorization": f"Bearer {token}"})
+            await limit(request)
+            self.assertEqual(
+                request.state.response_headers,
+                {
+                    "RateLimit-Limit": "2",
+                    "RateLimit-Remaining": "1",
+                    "RateLimit-Reset": "5",
+                    "RateLimit-Policy": "2;w=10",
+                },
+            )
+            await limit(make_request({"Authorization": f"Bearer {token}"}))
+            request = make_request({"Authorization": f"Bearer {token}"})
+            with self.assertRaises(HTTPException) as caught:
+                await limit(request)
+            self.assertEqual(caught.exception.status_code, 429)
+            self.assertEqual(caught.exception.headers["Retry-After"], "5")
+            self.assertEqual(caught.exception.headers["RateLimit-Remaining"], "0")
+            self.assertFalse(hasattr(request.state, "strike_ip"))
+
+            await limit(make_request())
+            request = make_request()
+            with self.assertRaises(HTTPException):
+                await limit(request)
+            self.assertEqual(request.state.strike_ip, "10.0.0.1")
+            await limit(make_request(host="10.0.0.2"))
+
+    async def test_preamble_results(self):
+        """
+        The test_preamble_results function checks that the cached user is handed to
+        get_current_user and that a ban found in Redis is enforced at once.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        limit = RateLimit(times=5, seconds=10)
+        token = await auth_service.create_access_token({"sub": "a@b.com"})
+        self.redis.evalsha.return_value = [b"0", b"0", b"0", b"user"]
+        request = make_request({"Authorization": f"Bearer {token}"})
+        await limit(request)
+        self.assertEqual(request.state.cached_user, b"user")
+
+        self.redis.evalsha.return_value = [b"60000", b"0", b"0", None]
+        with self.assertRaises(HTTPException) as caught:
+            await limit(make_request({"Authorization": f"Bearer {token}"}, host="10.0.0.9"))
+        self.assertEqual(caught.exception.status_code, 403)
+        self.assertTrue(auto_ban.is_banned("10.0.0.9"))
+        auto_ban.bans.pop("10.0.0.9")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,7 @@ from src.repository.contacts import delete_contact
 from src.repository.contacts import get_all_contacts
 from src.repository.contacts import get_birthday_contacts
 from src.repository.contacts import get_contact
+from src.repository.contacts import get_global_contact_counts
 from src.repository.contacts import get_contacts
 from src.repository.contacts import search_contacts
 from src.repository.contacts import update_contact
@@ -247,6 +248,30 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
         result = await search_contacts("test", self.session, self.user)
         self.assertEqual(result, contacts)
 
+    async def test_get_global_contact_counts(self):
+        """
+        The test_get_global_contact_counts function tests the get_global_contact_counts function.
+        With few owners the counters are summed; on PostgreSQL with more owners than
+        exact_owners, the total is estimated from pg_class and the favourites are unknown.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        counters, contacts, sums = MagicMock(), MagicMock(), MagicMock()
+        counters.scalar_one.return_value = 20_000
+        contacts.scalar_one.return_value = 1_500_000
+        sums.one.return_value = (7, 2)
+        self.session.execute.side_effect = [counters, contacts]
+        result = await get_global_contact_counts(self.session, 10_000)
+        self.assertEqual(
+            result, {"total": 1_500_000, "favourites": None, "estimated": True}
+        )
+        self.session.execute.side_effect = [counters, sums]
+        result = await get_global_contact_counts(self.session, 50_000)
+        self.assertEqual(result, {"total": 7, "favourites": 2, "estimated": False})
+
     async def test_get_birthday_contacts(self):
         """
         The test_get_birthday_contacts function tests the get_birthday_contacts function.
@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+
+from redis.exceptions import ConnectionError
+
+from src.services.cache_backend import RedisBackend
+from src.services.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function creates a cache around a mocked Redis client before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis = MagicMock()
+        self.redis.evalsha = AsyncMock()
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.redis.pipeline.return_value.__aenter__.return_value = self.pipe
+        self.cache = ResponseCache(RedisBackend(self.redis), ttl=60)
+
+    async def test_hit_returns_stored_bytes(self):
+        """
+        The test_hit_returns_stored_bytes function checks that a hit returns the
+        stored body and headers together with the user's generation.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis.evalsha.return_value = [b"3", b'{"ETag": "\\"abc\\""}', b"[]"]
+        generation, cached = await self.cache.get(1, "contacts", (10, 0))
+        self.assertEqual(generation, 3)
+        self.assertEqual(cached.body, b"[]")
+        self.assertEqual(cached.headers, {"ETag": '"abc"'})
+        args = self.redis.evalsha.call_args.args
+        self.assertEqual(args[2:], ("responses:generation:1", "responses:1:contacts:", "10:0"))
+
+    async def test_miss_is_stored_under_read_generation(self):
+        """
+        The test_miss_is_stored_under_read_generation function checks that a miss
+        returns the generation and that put stores the entry under it with a TTL.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis.evalsha.return_value = [b"0", None, None]
+        generation, cached = await self.cache.get(1, "contacts", (10, 0))
+        self.assertIsNone(cached)
+        await self.cache.put(1, "contacts", (10, 0), generation, b"[]", {})
+        self.pipe.hset.assert_called_once_with(
+            "responses:1:contacts:0:10:0", mapping={"headers": "{}", "body": b"[]"}
+        )
+        self.pipe.expire.assert_called_once_with("responses:1:contacts:0:10:0", 60)
+
+    async def test_redis_errors_are_misses(self):
+        """
+        The test_redis_errors_are_misses function checks that an unreachable Redis
+        sends the request to the database and that nothing is stored afterwards.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.redis.evalsha.side_effect = ConnectionError("down")
+        generation, cached = await self.cache.get(1, "contacts", (10, 0))
+        self.assertIsNone(generation)
+        self.assertIsNone(cached)
+        await self.cache.put(1, "contacts", (10, 0), generation, b"[]", {})
+        self.redis.pipeline.assert_not_called()
+
+    async def test_invalidate_bumps_generation(self):
+        """
+        The test_invalidate_bumps_generation function checks that a write only
+        increments the user's generation.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        await self.cache.invalidate(7)
+        self.pipe.incr.assert_called_once_with("responses:generation:7")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import pickle
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Contact
+from src.database.models import User
+from src.repository.contacts import search_contacts
+from src.services.cache_backend import MemoryBackend
+from src.services.cache_backend import RedisBackend
+from src.services.response_cache import ResponseCache
+from src.services.search_cache import SearchCache
+from src.services.search_cache import contact_to_row
+
+
+class TestSearchCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function creates an empty cache in memory and a few contacts before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.backend = MemoryBackend(100)
+        self.cache = SearchCache(self.backend, ttl=30, max_rows=10)
+        self.contacts = [
+            Contact(id=1, name="John", lastname="Doe", email="john@example.com"),
+            Contact(id=2, name="Joanna", lastname="Smith", email="jo@example.com"),
+            Contact(id=3, name="Bob", lastname="Johnson", email="bob@example.com"),
+        ]
+
+    async def test_prefix_is_filtered_in_memory(self):
+        """
+        The test_prefix_is_filtered_in_memory function checks that a longer term
+        is answered from the cached result of its prefix.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        generation, _ = await self.cache.get(1, "jo")
+        await self.cache.put(1, "jo", self.contacts, generation)
+        _, rows = await self.cache.get(1, "JOHN")
+        self.assertEqual([row["id"] for row in rows], [1, 3])
+
+    async def test_write_makes_user_entries_unreachable(self):
+        """
+        The test_write_makes_user_entries_unreachable function checks that bumping the
+        shared generation hides the user's entries and that a result read before the
+        write is not used.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        generation, _ = await self.cache.get(1, "jo")
+        await self.cache.put(1, "jo", self.contacts, generation)
+        await ResponseCache(self.backend, ttl=30).invalidate(1)
+        self.assertEqual(await self.cache.get(1, "jo"), (generation + 1, None))
+        await self.cache.put(1, "jo", self.contacts, generation)
+        self.assertEqual(await self.cache.get(1, "jo"), (generation + 1, None))
+
+    async def test_wildcards_and_big_results_are_not_used(self):
+        """
+        The test_wildcards_and_big_results_are_not_used function checks that LIKE
+        wildcards go to the database and that incomplete results are not cached.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        await self.cache.put(1, "jo", self.contacts, 0)
+        self.assertIsNone((await self.cache.get(1, "jo_"))[1])
+        await self.cache.put(2, "o", self.contacts * 4, 0)
+        self.assertIsNone((await self.cache.get(2, "o"))[1])
+
+    async def test_redis_reads_generation_and_prefixes_at_once(self):
+        """
+        The test_redis_reads_generation_and_prefixes_at_once function checks that with Redis
+        one script call looks up the term and its prefixes, and that Redis errors skip the cache.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        redis = MagicMock()
+        rows = pickle.dumps([contact_to_row(contact) for contact in self.contacts])
+        redis.evalsha = AsyncMock(return_value=[b"4", b"jo", rows])
+        cache = SearchCache(RedisBackend(redis), ttl=30, max_rows=10)
+        generation, rows = await cache.get(1, "john")
+        self.assertEqual(generation, 4)
+        self.assertEqual([row["id"] for row in rows], [1, 3])
+        args = redis.evalsha.call_args.args
+        self.assertEqual(args[2:], ("responses:generation:1", "search:1:", "john", "joh", "jo", "j"))
+
+        redis.evalsha.side_effect = ConnectionError("down")
+        self.assertEqual(await cache.get(1, "john"), (None, None))
+
+
+class TestSearchContactsCache(unittest.IsolatedAsyncioTestCase):
+
+    async def test_refinement_skips_database(self):
+        """
+        The test_refinement_skips_database function checks that search_contacts
+        queries the database once while the user keeps typing.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        user = User(id=101, username="typing_user", password="qwerty")
+        session = AsyncMock(spec=AsyncSession)
+        contacts = [
+            Contact(id=1, name="John", lastname="Doe", email="john@example.com"),
+            Contact(id=2, name="Joanna", lastname="Smith", email="jo@example.com"),
+        ]
+        mocked_contacts = MagicMock()
+        mocked_contacts.scalars.return_value.all.return_value = contacts
+        session.execute.return_value = mocked_contacts
+        cache = SearchCache(MemoryBackend(100), ttl=30, max_rows=10)
+
+        with patch("src.repository.contacts.search_cache", cache):
+            await search_contacts("jo", session, user)
+            await search_contacts("joh", session, user)
+            result = await search_contacts("john", session, user)
+
+        session.execute.assert_called_once()
+        self.assertEqual([contact.id for contact in result], [1])
+        self.assertIs(result[0].user, user)
+
+
+if __name__ == "__main__":
+    unittest.main()
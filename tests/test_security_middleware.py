@@ -0,0 +1,157 @@
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+from src.middlewares.security import SecurityMiddleware
+
+
+async def endpoint(scope, receive, send):
+    """
+    The endpoint function is a trivial ASGI app that answers 200 OK,
+    429 on /limited and /limited/user and 401 on the auth paths. Only the anonymous
+    /limited leaves an address to strike, like the rate limit does.
+
+    :param scope: The ASGI connection scope
+    :param receive: Receive ASGI messages from the client
+    :param send: Send ASGI messages to the client
+    :return: Nothing
+    :doc-author: Trelent
+    """
+    status_code = (
+        429 if scope["path"].startswith("/limited") else 401 if "auth" in scope["path"] else 200
+    )
+    if scope["path"] == "/limited":
+        scope["state"]["strike_ip"] = scope["client"][0]
+    if scope["path"] == "/headers":
+        scope["state"]["response_headers"] = {"RateLimit-Remaining": "1"}
+    await send({"type": "http.response.start", "status": status_code, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+class TestSecurityMiddleware(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function wraps the trivial app in the security middleware before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.app = SecurityMiddleware(
+            endpoint,
+            bypass_paths=["/static", "/api/healthchecker"],
+            strike_paths=["/api/auth/login"],
+        )
+
+    async def send(self, path: str, host: str, user_agent: str | None = None) -> list[dict]:
+        """
+        The send function sends one request through the middleware.
+
+        :param self: Represent the instance of the class
+        :param path: str: The request path
+        :param host: str: The client's address
+        :param user_agent: str | None: The User-Agent header, None to leave it out
+        :return: The ASGI messages of the response
+        :doc-author: Trelent
+        """
+        headers = [] if user_agent is None else [(b"user-agent", user_agent.encode())]
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "headers": headers,
+            "client": (host, 50000),
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        await self.app(scope, receive, send)
+        return messages
+
+    async def status(self, path: str, host: str, user_agent: str | None = None) -> int:
+        """
+        The status function sends one request through the middleware.
+
+        :param self: Represent the instance of the class
+        :param path: str: The request path
+        :param host: str: The client's address
+        :param user_agent: str | None: The User-Agent header, None to leave it out
+        :return: The status code of the response
+        :doc-author: Trelent
+        """
+        messages = await self.send(path, host, user_agent)
+        return messages[0]["status"]
+
+    async def test_policies(self):
+        """
+        The test_policies function checks the allow list, the ban list and the
+        User-Agent ban, including requests without a User-Agent header.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.assertEqual(await self.status("/api/contacts", "127.0.0.1"), 200)
+        self.assertEqual(await self.status("/api/contacts", "127.0.0.1", "curl/8.0"), 200)
+        self.assertEqual(await self.status("/api/contacts", "127.0.0.1", "Googlebot/2.1"), 403)
+        self.assertEqual(await self.status("/api/contacts", "82.220.71.77"), 403)
+        self.assertEqual(await self.status("/api/contacts", "10.0.0.1"), 403)
+        self.assertEqual(await self.status("/api/contacts", "testclient"), 403)
+
+    async def test_bypass_table(self):
+        """
+        The test_bypass_table function checks that bypassed paths and everything below
+        them skip the policies, while similar looking paths don't.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.assertEqual(await self.status("/static/product.css", "10.0.0.1"), 200)
+        self.assertEqual(await self.status("/api/healthchecker", "10.0.0.1"), 200)
+        self.assertEqual(await self.status("/staticfiles", "10.0.0.1"), 403)
+
+    async def test_strikes(self):
+        """
+        The test_strikes function checks that anonymous 429s and failed logins count towards
+        an automatic ban, that 429s of users and other 401s don't and that banned IPs are rejected.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with patch("src.middlewares.security.auto_ban") as auto_ban:
+            auto_ban.is_banned.return_value = False
+            auto_ban.strike = AsyncMock()
+            self.assertEqual(await self.status("/limited", "127.0.0.1"), 429)
+            self.assertEqual(await self.status("/limited/user", "127.0.0.1"), 429)
+            self.assertEqual(await self.status("/api/auth/login", "127.0.0.1"), 401)
+            self.assertEqual(await self.status("/api/auth/refresh_token", "127.0.0.1"), 401)
+            self.assertEqual(auto_ban.strike.await_count, 2)
+            auto_ban.strike.assert_awaited_with("127.0.0.1")
+
+            auto_ban.is_banned.return_value = True
+            self.assertEqual(await self.status("/api/contacts", "127.0.0.1"), 403)
+            auto_ban.is_banned.assert_called_with("127.0.0.1")
+
+    async def test_response_headers(self):
+        """
+        The test_response_headers function checks that headers left in
+        request.state.response_headers are added to the response.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        messages = await self.send("/headers", "127.0.0.1")
+        self.assertIn((b"ratelimit-remaining", b"1"), messages[0]["headers"])
+
+
+if __name__ == "__main__":
+    unittest.main()
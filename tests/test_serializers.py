@@ -0,0 +1,80 @@
+import json
+import unittest
+from datetime import date
+from datetime import datetime
+
+from pydantic import TypeAdapter
+
+from src.database.models import Contact
+from src.database.models import Role
+from src.database.models import User
+from src.schemas.contact import ContactCompactList
+from src.schemas.contact import ContactResponse
+from src.services.serializers import dump_contacts
+
+
+class TestSerializers(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function creates four contacts of two owners before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        owners = [
+            User(id=1, username="first", email="first@example.com", role=Role.user),
+            User(id=2, username="second", email="second@example.com", role=Role.admin),
+        ]
+        self.contacts = [
+            Contact(
+                id=number,
+                name=f"Name{number}",
+                lastname="Lastname",
+                email=f"contact{number}@example.com",
+                phone="123456789",
+                birthday=date(1990, 1, number),
+                notes="Some notes",
+                favourite=number % 2 == 0,
+                created_at=datetime(2024, 4, 22, 12, 30, 15, 123456),
+                updated_at=None,
+                user_id=owners[number % 2].id,
+                user=owners[number % 2],
+            )
+            for number in range(1, 5)
+        ]
+
+    def test_full_format_matches_response_model(self):
+        """
+        The test_full_format_matches_response_model function checks that the trusted
+        serializer writes the same JSON as validating against ContactResponse.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        adapter = TypeAdapter(list[ContactResponse])
+        expected = adapter.dump_json(
+            adapter.validate_python(self.contacts, from_attributes=True)
+        )
+        self.assertEqual(json.loads(dump_contacts(self.contacts)), json.loads(expected))
+
+    def test_compact_format_lists_each_owner_once(self):
+        """
+        The test_compact_format_lists_each_owner_once function checks that the compact
+        envelope references owners by id and validates against ContactCompactList.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        data = json.loads(dump_contacts(self.contacts, "compact"))
+        self.assertEqual(sorted(data["users"]), ["1", "2"])
+        self.assertEqual([item["user_id"] for item in data["contacts"]], [2, 1, 2, 1])
+        self.assertNotIn("user", data["contacts"][0])
+        ContactCompactList.model_validate(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import re
+import tempfile
+import unittest
+
+from src.services.user_agent_policy import UserAgentPolicy
+from src.services.user_agent_policy import compile_patterns
+from src.services.user_agent_policy import split_prefix
+
+PATTERNS = [
+    r"bot-Yandex",
+    r"Googlebot",
+    r"Google-Read-Aloud",
+    r"curl/\d+",
+    r"ahrefs|semrush",
+    r"zgrab?",
+    r"(?i)python-requests",
+    r"(\w+)-\1",
+]
+USER_AGENTS = [
+    "Mozilla/5.0 (compatible; Googlebot/2.1)",
+    "Mozilla/5.0 (compatible; bot-Yandex)",
+    "Google-Read-Aloud",
+    "Google Chrome",
+    "curl/8.4.0",
+    "curl/",
+    "Mozilla/5.0 (compatible; SemrushBot) semrush",
+    "zgra",
+    "zgrb",
+    "Python-Requests/2.31",
+    "scan-scan",
+    "scan-scam",
+    "",
+]
+
+
+class TestUserAgentPolicy(unittest.IsolatedAsyncioTestCase):
+
+    def test_split_prefix(self):
+        """
+        The test_split_prefix function checks which part of a pattern goes into the trie.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.assertEqual(split_prefix("Googlebot"), ("Googlebot", ""))
+        self.assertEqual(split_prefix(r"curl/\d+"), ("curl/", r"\d+"))
+        self.assertEqual(split_prefix("zgrab?"), ("zgra", "b?"))
+        self.assertEqual(split_prefix("ahrefs|semrush"), ("", "ahrefs|semrush"))
+
+    def test_combined_regex_matches_like_the_loop(self):
+        """
+        The test_combined_regex_matches_like_the_loop function checks that the combined
+        regexes give the same verdicts as searching every pattern on its own, also for
+        patterns with global flags or backreferences, which are not merged.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        combined = compile_patterns(PATTERNS)
+        self.assertEqual(len(combined), 3)
+        policy = UserAgentPolicy(PATTERNS, cache_size=4)
+        for user_agent in USER_AGENTS + USER_AGENTS:
+            expected = any(re.search(pattern, user_agent) for pattern in PATTERNS)
+            found = any(regex.search(user_agent) for regex in combined)
+            self.assertEqual(found, expected, user_agent)
+            self.assertEqual(policy.is_banned(user_agent), expected, user_agent)
+        self.assertEqual(compile_patterns([]), [])
+        with self.assertRaisesRegex(re.error, "bad\\("):
+            compile_patterns(["Googlebot", "bad("])
+        self.assertFalse(UserAgentPolicy([]).is_banned("Googlebot"))
+
+    async def test_file_is_reloaded_when_changed(self):
+        """
+        The test_file_is_reloaded_when_changed function checks that a ban file replaces
+        the built-in list, that its changes drop the cached verdicts and that an invalid
+        pattern keeps the previous list.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bots.txt")
+            with open(path, "w") as file:
+                file.write("# bots\nMJ12bot\n")
+            policy = UserAgentPolicy(["Googlebot"], file=path)
+            self.assertTrue(policy.is_banned("MJ12bot/v1.4"))
+            self.assertFalse(policy.is_banned("Googlebot"))
+            self.assertFalse(await policy.reload())
+
+            with open(path, "w") as file:
+                file.write("Googlebot\n")
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+            self.assertTrue(await policy.reload())
+            self.assertFalse(policy.is_banned("MJ12bot/v1.4"))
+            self.assertTrue(policy.is_banned("Googlebot"))
+
+            with open(path, "w") as file:
+                file.write("bad(\n")
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2))
+            self.assertFalse(await policy.reload())
+            self.assertTrue(policy.is_banned("Googlebot"))
+
+    async def test_watch_survives_errors(self):
+        """
+        The test_watch_survives_errors function checks that a reload that fails
+        doesn't stop the watcher and keeps the previous list.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        policy = UserAgentPolicy(["Googlebot"])
+        calls = 0
+
+        async def reload():
+            nonlocal calls
+            calls += 1
+            raise RuntimeError("disk gone")
+
+        policy.reload = reload
+        watcher = asyncio.create_task(policy.watch(0))
+        await asyncio.sleep(0.01)
+        self.assertFalse(watcher.done())
+        watcher.cancel()
+        self.assertGreater(calls, 1)
+        self.assertTrue(policy.is_banned("Googlebot"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import contextlib
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from src.services.metrics import metrics
+from src.services.user_loader import UserLoader
+
+
+class TestUserLoader(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        """
+        The setUp function replaces the batched query and its session with mocks before each test.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.loader = UserLoader()
+        self.db = MagicMock()
+        self.db.merge = AsyncMock(side_effect=lambda user, load: MagicMock(email=user.email))
+        self.session = MagicMock()
+        patcher = patch(
+            "src.services.user_loader.repository_users.get_users_by_emails",
+            AsyncMock(side_effect=self.query),
+        )
+        self.get_users = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch(
+            "src.services.user_loader.sessionmanager.session",
+            contextlib.asynccontextmanager(self.open_session),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def open_session(self):
+        """
+        The open_session function stands in for the session of the batch.
+
+        :param self: Represent the instance of the class
+        :return: An async generator that yields the mock session
+        :doc-author: Trelent
+        """
+        yield self.session
+
+    async def query(self, emails, db):
+        """
+        The query function stands in for the database: every email but unknown@ has a user.
+
+        :param self: Represent the instance of the class
+        :param emails: The emails of the batch
+        :param db: The database session
+        :return: The users found
+        :doc-author: Trelent
+        """
+        await asyncio.sleep(0)
+        return [MagicMock(email=email) for email in emails if not email.startswith("unknown")]
+
+    async def test_concurrent_loads_share_one_query(self):
+        """
+        The test_concurrent_loads_share_one_query function checks that concurrent loads
+        of the same email are coalesced, that distinct emails of one tick are batched
+        and that emails without a user load None. The batch runs on a session of its own
+        and every caller gets its own copy merged into its session.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        coalesced = metrics.snapshot()["counters"].get("user_loader.coalesced", 0)
+        emails = ["a@b.com"] * 10 + ["c@d.com", "unknown@x.com"]
+        users = await asyncio.gather(*(self.loader.load(email, self.db) for email in emails))
+        self.get_users.assert_awaited_once()
+        self.assertEqual(
+            sorted(self.get_users.call_args.args[0]), ["a@b.com", "c@d.com", "unknown@x.com"]
+        )
+        self.assertIs(self.get_users.call_args.args[1], self.session)
+        self.assertEqual(self.session.expunge.call_count, 2)
+        self.assertEqual(self.db.merge.await_count, 11)
+        self.assertEqual(len({id(user) for user in users[:10]}), 10)
+        self.assertTrue(all(user.email == "a@b.com" for user in users[:10]))
+        self.assertEqual(users[10].email, "c@d.com")
+        self.assertIsNone(users[11])
+        self.assertEqual(metrics.snapshot()["counters"]["user_loader.coalesced"], coalesced + 9)
+
+        await self.loader.load("a@b.com", self.db)
+        self.assertEqual(self.get_users.await_count, 2)
+        self.assertEqual(self.loader.pending, {})
+
+    async def test_failed_query_fails_the_batch(self):
+        """
+        The test_failed_query_fails_the_batch function checks that every load of a batch
+        gets the error of its query and that the next load queries again.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.get_users.side_effect = ConnectionError("down")
+        results = await asyncio.gather(
+            self.loader.load("a@b.com", self.db),
+            self.loader.load("a@b.com", self.db),
+            return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(result, ConnectionError) for result in results))
+        self.assertEqual(self.loader.pending, {})
+
+    async def test_cancelled_query_releases_the_loads(self):
+        """
+        The test_cancelled_query_releases_the_loads function checks that the loader keeps
+        the task of a batch while it runs and that cancelling it cancels the waiting
+        loads instead of leaving them hanging.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        async def hang(emails, db):
+            await asyncio.Event().wait()
+
+        self.get_users.side_effect = hang
+        load = asyncio.ensure_future(self.loader.load("a@b.com", self.db))
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.loader.tasks), 1)
+        for task in self.loader.tasks:
+            task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(load, 1)
+        self.assertEqual(self.loader.tasks, set())
+        self.assertEqual(self.loader.pending, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
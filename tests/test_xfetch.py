@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import patch
+
+from src.services.xfetch import jittered_ttl
+from src.services.xfetch import should_refresh
+
+
+class TestXFetch(unittest.TestCase):
+
+    def test_jittered_ttl(self):
+        """
+        The test_jittered_ttl function checks that the jitter only ever shortens the TTL,
+        by at most its share.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        with patch("src.services.xfetch.random.random", return_value=0.0):
+            self.assertEqual(jittered_ttl(300, 0.1), 300)
+        with patch("src.services.xfetch.random.random", return_value=0.999):
+            self.assertAlmostEqual(jittered_ttl(300, 0.1), 270, places=0)
+
+    def test_should_refresh(self):
+        """
+        The test_should_refresh function checks that entries far from their expiry are
+        kept, that expired ones are refreshed, and that slow entries are refreshed
+        earlier than fast ones for the same draw.
+
+        :param self: Represent the instance of the class
+        :return: None
+        :doc-author: Trelent
+        """
+        self.assertTrue(should_refresh(0.1, expires=1000, beta=1, now=1000))
+        with patch("src.services.xfetch.random.random", return_value=0.9):
+            self.assertFalse(should_refresh(0.1, expires=1000, beta=1, now=700))
+            self.assertFalse(should_refresh(0.1, expires=1000, beta=1, now=999.5))
+            self.assertTrue(should_refresh(1.0, expires=1000, beta=1, now=999.5))
+
+
+if __name__ == "__main__":
+    unittest.main()